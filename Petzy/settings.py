@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 
 import os
+import tempfile
 
 from django.conf.urls.static import static
 from django.utils.translation import gettext_lazy as _
@@ -80,6 +81,7 @@ TEMPLATES = [
                 'django.template.context_processors.i18n',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'cart.context_processors.carrito',
             ],
         },
     },
@@ -95,10 +97,41 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Las escrituras concurrentes esperan el lock en vez de fallar
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Base de pruebas en archivo (la de memoria compartida no espera locks),
+        # en el directorio temporal para no ensuciar el repositorio
+        'TEST': {'NAME': Path(tempfile.gettempdir()) / 'petzy_test_db.sqlite3'},
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Con REDIS_URL los workers comparten snapshots y contadores cacheados;
+# sin él se usa la caché en memoria del proceso (desarrollo y pruebas).
+
+REDIS_URL = os.environ.get("REDIS_URL", "")
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'petzy',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
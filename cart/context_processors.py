@@ -0,0 +1,6 @@
+from .services.insignia import InsigniaCarrito
+
+
+def carrito(request):
+    """Unidades y total del carrito para la insignia de ``base.html``"""
+    return {"carrito_insignia": InsigniaCarrito(request)}
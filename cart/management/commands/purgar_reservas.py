@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from cart.services import purgar_reservas_expiradas
+
+
+class Command(BaseCommand):
+    help = "Elimina por lotes las reservas de stock vencidas. Puede programarse periódicamente."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Filas borradas por sentencia.")
+
+    def handle(self, *args, **options):
+        total = purgar_reservas_expiradas(lote=options["lote"])
+        self.stdout.write(self.style.SUCCESS(f"{total} reservas de stock eliminadas."))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:25
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def unir_duplicados(apps, schema_editor):
+    CartItem = apps.get_model('cart', 'CartItem')
+    duplicados = (
+        CartItem.objects.values('cart_id', 'producto_id')
+        .annotate(filas=Count('id'), primero=Min('id'), cantidad=Sum('cantidad'))
+        .filter(filas__gt=1)
+        .order_by()
+    )
+    for fila in duplicados:
+        CartItem.objects.filter(pk=fila['primero']).update(cantidad=fila['cantidad'])
+        CartItem.objects.filter(
+            cart_id=fila['cart_id'], producto_id=fila['producto_id']
+        ).exclude(pk=fila['primero']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_initial'),
+        ('products', '0009_producto_sku'),
+    ]
+
+    operations = [
+        migrations.RunPython(unir_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'producto'), name='cartitem_cart_producto_unico'),
+        ),
+    ]
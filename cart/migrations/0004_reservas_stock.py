@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_cartitem_cart_producto_unico'),
+        ('products', '0009_producto_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('titular', models.CharField(max_length=64)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('expira', models.DateTimeField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='products.producto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['producto', 'expira'], name='reserva_producto_expira_idx'), models.Index(fields=['expira'], name='reserva_expira_idx')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'titular'), name='reserva_producto_titular_unica')],
+            },
+        ),
+    ]
@@ -1,7 +1,15 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from users.models import Usuario
 from products.models import Producto
 
+IMPORTE = DecimalField(max_digits=12, decimal_places=2)
+CENTAVO = Decimal("0.01")
+
 
 class Cart(models.Model):
     """Carrito asociado a un usuario"""
@@ -13,7 +21,27 @@ class Cart(models.Model):
         return f"Carrito de {self.usuario.username}"
 
     def total(self):
-        return sum(item.subtotal() for item in self.items.all())
+        return self.items.total()
+
+
+class CartItemQuerySet(models.QuerySet):
+    """Importes calculados en SQL con el precio actual del producto"""
+
+    def con_importe(self):
+        return self.annotate(importe=ExpressionWrapper(F("cantidad") * F("producto__precio"), output_field=IMPORTE))
+
+    def total(self):
+        return self.aggregate(
+            total=Coalesce(Sum(F("cantidad") * F("producto__precio"), output_field=IMPORTE), Value(Decimal("0.00")))
+        )["total"].quantize(CENTAVO)
+
+    def resumen(self):
+        """``(total, unidades)`` en una sola consulta"""
+        fila = self.aggregate(
+            total=Coalesce(Sum(F("cantidad") * F("producto__precio"), output_field=IMPORTE), Value(Decimal("0.00"))),
+            unidades=Coalesce(Sum("cantidad"), Value(0)),
+        )
+        return fila["total"].quantize(CENTAVO), fila["unidades"]
 
 
 class CartItem(models.Model):
@@ -22,9 +50,46 @@ class CartItem(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
     cantidad = models.PositiveIntegerField(default=1)
 
+    objects = CartItemQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cart", "producto"], name="cartitem_cart_producto_unico"),
+        ]
+
     def __str__(self):
         return f"{self.cantidad} × {self.producto.nombre}"
 
     def subtotal(self):
         return self.producto.precio * self.cantidad
 
+
+
+class ReservaStockQuerySet(models.QuerySet):
+    def activas(self, ahora=None):
+        return self.filter(expira__gt=ahora or timezone.now())
+
+
+class ReservaStock(models.Model):
+    """Unidades apartadas por un carrito hasta que vence la reserva"""
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="reservas")
+    # "u:<id>" para usuarios, "s:<token>" para carritos anónimos en sesión
+    titular = models.CharField(max_length=64)
+    cantidad = models.PositiveIntegerField()
+    expira = models.DateTimeField()
+
+    objects = ReservaStockQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["producto", "titular"], name="reserva_producto_titular_unica"),
+        ]
+        indexes = [
+            # Suma de reservas vigentes de un producto sin recorrer la tabla
+            models.Index(fields=["producto", "expira"], name="reserva_producto_expira_idx"),
+            # Barrido por lotes de reservas vencidas
+            models.Index(fields=["expira"], name="reserva_expira_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.cantidad} × {self.producto_id} para {self.titular}"
@@ -0,0 +1,55 @@
+"""Service layer utilities for the cart app."""
+
+from .almacen import (
+    AlmacenCarrito,
+    CarritoBD,
+    CarritoSesion,
+    LineaCarrito,
+    costo_envio,
+    fusionar_carrito_sesion,
+    obtener_carrito,
+)
+from .insignia import InsigniaCarrito, insignia_usuario, invalidar_insignia
+from .operaciones import (
+    LineaInexistente,
+    Operacion,
+    OperacionInvalida,
+    aplicar_operaciones,
+    delta_carrito,
+    leer_operaciones,
+)
+from .reservas import (
+    StockNoDisponible,
+    disponible,
+    liberar,
+    purgar_reservas_expiradas,
+    reservar,
+    titular_sesion,
+    titular_usuario,
+)
+
+__all__ = [
+    "AlmacenCarrito",
+    "CarritoBD",
+    "CarritoSesion",
+    "LineaCarrito",
+    "costo_envio",
+    "fusionar_carrito_sesion",
+    "obtener_carrito",
+    "InsigniaCarrito",
+    "insignia_usuario",
+    "invalidar_insignia",
+    "LineaInexistente",
+    "Operacion",
+    "OperacionInvalida",
+    "aplicar_operaciones",
+    "delta_carrito",
+    "leer_operaciones",
+    "StockNoDisponible",
+    "disponible",
+    "liberar",
+    "purgar_reservas_expiradas",
+    "reservar",
+    "titular_sesion",
+    "titular_usuario",
+]
@@ -0,0 +1,283 @@
+"""Cart storage with one interface and two backends.
+
+``obtener_carrito(request)`` returns the store that fits the visitor:
+
+* ``CarritoSesion`` keeps anonymous carts in the session as a compact
+  ``{"<producto_id>": cantidad}`` dict. Browsing and filling a cart touches
+  no cart tables; with ``SESSION_ENGINE`` set to ``signed_cookies`` it
+  touches no table at all.
+* ``CarritoBD`` wraps the ``Cart``/``CartItem`` rows of a logged-in user.
+
+Both expose the same methods, and ``lineas()`` yields objects with
+``producto``, ``cantidad`` and ``importe`` so templates do not care which
+one they got. Adding or changing a line also sets that cart's stock hold
+(``cart.services.reservas``), so shoppers are turned away when they add an
+item rather than at checkout. When the visitor logs in,
+``fusionar_carrito_sesion`` folds the session cart into the user's rows with
+a single bulk upsert and moves the holds over (``cart.signals`` wires it to
+``user_logged_in``).
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from products.models import Producto
+
+from ..models import CENTAVO, Cart, CartItem
+from .insignia import invalidar_insignia
+from .reservas import StockNoDisponible, liberar, reservar, titular_sesion, titular_usuario
+
+CLAVE_SESION = "carrito"
+ENVIO = Decimal("5.00")
+
+
+@dataclass
+class LineaCarrito:
+    producto: Producto
+    cantidad: int
+
+    @property
+    def importe(self) -> Decimal:
+        return self.producto.precio * self.cantidad
+
+
+def costo_envio(subtotal: Decimal) -> Decimal:
+    return ENVIO if subtotal > Decimal("0.00") else Decimal("0.00")
+
+
+class AlmacenCarrito(ABC):
+    """Operations every cart backend supports.
+
+    ``agregar`` and ``actualizar`` raise ``StockNoDisponible`` when the hold
+    for the new quantity cannot be placed; the cart is left unchanged.
+    Callers validate quantities: ``agregar`` expects ``cantidad >= 1``.
+    """
+
+    titular: str
+
+    @abstractmethod
+    def cantidad(self, producto_id: int) -> int: ...
+
+    @abstractmethod
+    def agregar(self, producto, cantidad: int) -> None: ...
+
+    @abstractmethod
+    def actualizar(self, producto, cantidad: int) -> bool:
+        """Set the quantity of a line (``<= 0`` removes it); ``False`` if absent."""
+
+    @abstractmethod
+    def eliminar(self, producto_id: int) -> bool: ...
+
+    @abstractmethod
+    def lineas(self, producto_ids=None): ...
+
+    @abstractmethod
+    def total(self) -> Decimal: ...
+
+    @abstractmethod
+    def resumen(self) -> tuple[Decimal, int]:
+        """``(total, unidades)`` of the whole cart."""
+
+    def instantanea(self):
+        """State to hand back to ``restaurar`` if a batch fails.
+
+        Database carts roll back with the transaction and need nothing.
+        """
+        return None
+
+    def restaurar(self, instantanea) -> None:
+        pass
+
+
+class CarritoSesion(AlmacenCarrito):
+    def __init__(self, session):
+        self.session = session
+
+    @property
+    def titular(self) -> str:
+        return titular_sesion(self.session)
+
+    def _datos(self) -> dict:
+        return self.session.get(CLAVE_SESION) or {}
+
+    def _guardar(self, datos: dict) -> None:
+        # Se asigna un dict nuevo para que la sesión se marque como modificada
+        if datos:
+            self.session[CLAVE_SESION] = datos
+        else:
+            self.session.pop(CLAVE_SESION, None)
+
+    def cantidad(self, producto_id: int) -> int:
+        return self._datos().get(str(producto_id), 0)
+
+    def agregar(self, producto, cantidad: int) -> None:
+        datos = dict(self._datos())
+        datos[str(producto.pk)] = datos.get(str(producto.pk), 0) + cantidad
+        reservar(producto, self.titular, datos[str(producto.pk)])
+        self._guardar(datos)
+
+    def actualizar(self, producto, cantidad: int) -> bool:
+        datos = dict(self._datos())
+        if str(producto.pk) not in datos:
+            return False
+        reservar(producto, self.titular, cantidad)
+        if cantidad <= 0:
+            del datos[str(producto.pk)]
+        else:
+            datos[str(producto.pk)] = cantidad
+        self._guardar(datos)
+        return True
+
+    def eliminar(self, producto_id: int) -> bool:
+        datos = dict(self._datos())
+        if datos.pop(str(producto_id), None) is None:
+            return False
+        liberar(self.titular, [producto_id])
+        self._guardar(datos)
+        return True
+
+    def lineas(self, producto_ids=None) -> list[LineaCarrito]:
+        datos = self._datos()
+        if producto_ids is not None:
+            buscados = {str(pk) for pk in producto_ids}
+            datos = {pk: cantidad for pk, cantidad in datos.items() if pk in buscados}
+        productos = Producto.objects.con_stock_actual().in_bulk([int(pk) for pk in datos])
+        return [
+            LineaCarrito(productos[int(pk)], cantidad)
+            for pk, cantidad in datos.items()
+            if int(pk) in productos
+        ]
+
+    def total(self) -> Decimal:
+        return self.resumen()[0]
+
+    def resumen(self) -> tuple[Decimal, int]:
+        lineas = self.lineas()
+        total = sum((linea.importe for linea in lineas), Decimal("0.00")).quantize(CENTAVO)
+        return total, sum(linea.cantidad for linea in lineas)
+
+    def instantanea(self):
+        return dict(self._datos())
+
+    def restaurar(self, instantanea) -> None:
+        self._guardar(instantanea)
+
+
+class CarritoBD(AlmacenCarrito):
+    def __init__(self, usuario):
+        self.usuario = usuario
+        self.titular = titular_usuario(usuario)
+
+    def _items(self):
+        return CartItem.objects.filter(cart__usuario=self.usuario)
+
+    def _tocar(self) -> None:
+        # ``actualizado_en`` marca la última actividad; la limpieza borra carritos abandonados
+        Cart.objects.filter(usuario=self.usuario).update(actualizado_en=timezone.now())
+
+    def cantidad(self, producto_id: int) -> int:
+        return self._items().filter(producto_id=producto_id).values_list("cantidad", flat=True).first() or 0
+
+    def agregar(self, producto, cantidad: int) -> None:
+        with transaction.atomic():
+            reservar(producto, self.titular, self.cantidad(producto.pk) + cantidad)
+            cart, cart_creado = Cart.objects.get_or_create(usuario=self.usuario)
+            if not cart_creado:
+                self._tocar()
+            item, creado = CartItem.objects.get_or_create(cart=cart, producto=producto, defaults={"cantidad": cantidad})
+            if not creado:
+                CartItem.objects.filter(pk=item.pk).update(cantidad=F("cantidad") + cantidad)
+            invalidar_insignia(self.usuario.pk)
+
+    def actualizar(self, producto, cantidad: int) -> bool:
+        items = self._items().filter(producto=producto)
+        with transaction.atomic():
+            if not items.exists():
+                return False
+            reservar(producto, self.titular, cantidad)
+            if cantidad <= 0:
+                items.delete()
+            else:
+                items.update(cantidad=cantidad)
+            self._tocar()
+            invalidar_insignia(self.usuario.pk)
+        return True
+
+    def eliminar(self, producto_id: int) -> bool:
+        with transaction.atomic():
+            liberar(self.titular, [producto_id])
+            borradas = self._items().filter(producto_id=producto_id).delete()[0]
+            invalidar_insignia(self.usuario.pk)
+        return borradas > 0
+
+    def lineas(self, producto_ids=None):
+        items = self._items()
+        if producto_ids is not None:
+            items = items.filter(producto_id__in=producto_ids)
+        return items.select_related("producto").con_importe().order_by("id")
+
+    def total(self) -> Decimal:
+        return self._items().total()
+
+    def resumen(self) -> tuple[Decimal, int]:
+        return self._items().resumen()
+
+
+def obtener_carrito(request) -> AlmacenCarrito:
+    if request.user.is_authenticated:
+        return CarritoBD(request.user)
+    return CarritoSesion(request.session)
+
+
+def fusionar_carrito_sesion(session, usuario) -> int:
+    """Move the session cart into ``usuario``'s rows; returns merged lines.
+
+    Quantities are added to what the user already had, capped at the current
+    stock, and written with one ``INSERT ... ON CONFLICT DO UPDATE``. The
+    session's holds are released and placed again for the user where the
+    units are still free.
+    """
+
+    datos = session.pop(CLAVE_SESION, None)
+    if not datos:
+        return 0
+    pedidos = {int(pk): cantidad for pk, cantidad in datos.items()}
+    titular = titular_usuario(usuario)
+
+    with transaction.atomic():
+        liberar(titular_sesion(session))
+        cart, creado = Cart.objects.get_or_create(usuario=usuario)
+        if not creado:
+            Cart.objects.filter(pk=cart.pk).update(actualizado_en=timezone.now())
+        existentes = dict(cart.items.filter(producto_id__in=pedidos).values_list("producto_id", "cantidad"))
+        productos = Producto.objects.con_stock_actual().in_bulk(pedidos)
+        lineas = []
+        for producto_id, cantidad in pedidos.items():
+            if producto_id not in productos:
+                continue
+            previa = existentes.get(producto_id, 0)
+            nueva = max(previa, min(previa + cantidad, productos[producto_id].stock_actual))
+            if nueva > previa:
+                lineas.append(CartItem(cart=cart, producto_id=producto_id, cantidad=nueva))
+        CartItem.objects.bulk_create(
+            lineas,
+            update_conflicts=True,
+            unique_fields=["cart", "producto"],
+            update_fields=["cantidad"],
+        )
+        invalidar_insignia(usuario.pk)
+
+    for linea in lineas:
+        try:
+            reservar(productos[linea.producto_id], titular, linea.cantidad)
+        except StockNoDisponible:
+            # La línea sigue en el carrito; el checkout volverá a comprobar el stock
+            pass
+    return len(lineas)
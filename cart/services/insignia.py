@@ -0,0 +1,69 @@
+"""Cart badge (unit count and total) for every page.
+
+Logged-in users read ``{"unidades", "total"}`` from a per-user cache entry
+that is filled by one aggregate query on a miss. Writers drop the entry
+once their transaction commits: ``CarritoBD``, the login merge and
+checkout call ``invalidar_insignia`` directly (their bulk updates send no
+signals), and ``cart.signals`` covers saves and deletes made anywhere else,
+including the admin and cascades from ``Cart``, users and products. Price changes are not tracked, so the total
+can lag by up to ``INSIGNIA_TIMEOUT``.
+
+Anonymous carts live in the session, so their unit count costs nothing;
+the total is only computed if a template asks for it.
+"""
+
+from __future__ import annotations
+
+from decimal import Decimal
+from functools import cached_property
+
+from django.core.cache import cache
+from django.db import transaction
+
+from ..models import CartItem
+
+INSIGNIA_KEY = "carrito:insignia:{usuario_id}"
+INSIGNIA_TIMEOUT = 60 * 5
+
+
+def insignia_usuario(usuario_id: int) -> dict:
+    clave = INSIGNIA_KEY.format(usuario_id=usuario_id)
+    datos = cache.get(clave)
+    if datos is None:
+        total, unidades = CartItem.objects.filter(cart__usuario_id=usuario_id).resumen()
+        datos = {"unidades": unidades, "total": total}
+        cache.set(clave, datos, INSIGNIA_TIMEOUT)
+    return datos
+
+
+def invalidar_insignia(usuario_id: int) -> None:
+    transaction.on_commit(lambda: cache.delete(INSIGNIA_KEY.format(usuario_id=usuario_id)))
+
+
+class InsigniaCarrito:
+    """Lazy badge data; nothing is read until a template uses it."""
+
+    def __init__(self, request):
+        self.request = request
+
+    @cached_property
+    def _datos(self) -> dict | None:
+        if self.request.user.is_authenticated:
+            return insignia_usuario(self.request.user.pk)
+        return None
+
+    @cached_property
+    def unidades(self) -> int:
+        if self._datos is not None:
+            return self._datos["unidades"]
+        from .almacen import CLAVE_SESION
+
+        return sum((self.request.session.get(CLAVE_SESION) or {}).values())
+
+    @cached_property
+    def total(self) -> Decimal:
+        if self._datos is not None:
+            return self._datos["total"]
+        from .almacen import CarritoSesion
+
+        return CarritoSesion(self.request.session).total()
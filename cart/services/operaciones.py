@@ -0,0 +1,115 @@
+"""Batched cart operations for the JSON cart API.
+
+The page posts one or more ``{"accion", "producto", "cantidad"}`` operations
+and gets back a delta: only the touched lines plus the cart summary
+(subtotal, shipping, total and unit count). A batch is all-or-nothing: the
+cart rows and stock holds roll back with the transaction, and a session
+cart is restored from its snapshot.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import transaction
+
+from products.models import Producto
+
+from ..models import CENTAVO
+from .almacen import costo_envio
+
+ACCIONES = ("agregar", "actualizar", "eliminar")
+MAX_OPERACIONES = 50
+
+
+class OperacionInvalida(ValueError):
+    """The request body does not describe valid operations."""
+
+
+class LineaInexistente(LookupError):
+    """An operation targets a product that is not in the cart (or does not exist)."""
+
+    def __init__(self, producto_id: int):
+        super().__init__(producto_id)
+        self.producto_id = producto_id
+
+
+@dataclass(frozen=True)
+class Operacion:
+    accion: str
+    producto_id: int
+    cantidad: int = 1
+
+
+def leer_operaciones(crudas) -> list[Operacion]:
+    """Validate a decoded JSON list of operations."""
+
+    if not isinstance(crudas, list) or not crudas:
+        raise OperacionInvalida("operaciones debe ser una lista no vacía")
+    if len(crudas) > MAX_OPERACIONES:
+        raise OperacionInvalida(f"Máximo {MAX_OPERACIONES} operaciones por lote")
+    operaciones = []
+    for cruda in crudas:
+        if not isinstance(cruda, dict) or cruda.get("accion") not in ACCIONES:
+            raise OperacionInvalida(f"accion debe ser una de {', '.join(ACCIONES)}")
+        try:
+            producto_id = int(cruda["producto"])
+            cantidad = int(cruda.get("cantidad", 1))
+        except (KeyError, TypeError, ValueError):
+            raise OperacionInvalida("producto y cantidad deben ser enteros") from None
+        if cruda["accion"] == "agregar" and cantidad < 1:
+            raise OperacionInvalida("cantidad debe ser positiva al agregar")
+        operaciones.append(Operacion(cruda["accion"], producto_id, cantidad))
+    return operaciones
+
+
+def aplicar_operaciones(carrito, operaciones: list[Operacion]) -> dict:
+    """Apply ``operaciones`` in one transaction and return the cart delta.
+
+    Raises ``LineaInexistente`` or ``StockNoDisponible`` with nothing applied.
+    """
+
+    productos = Producto.objects.in_bulk({operacion.producto_id for operacion in operaciones})
+    instantanea = carrito.instantanea()
+    try:
+        with transaction.atomic():
+            for operacion in operaciones:
+                producto = productos.get(operacion.producto_id)
+                if producto is None:
+                    raise LineaInexistente(operacion.producto_id)
+                if operacion.accion == "agregar":
+                    carrito.agregar(producto, operacion.cantidad)
+                elif operacion.accion == "actualizar":
+                    if not carrito.actualizar(producto, operacion.cantidad):
+                        raise LineaInexistente(producto.pk)
+                elif not carrito.eliminar(producto.pk):
+                    raise LineaInexistente(producto.pk)
+    except Exception:
+        carrito.restaurar(instantanea)
+        raise
+    return delta_carrito(carrito, list(productos))
+
+
+def delta_carrito(carrito, producto_ids) -> dict:
+    """The ``producto_ids`` lines (``cantidad`` 0 once removed) and the summary."""
+
+    lineas = {linea.producto.pk: linea for linea in carrito.lineas(producto_ids)}
+    subtotal, unidades = carrito.resumen()
+    envio = costo_envio(subtotal)
+    cambios = []
+    for producto_id in producto_ids:
+        linea = lineas.get(producto_id)
+        cambios.append({
+            "producto": producto_id,
+            "cantidad": linea.cantidad if linea else 0,
+            "precio": str(linea.producto.precio) if linea else None,
+            "importe": str(Decimal(linea.importe).quantize(CENTAVO)) if linea else "0.00",
+        })
+    return {
+        "lineas": cambios,
+        "subtotal": str(subtotal),
+        "envio": str(envio),
+        "total": str(subtotal + envio),
+        "unidades": unidades,
+    }
@@ -0,0 +1,141 @@
+"""Time-limited stock holds for cart lines.
+
+Putting a product in a cart claims its units in ``ReservaStock`` for
+``RESERVA_TTL`` seconds (30 minutes by default). A cart line is checked
+against the units left for *other* shoppers:
+
+    disponible = stock - SUM(cantidad of their unexpired holds)
+
+(``stock`` being the live shard total for sharded products, see
+``products.services.stock``.)
+
+That sum is served by the ``(producto, expira)`` index, so a check reads a
+handful of index entries instead of scanning the table. Each hold is set
+inside a transaction that first locks the product row, which serialises
+competing holds on the same product; two shoppers can never both claim
+the last unit. Checkout applies the same rule in its conditional stock
+``UPDATE`` and then drops the buyer's holds.
+
+Expired holds already count for nothing; ``purgar_reservas_expiradas``
+only removes the rows, in batches.
+"""
+
+from __future__ import annotations
+
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from products.models import Producto
+from products.services.stock import expresion_stock
+
+from ..models import ReservaStock
+
+TTL_DEFECTO = 60 * 30
+CLAVE_SESION = "reserva"
+
+
+class StockNoDisponible(Exception):
+    """Raised when a hold asks for more units than are left for the shopper."""
+
+    def __init__(self, producto, disponible: int):
+        super().__init__(producto.nombre)
+        self.producto = producto
+        self.disponible = disponible
+
+
+def _ttl() -> timedelta:
+    return timedelta(seconds=getattr(settings, "RESERVA_TTL", TTL_DEFECTO))
+
+
+def titular_usuario(usuario) -> str:
+    return f"u:{usuario.pk}"
+
+
+def titular_sesion(session) -> str:
+    """Holder id for an anonymous cart; the token survives the login key cycle."""
+
+    if CLAVE_SESION not in session:
+        session[CLAVE_SESION] = secrets.token_urlsafe(16)
+    return f"s:{session[CLAVE_SESION]}"
+
+
+def reservado_por_otros(producto_id, titular: str | None = None, ahora=None):
+    """Subquery-ready queryset with the units other holders have claimed."""
+
+    reservas = ReservaStock.objects.activas(ahora).filter(producto_id=producto_id)
+    if titular:
+        reservas = reservas.exclude(titular=titular)
+    return reservas.values("producto_id").annotate(total=Sum("cantidad")).values("total")
+
+
+def expresion_reservada(titular: str | None = None, producto_ref: str = "pk"):
+    """Units other holders have claimed, as an expression over ``Producto``."""
+
+    reservas = reservado_por_otros(OuterRef(producto_ref), titular)
+    return Coalesce(Subquery(reservas), Value(0))
+
+
+def disponible(producto_id: int, titular: str | None = None) -> int:
+    fila = (
+        Producto.objects.filter(pk=producto_id)
+        .annotate(actual=expresion_stock(), reservado=expresion_reservada(titular))
+        .values_list("actual", "reservado")
+        .first()
+    )
+    return max(fila[0] - fila[1], 0) if fila else 0
+
+
+def reservar(producto, titular: str, cantidad: int) -> None:
+    """Set ``titular``'s hold on ``producto`` to ``cantidad`` units.
+
+    ``cantidad <= 0`` releases the hold. Raises :class:`StockNoDisponible`
+    and leaves the previous hold untouched if the units are not free.
+    """
+
+    with transaction.atomic():
+        if cantidad <= 0:
+            ReservaStock.objects.filter(producto_id=producto.pk, titular=titular).delete()
+            return
+        # Bloquea la fila del producto: las reservas concurrentes esperan su turno
+        bloqueado = Producto.objects.select_for_update().filter(pk=producto.pk)
+        fila = (
+            bloqueado.annotate(actual=expresion_stock(), reservado=expresion_reservada(titular))
+            .values_list("actual", "reservado")
+            .first()
+        )
+        libres = max(fila[0] - fila[1], 0) if fila else 0
+        if cantidad > libres:
+            raise StockNoDisponible(producto, libres)
+        ReservaStock.objects.bulk_create(
+            [ReservaStock(producto_id=producto.pk, titular=titular, cantidad=cantidad, expira=timezone.now() + _ttl())],
+            update_conflicts=True,
+            unique_fields=["producto", "titular"],
+            update_fields=["cantidad", "expira"],
+        )
+
+
+def liberar(titular: str, producto_ids=None) -> int:
+    reservas = ReservaStock.objects.filter(titular=titular)
+    if producto_ids is not None:
+        reservas = reservas.filter(producto_id__in=producto_ids)
+    return reservas.delete()[0]
+
+
+def purgar_reservas_expiradas(lote: int = 1000, ahora=None) -> int:
+    """Delete expired holds ``lote`` rows at a time; returns how many went."""
+
+    ahora = ahora or timezone.now()
+    expiradas = ReservaStock.objects.filter(expira__lte=ahora).order_by("expira")
+    total = 0
+    while True:
+        ids = list(expiradas.values_list("pk", flat=True)[:lote])
+        if not ids:
+            return total
+        borradas, _detalle = ReservaStock.objects.filter(pk__in=ids).delete()
+        total += borradas
@@ -0,0 +1,55 @@
+import weakref
+
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Cart, CartItem
+from .services import fusionar_carrito_sesion, invalidar_insignia
+
+
+@receiver(user_logged_in)
+def fusionar_carrito_al_entrar(sender, request, user, **kwargs):
+    """El carrito anónimo de la sesión pasa al carrito del usuario."""
+    if request is not None and hasattr(request, "session"):
+        fusionar_carrito_sesion(request.session, user)
+
+
+@receiver(post_save, sender=CartItem)
+def invalidar_insignia_item(sender, instance, raw=False, **kwargs):
+    """Red de seguridad para altas y ediciones fuera de los servicios del carrito"""
+    if not raw:
+        invalidar_insignia(instance.cart.usuario_id)
+
+
+# id del origen de un borrado -> carritos ya invalidados por ese borrado. La
+# entrada se va con el origen, antes de que su id pueda reutilizarse.
+_CARRITOS_INVALIDADOS = {}
+
+
+def _carritos_invalidados(origin) -> set:
+    if origin is None:
+        return set()
+    clave = id(origin)
+    if clave not in _CARRITOS_INVALIDADOS:
+        _CARRITOS_INVALIDADOS[clave] = set()
+        weakref.finalize(origin, _CARRITOS_INVALIDADOS.pop, clave, None)
+    return _CARRITOS_INVALIDADOS[clave]
+
+
+@receiver(post_delete, sender=CartItem)
+def invalidar_insignia_item_borrado(sender, instance, origin=None, **kwargs):
+    """Cubre borrados de líneas fuera de los servicios y del admin (p. ej. en cascada)"""
+    # Un mismo borrado resuelve el usuario de cada carrito una sola vez
+    vistos = _carritos_invalidados(origin)
+    if instance.cart_id in vistos:
+        return
+    vistos.add(instance.cart_id)
+    usuario_id = Cart.objects.filter(pk=instance.cart_id).values_list("usuario_id", flat=True).first()
+    if usuario_id is not None:
+        invalidar_insignia(usuario_id)
+
+
+@receiver(post_delete, sender=Cart)
+def invalidar_insignia_carrito_borrado(sender, instance, **kwargs):
+    invalidar_insignia(instance.usuario_id)
@@ -1,3 +1,465 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from cart.models import Cart, CartItem, ReservaStock
+from cart.services import (
+    CarritoBD,
+    InsigniaCarrito,
+    CarritoSesion,
+    StockNoDisponible,
+    disponible,
+    insignia_usuario,
+    purgar_reservas_expiradas,
+    titular_usuario,
+)
+from home.models import ClaveIdempotencia
+from products.models import Producto
+
+
+class AgregarCarritoIdempotenteTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.cliente = User.objects.create_user(username="cliente")
+        vendedor = User.objects.create_user(username="tienda")
+        self.producto = Producto.objects.create(
+            vendedor=vendedor, nombre="Rascador", descripcion="", precio=15, stock=10
+        )
+        self.client.force_login(self.cliente)
+        self.url = reverse("cart:add", args=[self.producto.pk])
+
+    def test_reenvio_con_la_misma_clave_no_suma_dos_veces(self):
+        datos = {"cantidad": 2, "idempotency_key": "clave-formulario-1"}
+        primera = self.client.post(self.url, datos)
+        segunda = self.client.post(self.url, datos)
+
+        self.assertEqual(CartItem.objects.get(producto=self.producto).cantidad, 2)
+        self.assertEqual(segunda.status_code, primera.status_code)
+        self.assertEqual(segunda["Location"], primera["Location"])
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+
+    def test_cabecera_y_claves_distintas(self):
+        self.client.post(self.url, {"cantidad": 1}, headers={"Idempotency-Key": "cabecera-0001"})
+        self.client.post(self.url, {"cantidad": 1}, headers={"Idempotency-Key": "cabecera-0001"})
+        self.client.post(self.url, {"cantidad": 1}, headers={"Idempotency-Key": "cabecera-0002"})
+
+        self.assertEqual(CartItem.objects.get(producto=self.producto).cantidad, 2)
+        self.assertEqual(ClaveIdempotencia.objects.filter(usuario=self.cliente).count(), 2)
+
+    def test_fallo_por_stock_no_se_reproduce(self):
+        datos = {"cantidad": 11, "idempotency_key": "clave-sin-stock"}
+        self.client.post(self.url, datos)
+        self.assertFalse(ClaveIdempotencia.objects.exists())
+
+        Producto.objects.filter(pk=self.producto.pk).update(stock=20)
+        segunda = self.client.post(self.url, datos)
+        self.assertNotIn("Idempotent-Replayed", segunda)
+        self.assertEqual(CartItem.objects.get(producto=self.producto).cantidad, 11)
+
+    def test_reclamacion_abandonada_se_retoma(self):
+        datos = {"cantidad": 1, "idempotency_key": "clave-huerfana"}
+        huerfana = ClaveIdempotencia.objects.create(
+            usuario=self.cliente, ambito="carrito:agregar", clave="clave-huerfana",
+            expira=timezone.now() + timedelta(hours=1),
+        )
+        self.assertEqual(self.client.post(self.url, datos).status_code, 409)
+
+        ClaveIdempotencia.objects.filter(pk=huerfana.pk).update(creada=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(self.client.post(self.url, datos).status_code, 302)
+        self.assertEqual(CartItem.objects.get(producto=self.producto).cantidad, 1)
+
+    def test_anonimo_usa_claves_de_su_sesion(self):
+        self.client.logout()
+        datos = {"cantidad": 2, "idempotency_key": "clave-anonima-1"}
+        self.client.post(self.url, datos)
+        segunda = self.client.post(self.url, datos)
+
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+        self.assertEqual(self.client.session["carrito"], {str(self.producto.pk): 2})
+        clave = ClaveIdempotencia.objects.get()
+        self.assertEqual((clave.usuario, clave.sesion), (None, self.client.session.session_key))
+
+        # Otra sesión con la misma clave no recibe la respuesta de la primera
+        otro = self.client_class()
+        self.assertNotIn("Idempotent-Replayed", otro.post(self.url, datos))
+        self.assertEqual(otro.session["carrito"], {str(self.producto.pk): 2})
+
+    def test_clave_invalida(self):
+        response = self.client.post(self.url, {"cantidad": 1}, headers={"Idempotency-Key": "mala clave"})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+
+class TotalesCarritoTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.cliente = User.objects.create_user(username="cliente")
+        vendedor = User.objects.create_user(username="tienda")
+        self.cart = Cart.objects.create(usuario=self.cliente)
+        for i, (precio, cantidad) in enumerate([("19.99", 3), ("5.50", 2), ("0.10", 7)]):
+            producto = Producto.objects.create(
+                vendedor=vendedor, nombre=f"Producto {i}", descripcion="", precio=Decimal(precio), stock=10
+            )
+            CartItem.objects.create(cart=self.cart, producto=producto, cantidad=cantidad)
+
+    def test_total_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cart.total(), Decimal("71.67"))
+        self.assertEqual(Cart.objects.create(usuario=get_user_model().objects.create_user(username="vacio")).total(), Decimal("0.00"))
+
+    def test_importe_por_linea_anotado(self):
+        importes = sorted(self.cart.items.con_importe().values_list("importe", flat=True))
+        self.assertEqual(importes, [Decimal("0.70"), Decimal("11.00"), Decimal("59.97")])
+
+    def test_detalle_usa_importes_sql(self):
+        self.client.force_login(self.cliente)
+        response = self.client.get(reverse("cart:detail"))
+        self.assertEqual(response.context["cart_total"], Decimal("71.67"))
+        self.assertEqual(response.context["total_with_shipping"], Decimal("76.67"))
+        self.assertContains(response, "$59,97")
+        self.assertContains(response, "$71,67")
+
+
+class CarritoAnonimoTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        vendedor = User.objects.create_user(username="tienda")
+        self.cliente = User.objects.create_user(username="cliente", password="clave-segura-123")
+        self.rascador = Producto.objects.create(
+            vendedor=vendedor, nombre="Rascador", descripcion="", precio=Decimal("15.00"), stock=5
+        )
+        self.pelota = Producto.objects.create(
+            vendedor=vendedor, nombre="Pelota", descripcion="", precio=Decimal("2.50"), stock=10
+        )
+
+    def test_anonimo_usa_la_sesion_sin_tocar_tablas_de_carrito(self):
+        self.client.post(reverse("cart:add", args=[self.rascador.pk]), {"cantidad": 2})
+        self.client.post(reverse("cart:add", args=[self.pelota.pk]), {"cantidad": 3})
+        self.client.post(reverse("cart:update", args=[self.pelota.pk]), {"cantidad": 4})
+
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.client.session["carrito"], {str(self.rascador.pk): 2, str(self.pelota.pk): 4})
+
+        response = self.client.get(reverse("cart:detail"))
+        self.assertEqual(response.context["cart_total"], Decimal("40.00"))
+        self.assertContains(response, "Rascador")
+
+        self.client.post(reverse("cart:remove", args=[self.pelota.pk]))
+        self.assertEqual(self.client.session["carrito"], {str(self.rascador.pk): 2})
+
+    def test_rechaza_cantidades_no_positivas_o_no_enteras(self):
+        for cantidad in ("0", "-2", "dos"):
+            response = self.client.post(reverse("cart:add", args=[self.rascador.pk]), {"cantidad": cantidad})
+            self.assertRedirects(response, reverse("products:detail", args=[self.rascador.pk]))
+        self.client.post(reverse("cart:add", args=[self.rascador.pk]), {"cantidad": 1})
+        self.client.post(reverse("cart:update", args=[self.rascador.pk]), {"cantidad": "-1"})
+        self.assertEqual(self.client.session["carrito"], {str(self.rascador.pk): 1})
+
+        self.client.force_login(self.cliente)
+        response = self.client.post(reverse("cart:add", args=[self.pelota.pk]), {"cantidad": "-3"})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(CartItem.objects.filter(producto=self.pelota).exists())
+
+    def test_stock_incluye_lo_que_ya_esta_en_la_sesion(self):
+        self.client.post(reverse("cart:add", args=[self.rascador.pk]), {"cantidad": 4})
+        self.client.post(reverse("cart:add", args=[self.rascador.pk]), {"cantidad": 2})
+        self.assertEqual(self.client.session["carrito"], {str(self.rascador.pk): 4})
+
+    def test_login_fusiona_en_una_sola_escritura(self):
+        cart = Cart.objects.create(usuario=self.cliente)
+        CartItem.objects.create(cart=cart, producto=self.rascador, cantidad=2)
+        self.client.post(reverse("cart:add", args=[self.rascador.pk]), {"cantidad": 4})
+        self.client.post(reverse("cart:add", args=[self.pelota.pk]), {"cantidad": 1})
+
+        response = self.client.post(
+            reverse("users:login"), {"username": "cliente", "password": "clave-segura-123"}
+        )
+        self.assertEqual(response.status_code, 302)
+
+        cantidades = dict(cart.items.values_list("producto_id", "cantidad"))
+        # 2 + 4 supera el stock (5), así que se recorta
+        self.assertEqual(cantidades, {self.rascador.pk: 5, self.pelota.pk: 1})
+        self.assertNotIn("carrito", self.client.session)
+
+    def test_almacen_de_sesion_ignora_productos_borrados(self):
+        session = {}
+        carrito = CarritoSesion(session)
+        carrito.agregar(self.pelota, 2)
+        carrito.agregar(self.rascador, 1)
+        self.rascador.delete()
+
+        self.assertEqual([linea.producto for linea in carrito.lineas()], [self.pelota])
+        self.assertEqual(carrito.total(), Decimal("5.00"))
+
+
+class ReservasStockTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        vendedor = User.objects.create_user(username="tienda")
+        self.ana = User.objects.create_user(username="ana")
+        self.beto = User.objects.create_user(username="beto")
+        self.producto = Producto.objects.create(
+            vendedor=vendedor, nombre="Oferta", descripcion="", precio=Decimal("9.90"), stock=3
+        )
+
+    def test_agregar_aparta_unidades_para_los_demas(self):
+        CarritoBD(self.ana).agregar(self.producto, 2)
+
+        self.assertEqual(disponible(self.producto.pk), 1)
+        self.assertEqual(disponible(self.producto.pk, titular_usuario(self.ana)), 3)
+        with self.assertRaises(StockNoDisponible):
+            CarritoBD(self.beto).agregar(self.producto, 2)
+        self.assertFalse(CartItem.objects.filter(cart__usuario=self.beto).exists())
+
+    def test_rechazo_temprano_en_la_vista(self):
+        CarritoBD(self.ana).agregar(self.producto, 3)
+        self.client.force_login(self.beto)
+
+        response = self.client.post(reverse("cart:add", args=[self.producto.pk]), {"cantidad": 1})
+
+        self.assertRedirects(response, reverse("products:detail", args=[self.producto.pk]), fetch_redirect_response=False)
+        self.assertFalse(ReservaStock.objects.filter(titular=titular_usuario(self.beto)).exists())
+
+    def test_actualizar_y_eliminar_mueven_la_reserva(self):
+        carrito = CarritoBD(self.ana)
+        carrito.agregar(self.producto, 1)
+        carrito.actualizar(self.producto, 3)
+        self.assertEqual(ReservaStock.objects.get().cantidad, 3)
+
+        carrito.eliminar(self.producto.pk)
+        self.assertFalse(ReservaStock.objects.exists())
+        self.assertEqual(disponible(self.producto.pk), 3)
+
+    def test_reserva_vencida_no_cuenta_y_se_purga(self):
+        CarritoBD(self.ana).agregar(self.producto, 3)
+        ReservaStock.objects.update(expira=timezone.now() - timedelta(seconds=1))
+
+        CarritoBD(self.beto).agregar(self.producto, 2)
+
+        self.assertEqual(purgar_reservas_expiradas(lote=1), 1)
+        self.assertEqual(list(ReservaStock.objects.values_list("titular", flat=True)), [titular_usuario(self.beto)])
+
+    def test_checkout_respeta_reservas_ajenas_y_libera_las_propias(self):
+        from orders.services import StockInsuficiente, crear_orden
+
+        CarritoBD(self.ana).agregar(self.producto, 2)
+        Cart.objects.get_or_create(usuario=self.beto)
+        item = CartItem.objects.create(cart=self.beto.cart, producto=self.producto, cantidad=2)
+        with self.assertRaises(StockInsuficiente):
+            crear_orden(self.beto, [item])
+
+        crear_orden(self.ana, list(self.ana.cart.items.select_related("producto")))
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 1)
+        self.assertFalse(ReservaStock.objects.exists())
+
+    def test_login_traslada_la_reserva_de_la_sesion(self):
+        self.ana.set_password("clave-segura-123")
+        self.ana.save()
+        self.client.post(reverse("cart:add", args=[self.producto.pk]), {"cantidad": 2})
+        self.assertTrue(ReservaStock.objects.get().titular.startswith("s:"))
+
+        self.client.post(reverse("users:login"), {"username": "ana", "password": "clave-segura-123"})
+
+        reserva = ReservaStock.objects.get()
+        self.assertEqual((reserva.titular, reserva.cantidad), (titular_usuario(self.ana), 2))
+
+
+class ReservasConcurrentesTests(TransactionTestCase):
+    COMPRADORES = 6
+
+    def test_la_ultima_unidad_se_reserva_una_sola_vez(self):
+        User = get_user_model()
+        vendedor = User.objects.create_user(username="tienda")
+        producto = Producto.objects.create(
+            vendedor=vendedor, nombre="Última unidad", descripcion="", precio=Decimal("9.00"), stock=1
+        )
+        compradores = [User.objects.create_user(username=f"comprador{i}") for i in range(self.COMPRADORES)]
+        barrera = threading.Barrier(self.COMPRADORES)
+        resultados = []
+
+        def reservar(usuario):
+            try:
+                barrera.wait()
+                CarritoBD(usuario).agregar(producto, 1)
+                resultados.append("ok")
+            except StockNoDisponible:
+                resultados.append("sin_stock")
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=reservar, args=(usuario,)) for usuario in compradores]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(resultados.count("ok"), 1)
+        self.assertEqual(ReservaStock.objects.count(), 1)
+        self.assertEqual(CartItem.objects.count(), 1)
+
+
+class CarritoAPITests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        vendedor = User.objects.create_user(username="tienda")
+        self.cliente = User.objects.create_user(username="cliente")
+        self.collar = Producto.objects.create(
+            vendedor=vendedor, nombre="Collar", descripcion="", precio=Decimal("12.50"), stock=5
+        )
+        self.pelota = Producto.objects.create(
+            vendedor=vendedor, nombre="Pelota", descripcion="", precio=Decimal("3.00"), stock=10
+        )
+        self.client.force_login(self.cliente)
+
+    def _lote(self, operaciones, **extra):
+        return self.client.post(
+            reverse("cart:api"), json.dumps({"operaciones": operaciones}), content_type="application/json", **extra
+        )
+
+    def test_lote_responde_solo_el_delta(self):
+        response = self._lote([
+            {"accion": "agregar", "producto": self.collar.pk, "cantidad": 2},
+            {"accion": "agregar", "producto": self.pelota.pk, "cantidad": 1},
+            {"accion": "actualizar", "producto": self.pelota.pk, "cantidad": 4},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+        self.assertEqual(
+            sorted((linea["producto"], linea["cantidad"], linea["importe"]) for linea in datos["lineas"]),
+            sorted([(self.collar.pk, 2, "25.00"), (self.pelota.pk, 4, "12.00")]),
+        )
+        self.assertEqual((datos["subtotal"], datos["envio"], datos["total"], datos["unidades"]), ("37.00", "5.00", "42.00", 6))
+
+        response = self.client.post(reverse("cart:api_remove", args=[self.collar.pk]))
+        datos = response.json()
+        self.assertEqual(datos["lineas"], [{"producto": self.collar.pk, "cantidad": 0, "precio": None, "importe": "0.00"}])
+        self.assertEqual((datos["subtotal"], datos["unidades"]), ("12.00", 4))
+
+    def test_lote_sin_stock_no_aplica_nada(self):
+        response = self._lote([
+            {"accion": "agregar", "producto": self.pelota.pk, "cantidad": 2},
+            {"accion": "agregar", "producto": self.collar.pk, "cantidad": 6},
+        ])
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["producto"], self.collar.pk)
+        self.assertFalse(CartItem.objects.exists())
+        self.assertFalse(ReservaStock.objects.exists())
+
+    def test_lote_anonimo_restaura_la_sesion(self):
+        self.client.logout()
+        self.client.post(reverse("cart:api_add", args=[self.pelota.pk]), {"cantidad": 1})
+
+        response = self._lote([
+            {"accion": "actualizar", "producto": self.pelota.pk, "cantidad": 3},
+            {"accion": "eliminar", "producto": self.collar.pk},
+        ])
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.session["carrito"], {str(self.pelota.pk): 1})
+
+    def test_operaciones_invalidas(self):
+        self.assertEqual(self._lote([]).status_code, 400)
+        self.assertEqual(self._lote([{"accion": "vaciar", "producto": self.collar.pk}]).status_code, 400)
+        self.assertEqual(self._lote([{"accion": "agregar", "producto": "x"}]).status_code, 400)
+        self.assertEqual(self.client.get(reverse("cart:api")).status_code, 405)
+
+    def test_cambio_de_cantidad_en_consultas_constantes(self):
+        CarritoBD(self.cliente).agregar(self.collar, 1)
+        with self.assertNumQueries(16):
+            self.client.post(
+                reverse("cart:api_update", args=[self.collar.pk]),
+                json.dumps({"cantidad": 3}),
+                content_type="application/json",
+            )
+
+
+class InsigniaCarritoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        vendedor = User.objects.create_user(username="tienda")
+        self.cliente = User.objects.create_user(username="cliente")
+        self.producto = Producto.objects.create(
+            vendedor=vendedor, nombre="Hueso", descripcion="", precio=Decimal("4.25"), stock=10
+        )
+
+    def test_cache_por_usuario_e_invalidacion_al_cambiar(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(insignia_usuario(self.cliente.pk), {"unidades": 0, "total": Decimal("0.00")})
+        with self.assertNumQueries(0):
+            insignia_usuario(self.cliente.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CarritoBD(self.cliente).agregar(self.producto, 2)
+        self.assertEqual(insignia_usuario(self.cliente.pk), {"unidades": 2, "total": Decimal("8.50")})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CarritoBD(self.cliente).eliminar(self.producto.pk)
+        self.assertEqual(insignia_usuario(self.cliente.pk)["unidades"], 0)
+
+    def test_borrados_fuera_de_los_servicios_invalidan(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            CarritoBD(self.cliente).agregar(self.producto, 2)
+        self.assertEqual(insignia_usuario(self.cliente.pk)["unidades"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CartItem.objects.filter(cart__usuario=self.cliente).delete()
+        self.assertEqual(insignia_usuario(self.cliente.pk)["unidades"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CarritoBD(self.cliente).agregar(self.producto, 1)
+        insignia_usuario(self.cliente.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Cart.objects.filter(usuario=self.cliente).delete()
+        self.assertEqual(insignia_usuario(self.cliente.pk)["unidades"], 0)
+
+    def test_borrado_en_lote_resuelve_cada_carrito_una_vez(self):
+        from cart import signals
+
+        for indice in range(3):
+            producto = Producto.objects.create(
+                vendedor=self.producto.vendedor, nombre=f"Pelota {indice}", descripcion="", precio=1, stock=5
+            )
+            CarritoBD(self.cliente).agregar(producto, 1)
+        borrado = CartItem.objects.filter(cart__usuario=self.cliente)
+
+        with CaptureQueriesContext(connection) as consultas:
+            borrado.delete()
+
+        usuarios = [c for c in consultas.captured_queries if c["sql"].startswith('SELECT "cart_cart"."usuario_id"')]
+        self.assertEqual(len(usuarios), 1)
+        self.assertNotIn("_insignias_invalidadas", vars(borrado))
+        del borrado
+        self.assertEqual(signals._CARRITOS_INVALIDADOS, {})
+
+    def test_anonimo_cuenta_desde_la_sesion_sin_consultas(self):
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        request.session = {"carrito": {str(self.producto.pk): 3}}
+
+        with self.assertNumQueries(0):
+            self.assertEqual(InsigniaCarrito(request).unidades, 3)
+        self.assertEqual(InsigniaCarrito(request).total, Decimal("12.75"))
+
+    def test_todas_las_paginas_muestran_la_insignia(self):
+        self.client.force_login(self.cliente)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("cart:add", args=[self.producto.pk]), {"cantidad": 2})
+
+        response = self.client.get(reverse("orders:list"))
+        self.assertContains(response, 'data-insignia-carrito', count=2)
+        self.assertEqual(response.context["carrito_insignia"].unidades, 2)
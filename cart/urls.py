@@ -6,6 +6,10 @@ app_name = "cart"
 urlpatterns = [
     path("", views.cart_detail, name="detail"),
     path("add/<int:product_id>/", views.add_to_cart, name="add"),
-    path("remove/<int:item_id>/", views.remove_from_cart, name="remove"),
+    path("remove/<int:product_id>/", views.remove_from_cart, name="remove"),
     path("update/<int:product_id>/", views.update_cart, name="update"),
+    path("api/", views.cart_api, name="api"),
+    path("api/add/<int:product_id>/", views.add_to_cart_api, name="api_add"),
+    path("api/update/<int:product_id>/", views.update_cart_api, name="api_update"),
+    path("api/remove/<int:product_id>/", views.remove_from_cart_api, name="api_remove"),
 ]
@@ -1,27 +1,32 @@
+import json
+
 from django.shortcuts import get_object_or_404, redirect, render
-from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_POST
 from products.models import Producto
-from .models import Cart, CartItem
 from django.contrib import messages
-from decimal import Decimal  # ← Importa Decimal
+from home.utils.idempotencia import idempotente, no_reproducir
+from .services import (
+    LineaInexistente,
+    OperacionInvalida,
+    StockNoDisponible,
+    aplicar_operaciones,
+    costo_envio,
+    leer_operaciones,
+    obtener_carrito,
+)
 
 
-@login_required
 def cart_detail(request):
-    cart, created = Cart.objects.get_or_create(usuario=request.user)
-    items = cart.items.select_related("producto")
-
-    # Calcular totales - Usar Decimal para consistencia
-    subtotal = Decimal('0.00')
-    for item in items:
-        item.subtotal = item.producto.precio * item.cantidad
-        subtotal += item.subtotal
+    carrito = obtener_carrito(request)
+    # Importe de cada línea y total calculados por el almacén del carrito
+    items = carrito.lineas()
+    subtotal = carrito.total()
 
-    shipping_cost = Decimal('5.00') if subtotal > Decimal('0.00') else Decimal('0.00')  # Usar Decimal
+    shipping_cost = costo_envio(subtotal)
     total = subtotal + shipping_cost
 
     return render(request, "cart/cart_detail.html", {
-        "cart": cart,
         "cart_items": items,
         "cart_total": subtotal,
         "shipping_cost": shipping_cost,
@@ -29,64 +34,140 @@ def cart_detail(request):
     })
 
 
-@login_required
+def _leer_cantidad(request, minimo: int) -> int | None:
+    """Cantidad del formulario, o ``None`` si no es un entero >= ``minimo``"""
+    try:
+        cantidad = int(request.POST.get('cantidad', 1))
+    except (TypeError, ValueError):
+        return None
+    return cantidad if cantidad >= minimo else None
+
+
+@require_POST
+@idempotente("carrito:agregar")
 def add_to_cart(request, product_id):
-    cart, created = Cart.objects.get_or_create(usuario=request.user)
+    carrito = obtener_carrito(request)
     producto = get_object_or_404(Producto, pk=product_id)
 
-    cantidad = int(request.POST.get('cantidad', 1))
+    cantidad = _leer_cantidad(request, minimo=1)
+    if cantidad is None:
+        messages.error(request, "La cantidad debe ser un entero positivo")
+        return no_reproducir(redirect('products:detail', pk=producto.pk))
 
-    # Verificar stock
-    if cantidad > producto.stock:
+    # Reserva el stock al agregar: se rechaza aquí y no en el checkout
+    try:
+        carrito.agregar(producto, cantidad)
+    except StockNoDisponible:
         messages.error(request, f"No hay suficiente stock de {producto.nombre}")
-        return redirect('products:detail', pk=producto.pk)
-
-    item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        producto=producto,
-        defaults={'cantidad': cantidad}
-    )
-
-    if not created:
-        # Verificar que no exceda el stock al actualizar
-        if item.cantidad + cantidad > producto.stock:
-            messages.error(request, f"No hay suficiente stock de {producto.nombre}")
-            return redirect('products:detail', pk=producto.pk)
-        item.cantidad += cantidad
-        item.save()
+        return no_reproducir(redirect('products:detail', pk=producto.pk))
 
     messages.success(request, f"{producto.nombre} agregado al carrito")
     return redirect("cart:detail")
 
 
-@login_required
-def remove_from_cart(request, item_id):
-    cart = get_object_or_404(Cart, usuario=request.user)
-    item = get_object_or_404(CartItem, pk=item_id, cart=cart)
-    item.delete()
+@require_POST
+@idempotente("carrito:eliminar")
+def remove_from_cart(request, product_id):
+    if not obtener_carrito(request).eliminar(product_id):
+        raise Http404("El producto no está en el carrito")
     messages.success(request, "Producto eliminado del carrito")
     return redirect("cart:detail")
 
 
-@login_required
+@require_POST
+@idempotente("carrito:actualizar")
 def update_cart(request, product_id):
-    cart = get_object_or_404(Cart, usuario=request.user)
+    carrito = obtener_carrito(request)
     producto = get_object_or_404(Producto, pk=product_id)
-    item = get_object_or_404(CartItem, cart=cart, producto=producto)
 
-    cantidad = int(request.POST.get('cantidad', 1))
+    # 0 elimina la línea
+    cantidad = _leer_cantidad(request, minimo=0)
+    if cantidad is None:
+        messages.error(request, "La cantidad debe ser un entero positivo")
+        return no_reproducir(redirect('cart:detail'))
 
-    # Verificar stock
-    if cantidad > producto.stock:
+    try:
+        actualizado = carrito.actualizar(producto, cantidad)
+    except StockNoDisponible:
         messages.error(request, f"No hay suficiente stock de {producto.nombre}")
-        return redirect('cart:detail')
-
+        return no_reproducir(redirect('cart:detail'))
+    if not actualizado:
+        raise Http404("El producto no está en el carrito")
     if cantidad <= 0:
-        item.delete()
         messages.success(request, "Producto eliminado del carrito")
     else:
-        item.cantidad = cantidad
-        item.save()
         messages.success(request, "Cantidad actualizada")
 
-    return redirect("cart:detail")
\ No newline at end of file
+    return redirect("cart:detail")
+
+
+def _cuerpo_json(request) -> dict:
+    if request.content_type != "application/json" or not request.body:
+        return {}
+    datos = json.loads(request.body)
+    if not isinstance(datos, dict):
+        raise OperacionInvalida("El cuerpo debe ser un objeto JSON")
+    return datos
+
+
+def _responder_operaciones(request, leer):
+    """Aplica las operaciones y responde solo con lo que cambió"""
+    try:
+        operaciones = leer(_cuerpo_json(request))
+    except (OperacionInvalida, ValueError) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    try:
+        delta = aplicar_operaciones(obtener_carrito(request), operaciones)
+    except LineaInexistente as exc:
+        return JsonResponse({"error": "El producto no está en el carrito", "producto": exc.producto_id}, status=404)
+    except StockNoDisponible as exc:
+        return JsonResponse(
+            {
+                "error": f"No hay suficiente stock de {exc.producto.nombre}",
+                "producto": exc.producto.pk,
+                "disponible": exc.disponible,
+            },
+            status=409,
+        )
+    return JsonResponse(delta)
+
+
+@require_POST
+@idempotente("carrito:api")
+def cart_api(request):
+    """Lote de operaciones en una transacción.
+
+    POST JSON ``{"operaciones": [{"accion": "agregar"|"actualizar"|"eliminar",
+    "producto": id, "cantidad": n}, ...]}``; el frontend agrupa así los clics
+    seguidos en una sola petición.
+    """
+    return _responder_operaciones(request, lambda datos: leer_operaciones(datos.get("operaciones")))
+
+
+def _una_operacion(request, datos, accion, product_id):
+    try:
+        cantidad = int(datos.get("cantidad", request.POST.get("cantidad", 1)))
+    except (TypeError, ValueError):
+        raise OperacionInvalida("cantidad debe ser un entero") from None
+    return leer_operaciones([{"accion": accion, "producto": product_id, "cantidad": cantidad}])
+
+
+# Variantes JSON de add_to_cart, update_cart y remove_from_cart
+
+@require_POST
+@idempotente("carrito:api:agregar")
+def add_to_cart_api(request, product_id):
+    return _responder_operaciones(request, lambda datos: _una_operacion(request, datos, "agregar", product_id))
+
+
+@require_POST
+@idempotente("carrito:api:actualizar")
+def update_cart_api(request, product_id):
+    return _responder_operaciones(request, lambda datos: _una_operacion(request, datos, "actualizar", product_id))
+
+
+@require_POST
+@idempotente("carrito:api:eliminar")
+def remove_from_cart_api(request, product_id):
+    return _responder_operaciones(request, lambda datos: _una_operacion(request, datos, "eliminar", product_id))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from home.services import REGLAS, limpiar
+
+# Las órdenes pendientes se cancelan, no se borran
+VERBOS = {"ordenes_pendientes": ("canceladas", "se cancelarían")}
+
+
+def _lote(valor):
+    if not valor.isdigit() or int(valor) < 1:
+        raise CommandError(f"Lote inválido: {valor} (se espera un entero mayor que 0)")
+    return int(valor)
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra por lotes carritos vacíos o abandonados, sesiones vencidas, perfiles huérfanos, claves de "
+        "idempotencia y reservas vencidas; si se pide, cancela órdenes pendientes sin pago. "
+        "Puede programarse periódicamente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=_lote, default=500, help="Filas borradas por transacción.")
+        parser.add_argument("--dry-run", action="store_true", help="Solo cuenta lo que se borraría.")
+        parser.add_argument(
+            "--regla", action="append", choices=list(REGLAS), help="Ejecuta solo estas reglas (repetible)."
+        )
+        parser.add_argument("--carritos-vacios-dias", type=int, help="Días sin actividad de un carrito vacío.")
+        parser.add_argument("--carritos-dias", type=int, help="Días sin actividad de un carrito con productos.")
+        parser.add_argument(
+            "--ordenes-pendientes-dias",
+            type=int,
+            help="Cancela las órdenes pendientes sin pago con más de estos días (desactivado por defecto).",
+        )
+
+    def handle(self, *args, **options):
+        dias = {
+            "carritos_vacios": options["carritos_vacios_dias"],
+            "carritos_abandonados": options["carritos_dias"],
+            "ordenes_pendientes": options["ordenes_pendientes_dias"],
+        }
+        simular = options["dry_run"]
+        resultados = limpiar(options["regla"], dias, lote=options["lote"], simular=simular)
+        for resultado in resultados:
+            verbo = VERBOS.get(resultado.regla, ("eliminadas", "se borrarían"))[simular]
+            cascada = f" (+{resultado.cascada} en cascada)" if resultado.cascada else ""
+            self.stdout.write(
+                f"{resultado.regla:22} {resultado.filas:7} filas {verbo}{cascada} "
+                f"en {resultado.lotes} lotes, {resultado.segundos:.2f}s"
+            )
+        total = sum(resultado.filas for resultado in resultados)
+        segundos = sum(resultado.segundos for resultado in resultados)
+        prefijo = "Simulación: " if simular else ""
+        self.stdout.write(self.style.SUCCESS(f"{prefijo}{total} filas en {segundos:.2f}s."))
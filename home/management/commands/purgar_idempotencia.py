@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from home.utils.idempotencia import purgar_claves_expiradas
+
+
+def _lote(valor):
+    if not valor.isdigit() or int(valor) < 1:
+        raise CommandError(f"Lote inválido: {valor} (se espera un entero mayor que 0)")
+    return int(valor)
+
+
+class Command(BaseCommand):
+    help = "Elimina por lotes las claves de idempotencia vencidas. Puede programarse periódicamente."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=_lote, default=1000, help="Filas borradas por sentencia.")
+
+    def handle(self, *args, **options):
+        total = purgar_claves_expiradas(lote=options["lote"])
+        self.stdout.write(self.style.SUCCESS(f"{total} claves de idempotencia eliminadas."))
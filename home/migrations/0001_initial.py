@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ambito', models.CharField(max_length=40)),
+                ('clave', models.CharField(max_length=64)),
+                ('estado', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('ubicacion', models.CharField(blank=True, max_length=500)),
+                ('tipo_contenido', models.CharField(blank=True, max_length=100)),
+                ('contenido', models.TextField(blank=True)),
+                ('creada', models.DateTimeField(auto_now_add=True)),
+                ('expira', models.DateTimeField()),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expira'], name='idempotencia_expira_idx')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'ambito', 'clave'), name='idempotencia_clave_unica')],
+            },
+        ),
+    ]
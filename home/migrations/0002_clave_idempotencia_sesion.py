@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='claveidempotencia',
+            name='idempotencia_clave_unica',
+        ),
+        migrations.AddField(
+            model_name='claveidempotencia',
+            name='sesion',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AlterField(
+            model_name='claveidempotencia',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='claveidempotencia',
+            constraint=models.UniqueConstraint(condition=models.Q(('usuario__isnull', False)), fields=('usuario', 'ambito', 'clave'), name='idempotencia_clave_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='claveidempotencia',
+            constraint=models.UniqueConstraint(condition=models.Q(('usuario__isnull', True)), fields=('sesion', 'ambito', 'clave'), name='idempotencia_clave_sesion_unica'),
+        ),
+    ]
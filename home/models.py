@@ -1,3 +1,40 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class ClaveIdempotencia(models.Model):
+    """Resultado guardado de una petición POST identificada por su clave"""
+    # Visitantes anónimos: sin usuario, la clave va ligada a su sesión
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+", null=True, blank=True
+    )
+    sesion = models.CharField(max_length=40, blank=True)
+    ambito = models.CharField(max_length=40)
+    clave = models.CharField(max_length=64)
+    # Sin estado: la petición original todavía se está procesando
+    estado = models.PositiveSmallIntegerField(null=True, blank=True)
+    ubicacion = models.CharField(max_length=500, blank=True)
+    tipo_contenido = models.CharField(max_length=100, blank=True)
+    contenido = models.TextField(blank=True)
+    creada = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["usuario", "ambito", "clave"],
+                condition=models.Q(usuario__isnull=False),
+                name="idempotencia_clave_unica",
+            ),
+            models.UniqueConstraint(
+                fields=["sesion", "ambito", "clave"],
+                condition=models.Q(usuario__isnull=True),
+                name="idempotencia_clave_sesion_unica",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["expira"], name="idempotencia_expira_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.ambito}:{self.clave}"
@@ -6,10 +6,16 @@ from .recommendations import (
     StaticFeaturedProductsProvider,
     get_featured_provider,
 )
+from .limpieza import REGLAS, RETENCION_DEFECTO, ResultadoRegla, limpiar, retencion
 
 __all__ = [
     "FeaturedProductsProvider",
     "DatabaseFeaturedProductsProvider",
     "StaticFeaturedProductsProvider",
     "get_featured_provider",
+    "REGLAS",
+    "RETENCION_DEFECTO",
+    "ResultadoRegla",
+    "limpiar",
+    "retencion",
 ]
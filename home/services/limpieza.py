@@ -0,0 +1,190 @@
+"""Retention rules for rows nobody deletes otherwise.
+
+``limpiar`` runs each rule in ``REGLAS`` over its stale rows, ``lote`` at a
+time, walking the primary key so each batch is a short transaction of its
+own. With ``simular=True`` nothing is deleted and only the rows that would
+go are counted. Retention periods (in days) come from
+``settings.LIMPIEZA_RETENCION`` over ``RETENCION_DEFECTO``; ``None`` turns a
+rule off.
+
+``ordenes_pendientes`` is off by default: checkout leaves every order and
+payment ``pendiente`` until staff move them on, so age alone says nothing
+about abandonment. When it is enabled, stale orders are cancelled
+(``orders.services.cancelar_ordenes``) rather than deleted, keeping their
+lines, payment and invoice.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+RETENCION_DEFECTO = {
+    "carritos_vacios": 1,
+    "carritos_abandonados": 30,
+    "ordenes_pendientes": None,
+}
+LOTE_DEFECTO = 500
+
+
+@dataclass
+class ResultadoRegla:
+    regla: str
+    filas: int = 0
+    cascada: int = 0
+    lotes: int = 0
+    segundos: float = 0.0
+
+
+def retencion(**cambios) -> dict:
+    """Effective retention in days: defaults, then settings, then ``cambios``."""
+
+    dias = {**RETENCION_DEFECTO, **getattr(settings, "LIMPIEZA_RETENCION", {})}
+    dias.update({regla: valor for regla, valor in cambios.items() if valor is not None})
+    return dias
+
+
+def _por_lotes(queryset, lote: int, simular: bool, accion) -> tuple[int, int, int]:
+    """Run ``accion(ids)`` over ``queryset`` in primary-key order, one transaction per batch.
+
+    ``accion`` returns (rows, cascaded rows); the result adds the batch count.
+    """
+
+    if simular:
+        filas = queryset.count()
+        return filas, 0, -(-filas // lote)
+    candidatos = queryset.order_by("pk").values_list("pk", flat=True)
+    filas = cascada = lotes = 0
+    ultimo = None
+    while True:
+        pendientes = candidatos if ultimo is None else candidatos.filter(pk__gt=ultimo)
+        ids = list(pendientes[:lote])
+        if not ids:
+            return filas, cascada, lotes
+        ultimo = ids[-1]
+        with transaction.atomic():
+            hechas, arrastradas = accion(ids)
+        filas += hechas
+        cascada += arrastradas
+        lotes += 1
+
+
+def _borrar_por_lotes(modelo, queryset, lote: int, simular: bool, antes_de_borrar=None) -> tuple[int, int, int]:
+    """Delete ``queryset`` in batches; returns (rows, cascaded rows, batches)."""
+
+    etiqueta = modelo._meta.label
+
+    def borrar(ids):
+        if antes_de_borrar is not None:
+            antes_de_borrar(ids)
+        total, detalle = modelo.objects.filter(pk__in=ids).delete()
+        return detalle.get(etiqueta, 0), total - detalle.get(etiqueta, 0)
+
+    return _por_lotes(queryset, lote, simular, borrar)
+
+
+def _hace(dias: int):
+    return timezone.now() - timedelta(days=dias)
+
+
+def limpiar_carritos_vacios(dias: int, lote: int = LOTE_DEFECTO, simular: bool = False):
+    from cart.models import Cart
+
+    vacios = Cart.objects.filter(actualizado_en__lt=_hace(dias), items__isnull=True)
+    return _borrar_por_lotes(Cart, vacios, lote, simular)
+
+
+def limpiar_carritos_abandonados(dias: int, lote: int = LOTE_DEFECTO, simular: bool = False):
+    from cart.models import Cart
+    from cart.services import invalidar_insignia
+
+    def olvidar_insignias(ids):
+        for usuario_id in Cart.objects.filter(pk__in=ids).values_list("usuario_id", flat=True):
+            invalidar_insignia(usuario_id)
+
+    viejos = Cart.objects.filter(actualizado_en__lt=_hace(dias))
+    return _borrar_por_lotes(Cart, viejos, lote, simular, olvidar_insignias)
+
+
+def limpiar_ordenes_pendientes(dias: int, lote: int = LOTE_DEFECTO, simular: bool = False):
+    """Cancel orders still ``pendiente`` after ``dias`` without an approved payment."""
+
+    from orders.models import Order
+    from orders.services import cancelar_ordenes
+
+    pendientes = Order.objects.filter(estado="pendiente", fecha__lt=_hace(dias)).exclude(payment__estado="aprobado")
+    return _por_lotes(pendientes, lote, simular, lambda ids: (cancelar_ordenes(ids), 0))
+
+
+def limpiar_sesiones(lote: int = LOTE_DEFECTO, simular: bool = False):
+    """Expired sessions; engines without a table clean themselves up."""
+
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if not hasattr(store, "get_model_class"):
+        if not simular:
+            store.clear_expired()
+        return 0, 0, 0
+    modelo = store.get_model_class()
+    vencidas = modelo.objects.filter(expire_date__lt=timezone.now())
+    return _borrar_por_lotes(modelo, vencidas, lote, simular)
+
+
+def limpiar_perfiles_huerfanos(lote: int = LOTE_DEFECTO, simular: bool = False):
+    """Profiles whose user row is gone (only possible if the FK was bypassed)."""
+
+    from users.models import Perfil, Usuario
+
+    huerfanos = Perfil.objects.filter(~Q(usuario_id__in=Usuario.objects.values("pk")))
+    return _borrar_por_lotes(Perfil, huerfanos, lote, simular)
+
+
+def limpiar_claves_idempotencia(lote: int = LOTE_DEFECTO, simular: bool = False):
+    from home.models import ClaveIdempotencia
+
+    vencidas = ClaveIdempotencia.objects.filter(expira__lte=timezone.now())
+    return _borrar_por_lotes(ClaveIdempotencia, vencidas, lote, simular)
+
+
+def limpiar_reservas(lote: int = LOTE_DEFECTO, simular: bool = False):
+    from cart.models import ReservaStock
+
+    vencidas = ReservaStock.objects.filter(expira__lte=timezone.now())
+    return _borrar_por_lotes(ReservaStock, vencidas, lote, simular)
+
+
+# Regla -> función; las que llevan retención reciben ``dias`` como primer argumento
+REGLAS = {
+    "carritos_vacios": limpiar_carritos_vacios,
+    "carritos_abandonados": limpiar_carritos_abandonados,
+    "ordenes_pendientes": limpiar_ordenes_pendientes,
+    "sesiones": limpiar_sesiones,
+    "perfiles_huerfanos": limpiar_perfiles_huerfanos,
+    "claves_idempotencia": limpiar_claves_idempotencia,
+    "reservas": limpiar_reservas,
+}
+
+
+def limpiar(reglas=None, dias: dict | None = None, lote: int = LOTE_DEFECTO, simular: bool = False) -> list[ResultadoRegla]:
+    """Run ``reglas`` (all by default) in order and time each one."""
+
+    if lote < 1:
+        raise ValueError("lote must be at least 1")
+    dias = retencion(**(dias or {}))
+    resultados = []
+    for regla in reglas or REGLAS:
+        argumentos = ()
+        if regla in RETENCION_DEFECTO:
+            if dias.get(regla) is None:
+                continue
+            argumentos = (dias[regla],)
+        inicio = time.perf_counter()
+        filas, cascada, lotes = REGLAS[regla](*argumentos, lote=lote, simular=simular)
+        resultados.append(ResultadoRegla(regla, filas, cascada, lotes, time.perf_counter() - inicio))
+    return resultados
@@ -45,7 +45,7 @@ class DatabaseFeaturedProductsProvider(FeaturedProductsProvider):
         # Late import to avoid circular dependencies when module is imported at startup
         from products.models import Producto as ProductoModel
 
-        self._queryset = queryset or ProductoModel.objects.filter(stock__gt=0)
+        self._queryset = queryset or ProductoModel.objects.en_stock()
 
     def get_featured(self, limit: int = 4) -> Sequence[FeaturedProduct]:
         productos = self._queryset.order_by("-fecha_creacion")[:limit]
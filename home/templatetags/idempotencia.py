@@ -0,0 +1,14 @@
+import uuid
+
+from django import template
+from django.utils.html import format_html
+
+from home.utils.idempotencia import CAMPO_FORMULARIO
+
+register = template.Library()
+
+
+@register.simple_tag
+def campo_idempotencia():
+    """Campo oculto con una clave nueva: reenviar el formulario no repite la acción"""
+    return format_html('<input type="hidden" name="{}" value="{}">', CAMPO_FORMULARIO, uuid.uuid4().hex)
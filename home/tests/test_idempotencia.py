@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from home.models import ClaveIdempotencia
+from home.utils.idempotencia import purgar_claves_expiradas
+
+
+class PurgaIdempotenciaTests(TestCase):
+    def test_borra_solo_las_vencidas_por_lotes(self):
+        usuario = get_user_model().objects.create_user(username="cliente")
+        ahora = timezone.now()
+        ClaveIdempotencia.objects.bulk_create(
+            [
+                ClaveIdempotencia(
+                    usuario=usuario,
+                    ambito="checkout",
+                    clave=f"clave-{i:04d}",
+                    expira=ahora - timedelta(minutes=1) if i < 5 else ahora + timedelta(hours=1),
+                )
+                for i in range(7)
+            ]
+        )
+
+        self.assertEqual(purgar_claves_expiradas(lote=2, ahora=ahora), 5)
+        self.assertEqual(ClaveIdempotencia.objects.count(), 2)
@@ -0,0 +1,94 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+from home.services import limpiar
+from orders.models import Order, Payment, VentaDiaria
+from orders.services import agregar_ventas, crear_orden, embudo_estados
+from products.models import Producto
+
+
+class LimpiezaDatosTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.cliente = User.objects.create_user(username="cliente")
+        self.collar = Producto.objects.create(
+            vendedor=User.objects.create_user(username="tienda"), nombre="Collar", descripcion="", precio=10, stock=5
+        )
+        self.carrito = Cart.objects.create(usuario=self.cliente)
+        self.hace_un_mes = timezone.now() - timedelta(days=31)
+
+    def _orden(self, cantidad, pago=None):
+        orden = crear_orden(self.cliente, [CartItem(cart=self.carrito, producto=self.collar, cantidad=cantidad)])
+        if pago:
+            Payment.objects.create(order=orden, monto=orden.total, estado=pago)
+        Order.objects.filter(pk=orden.pk).update(fecha=self.hace_un_mes)
+        return orden
+
+    def test_ejecucion_por_defecto_no_toca_ordenes(self):
+        orden = self._orden(2)
+
+        call_command("limpiar_datos", stdout=StringIO())
+
+        orden.refresh_from_db()
+        self.assertEqual(orden.estado, "pendiente")
+        self.assertEqual(orden.items.count(), 1)
+        self.collar.refresh_from_db()
+        self.assertEqual(self.collar.stock, 3)
+
+    def test_ordenes_pendientes_se_cancelan_y_devuelven_stock(self):
+        vencida = self._orden(2)
+        pagada = self._orden(1, pago="aprobado")
+        agregar_ventas()
+
+        salida = StringIO()
+        call_command(
+            "limpiar_datos", "--regla", "ordenes_pendientes", "--ordenes-pendientes-dias", "7", "--lote", "1",
+            stdout=salida,
+        )
+
+        self.assertIn("1 filas canceladas", salida.getvalue())
+        self.assertEqual(Order.objects.count(), 2)
+        vencida.refresh_from_db()
+        self.assertEqual(vencida.estado, "cancelado")
+        self.assertTrue(vencida.items.exists())
+        self.collar.refresh_from_db()
+        self.assertEqual(self.collar.stock, 4)
+        self.assertEqual(VentaDiaria.objects.get().ordenes, 1)
+        embudo = {fila["estado"]: fila["ordenes"] for fila in embudo_estados()}
+        self.assertEqual((embudo["pendiente"], embudo["cancelado"]), (1, 1))
+        pagada.refresh_from_db()
+        self.assertEqual(pagada.estado, "pendiente")
+
+    def test_carritos_y_simulacion(self):
+        otro = get_user_model().objects.create_user(username="otro")
+        vacio = Cart.objects.create(usuario=otro)
+        lleno = self.carrito
+        CartItem.objects.create(cart=lleno, producto=self.collar, cantidad=1)
+        Cart.objects.update(actualizado_en=timezone.now() - timedelta(days=2))
+
+        salida = StringIO()
+        call_command("limpiar_datos", "--dry-run", stdout=salida)
+        self.assertIn("Simulación: 1 filas", salida.getvalue())
+        self.assertEqual(Cart.objects.count(), 2)
+
+        call_command("limpiar_datos", "--regla", "carritos_vacios", stdout=StringIO())
+        self.assertEqual(list(Cart.objects.values_list("pk", flat=True)), [lleno.pk])
+        self.assertFalse(Cart.objects.filter(pk=vacio.pk).exists())
+
+        call_command("limpiar_datos", "--regla", "carritos_abandonados", "--carritos-dias", "1", stdout=StringIO())
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_lote_debe_ser_positivo(self):
+        for comando in ("limpiar_datos", "purgar_idempotencia"):
+            with self.subTest(comando=comando), self.assertRaisesMessage(CommandError, "Lote inválido: 0"):
+                call_command(comando, "--lote", "0", stdout=StringIO())
+        with self.assertRaises(ValueError):
+            limpiar(lote=0, simular=True)
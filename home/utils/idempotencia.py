@@ -0,0 +1,182 @@
+"""Idempotency keys for POST endpoints that mutate carts and orders.
+
+Clients send a token either as the ``Idempotency-Key`` header or as the
+``idempotency_key`` form field (rendered by ``{% campo_idempotencia %}``).
+The first request with a given ``(usuario, ambito, clave)`` claims a row in
+``ClaveIdempotencia`` (anonymous visitors are scoped by session key instead
+of user); once the view answers, its redirect or JSON response
+is stored there and every retry within the TTL gets that response replayed
+without running the view again. Other responses (errors, re-rendered forms,
+and redirects the view marks with ``no_reproducir``, such as "out of stock")
+release the claim so the client can retry with the same token. A claim whose
+request never answered (the worker died) is taken over once it is older
+than ``IDEMPOTENCIA_ARRIENDO`` seconds.
+
+Expired rows are removed by ``purgar_claves_expiradas`` in batches.
+"""
+from __future__ import annotations
+
+import re
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+CABECERA = "Idempotency-Key"
+CAMPO_FORMULARIO = "idempotency_key"
+TTL_DEFECTO = 60 * 60 * 24
+ARRIENDO_DEFECTO = 60
+MAX_CONTENIDO = 16 * 1024
+
+_CLAVE_VALIDA = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+def _ttl() -> timedelta:
+    return timedelta(seconds=getattr(settings, "IDEMPOTENCIA_TTL", TTL_DEFECTO))
+
+
+def _arriendo() -> timedelta:
+    return timedelta(seconds=getattr(settings, "IDEMPOTENCIA_ARRIENDO", ARRIENDO_DEFECTO))
+
+
+def no_reproducir(respuesta):
+    """Mark a redirect as a failed outcome so retries run the view again."""
+
+    respuesta.idempotencia_guardar = False
+    return respuesta
+
+
+def clave_de_peticion(request) -> str | None:
+    return request.headers.get(CABECERA) or request.POST.get(CAMPO_FORMULARIO) or None
+
+
+def _titular(request) -> dict:
+    """Owner fields of the request's keys: its user, or its session if anonymous."""
+
+    if request.user.is_authenticated:
+        return {"usuario": request.user}
+    if request.session.session_key is None:
+        request.session.save()
+    return {"usuario": None, "sesion": request.session.session_key}
+
+
+def _reclamar(titular: dict, ambito: str, clave: str):
+    """Return ``(registro, creado)``, replacing an expired row if needed."""
+
+    from home.models import ClaveIdempotencia
+
+    ahora = timezone.now()
+    for _intento in range(2):
+        try:
+            with transaction.atomic():
+                registro = ClaveIdempotencia.objects.create(
+                    **titular, ambito=ambito, clave=clave, expira=ahora + _ttl()
+                )
+            return registro, True
+        except IntegrityError:
+            registro = ClaveIdempotencia.objects.filter(**titular, ambito=ambito, clave=clave).first()
+            if registro is None:
+                continue
+            abandonada = registro.estado is None and registro.creada <= ahora - _arriendo()
+            if abandonada:
+                # La petición original nunca respondió: se libera la reclamación
+                ClaveIdempotencia.objects.filter(pk=registro.pk, estado__isnull=True).delete()
+                continue
+            if registro.expira > ahora:
+                return registro, False
+            ClaveIdempotencia.objects.filter(pk=registro.pk, expira__lte=ahora).delete()
+    return registro, False
+
+
+def _guardable(respuesta) -> bool:
+    if respuesta.streaming or respuesta.status_code >= 400:
+        return False
+    if not getattr(respuesta, "idempotencia_guardar", True):
+        return False
+    if 300 <= respuesta.status_code < 400:
+        return True
+    tipo = respuesta.get("Content-Type", "")
+    return tipo.startswith("application/json") and len(respuesta.content) <= MAX_CONTENIDO
+
+
+def _reproducir(request, registro) -> HttpResponse:
+    respuesta = HttpResponse(
+        registro.contenido,
+        status=registro.estado,
+        content_type=registro.tipo_contenido or None,
+    )
+    if registro.ubicacion:
+        respuesta["Location"] = registro.ubicacion
+        messages.info(request, _("Esta solicitud ya había sido procesada."))
+    respuesta["Idempotent-Replayed"] = "true"
+    return respuesta
+
+
+def idempotente(ambito: str):
+    """Decorate a view so repeated POSTs with the same key run only once.
+
+    Keys are scoped per user, or per session for anonymous visitors.
+    Requests without a key and requests that are not POST pass straight
+    through.
+    """
+
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            clave = clave_de_peticion(request) if request.method == "POST" else None
+            if clave is None:
+                return vista(request, *args, **kwargs)
+            if not _CLAVE_VALIDA.match(clave):
+                return HttpResponseBadRequest(_("Clave de idempotencia inválida."))
+
+            registro, creado = _reclamar(_titular(request), ambito, clave)
+            if not creado:
+                if registro is None or registro.estado is None:
+                    respuesta = HttpResponse(_("La solicitud original aún se está procesando."), status=409)
+                    respuesta["Retry-After"] = "1"
+                    return respuesta
+                return _reproducir(request, registro)
+
+            try:
+                respuesta = vista(request, *args, **kwargs)
+            except BaseException:
+                registro.delete()
+                raise
+
+            if not _guardable(respuesta):
+                registro.delete()
+                return respuesta
+
+            registro.estado = respuesta.status_code
+            registro.ubicacion = respuesta.get("Location", "")
+            registro.tipo_contenido = respuesta.get("Content-Type", "")
+            registro.contenido = "" if registro.ubicacion else respuesta.content.decode(respuesta.charset)
+            registro.save(update_fields=["estado", "ubicacion", "tipo_contenido", "contenido"])
+            return respuesta
+
+        return envoltura
+
+    return decorador
+
+
+def purgar_claves_expiradas(lote: int = 1000, ahora=None) -> int:
+    """Delete expired keys ``lote`` rows at a time; returns how many went."""
+
+    from home.models import ClaveIdempotencia
+
+    if lote < 1:
+        raise ValueError("lote must be at least 1")
+    ahora = ahora or timezone.now()
+    expiradas = ClaveIdempotencia.objects.filter(expira__lte=ahora).order_by("expira")
+    total = 0
+    while True:
+        ids = list(expiradas.values_list("pk", flat=True)[:lote])
+        if not ids:
+            return total
+        borradas, _detalle = ClaveIdempotencia.objects.filter(pk__in=ids).delete()
+        total += borradas
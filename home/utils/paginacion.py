@@ -0,0 +1,188 @@
+"""Keyset (cursor) pagination helpers shared by the listing views and APIs.
+
+Unlike ``django.core.paginator.Paginator`` this never issues ``COUNT(*)`` nor
+``OFFSET``: every page is a ``WHERE (clave) > (ultimo valor)`` range scan over
+a stable ordering, so deep pages cost the same as the first one. Cursors are
+opaque URL-safe tokens encoding the sort key of the boundary row.
+
+Datetime keys are encoded as the database's own text for the value, not as
+``isoformat()``: SQLite compares stored datetimes as strings, and a row
+written with another precision (``Now()`` stores milliseconds) would never
+equal the cursor value and be skipped on the tie-break.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, List, Sequence, Tuple
+
+from django.db.models import CharField, DateTimeField, Q, Value
+from django.db.models.functions import Cast
+
+
+class CursorInvalido(ValueError):
+    """Raised when a cursor token cannot be decoded for the current ordering."""
+
+
+@dataclass
+class PaginaCursor:
+    """One page of results plus the tokens needed to move around it."""
+
+    object_list: List[Any]
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+
+def _normalizar_orden(orden: Sequence[str]) -> List[Tuple[str, bool]]:
+    campos = []
+    for campo in orden:
+        descendente = campo.startswith("-")
+        campos.append((campo.lstrip("-"), descendente))
+    return campos
+
+
+class CursorPaginator:
+    """Paginate ``queryset`` by the unique, non-null ordering ``orden``.
+
+    ``orden`` must end with a unique column (usually ``id``) so the key is a
+    total order; e.g. ``("-fecha_creacion", "-id")`` or ``("nombre", "id")``.
+    Items may be model instances or dicts produced by ``values()``.
+    """
+
+    def __init__(self, queryset, orden: Sequence[str], por_pagina: int = 12):
+        self.queryset = queryset
+        self.orden = tuple(orden)
+        self.campos = _normalizar_orden(self.orden)
+        self.por_pagina = por_pagina
+        self._modelo = queryset.model
+        # Campo -> anotación con su texto tal como lo guarda la base
+        self.crudos = {
+            nombre: f"cursor_{nombre}"
+            for nombre, _ in self.campos
+            if isinstance(self._campo_modelo(nombre), DateTimeField)
+        }
+        if self.crudos:
+            self.queryset = queryset.annotate(
+                **{alias: Cast(nombre, CharField()) for nombre, alias in self.crudos.items()}
+            )
+
+    # -- codificación del cursor -------------------------------------------------
+
+    def _campo_modelo(self, nombre: str):
+        if nombre == "pk":
+            return self._modelo._meta.pk
+        return self._modelo._meta.get_field(nombre)
+
+    def _valor(self, item, nombre: str):
+        if isinstance(item, dict):
+            return item[nombre]
+        return getattr(item, "pk" if nombre == "pk" else self._campo_modelo(nombre).attname)
+
+    def codificar(self, item, direccion: str) -> str:
+        valores = []
+        for nombre, _ in self.campos:
+            if nombre in self.crudos:
+                alias = self.crudos[nombre]
+                valores.append(item[alias] if isinstance(item, dict) else getattr(item, alias))
+                continue
+            valor = self._valor(item, nombre)
+            valores.append(valor.isoformat() if hasattr(valor, "isoformat") else str(valor))
+        carga = {"d": direccion, "v": valores}
+        if self.crudos:
+            carga["r"] = 1
+        carga = json.dumps(carga, separators=(",", ":"))
+        return base64.urlsafe_b64encode(carga.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decodificar(self, token: str) -> Tuple[str, List[Any]]:
+        try:
+            relleno = "=" * (-len(token) % 4)
+            carga = json.loads(base64.urlsafe_b64decode(token + relleno).decode("utf-8"))
+            direccion = carga["d"]
+            crudos = carga["v"]
+            texto_base = bool(carga.get("r"))
+        except (ValueError, TypeError, KeyError) as exc:
+            raise CursorInvalido(token) from exc
+
+        if direccion not in ("n", "p") or len(crudos) != len(self.campos):
+            raise CursorInvalido(token)
+
+        valores = []
+        for (nombre, _), crudo in zip(self.campos, crudos):
+            try:
+                valor = self._campo_modelo(nombre).to_python(crudo)
+            except Exception as exc:  # ValidationError y errores de conversión
+                raise CursorInvalido(token) from exc
+            if nombre in self.crudos and texto_base:
+                # Se compara con el texto guardado, no con el valor reformateado
+                valor = Value(crudo, output_field=CharField())
+            valores.append(valor)
+        return direccion, valores
+
+    # -- consulta ----------------------------------------------------------------
+
+    def _filtro_posterior(self, valores, invertir: bool) -> Q:
+        """Build ``(a, b, c) > (va, vb, vc)`` honouring each field direction."""
+
+        condicion = Q()
+        iguales = Q()
+        for (nombre, descendente), valor in zip(self.campos, valores):
+            hacia_menor = descendente != invertir
+            lookup = f"{nombre}__lt" if hacia_menor else f"{nombre}__gt"
+            condicion |= iguales & Q(**{lookup: valor})
+            iguales &= Q(**{nombre: valor})
+        return condicion
+
+    def _ordenar(self, queryset, invertir: bool):
+        orden = []
+        for nombre, descendente in self.campos:
+            descendente = descendente != invertir
+            orden.append(f"-{nombre}" if descendente else nombre)
+        return queryset.order_by(*orden)
+
+    def pagina(self, cursor: str | None = None) -> PaginaCursor:
+        """Return the page that starts after (or ends before) ``cursor``."""
+
+        direccion, valores = ("n", None) if not cursor else self.decodificar(cursor)
+        hacia_atras = direccion == "p"
+
+        queryset = self.queryset
+        if valores is not None:
+            queryset = queryset.filter(self._filtro_posterior(valores, invertir=hacia_atras))
+        filas = list(self._ordenar(queryset, invertir=hacia_atras)[: self.por_pagina + 1])
+
+        hay_mas = len(filas) > self.por_pagina
+        filas = filas[: self.por_pagina]
+        if hacia_atras:
+            filas.reverse()
+
+        pagina = PaginaCursor(object_list=filas)
+        if not filas:
+            return pagina
+
+        if hacia_atras:
+            pagina.next_cursor = self.codificar(filas[-1], "n")
+            pagina.previous_cursor = self.codificar(filas[0], "p") if hay_mas else None
+        else:
+            pagina.next_cursor = self.codificar(filas[-1], "n") if hay_mas else None
+            pagina.previous_cursor = self.codificar(filas[0], "p") if valores is not None else None
+        return pagina
@@ -1,18 +1,66 @@
 from django.contrib import admin
+from django.http import JsonResponse
+from django.template.response import TemplateResponse
+from django.urls import path
+
 from .models import Order, OrderItem, Payment
+from .services import tablero_cacheado
+
+TABLERO_PERIODOS = (7, 30, 90, 365)
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ("id", "usuario")  # agrega estado y total después
+    list_display = ("id", "usuario", "estado", "total", "fecha")
+    list_filter = ("estado",)
+    list_select_related = ("usuario",)
     search_fields = ("usuario__username",)
+    change_list_template = "admin/orders/order/change_list.html"
+
+    def get_urls(self):
+        urls = [
+            path(
+                "tablero/",
+                self.admin_site.admin_view(self.tablero_view),
+                name="orders_order_tablero",
+            ),
+            path(
+                "tablero/datos/",
+                self.admin_site.admin_view(self.tablero_datos_view),
+                name="orders_order_tablero_datos",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def tablero_view(self, request):
+        """Tablero de ventas: la página solo carga los gráficos desde el JSON cacheado"""
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Tablero de ventas",
+            "periodos": TABLERO_PERIODOS,
+        }
+        return TemplateResponse(request, "admin/orders/order/tablero.html", context)
+
+    def tablero_datos_view(self, request):
+        try:
+            dias = int(request.GET.get("dias", 30))
+        except ValueError:
+            dias = 30
+        if dias not in TABLERO_PERIODOS:
+            return JsonResponse({"error": "dias debe ser uno de: %s" % ", ".join(map(str, TABLERO_PERIODOS))}, status=400)
+        respuesta = JsonResponse(tablero_cacheado(dias))
+        respuesta["Cache-Control"] = "private, max-age=60"
+        return respuesta
 
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ("order", "producto")
-    search_fields = ("order__id", "producto__id")
+    list_display = ("order", "producto_nombre", "cantidad", "precio_unitario")
+    search_fields = ("order__id", "producto__id", "producto_nombre")
 
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
-    list_display = ("order",)  # agrega estado y monto después
+    list_display = ("order", "metodo", "estado", "monto")
+    list_filter = ("metodo", "estado")
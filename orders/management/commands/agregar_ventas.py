@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from orders.services import agregar_ventas, reconstruir_ventas
+from orders.services.ventas import LOTE_ORDENES
+
+
+class Command(BaseCommand):
+    help = (
+        "Suma a las tablas de resumen de ventas las órdenes nuevas desde la última ejecución. "
+        "Es seguro repetirlo; programarlo periódicamente mantiene los reportes al día."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=LOTE_ORDENES, help="Órdenes procesadas por transacción.")
+        parser.add_argument("--maximo-lotes", type=int, help="Detenerse tras N lotes (backfill por tramos).")
+        parser.add_argument(
+            "--reconstruir",
+            action="store_true",
+            help="Borra los resúmenes y los recalcula desde todo el historial.",
+        )
+
+    def handle(self, *args, **options):
+        def progreso(resultado):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  lote {resultado.lotes}: hasta la orden {resultado.ultimo_id}")
+
+        if options["reconstruir"]:
+            resultado = reconstruir_ventas(lote=options["lote"], al_confirmar=progreso)
+        else:
+            resultado = agregar_ventas(
+                lote=options["lote"], maximo_lotes=options["maximo_lotes"], al_confirmar=progreso
+            )
+
+        if not resultado.ordenes:
+            self.stdout.write("No hay órdenes nuevas.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.ordenes} órdenes agregadas en {resultado.lotes} lotes "
+            f"(hasta la orden {resultado.ultimo_id}) en {resultado.segundos:.1f}s."
+        ))
@@ -0,0 +1,76 @@
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as dt_time, timedelta
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.models import Order
+from orders.services.facturas import datos_factura, nombre_factura, ordenes_para_factura, renderizar_pdf
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError as exc:
+        raise CommandError(f"Fecha inválida: {valor} (se espera AAAA-MM-DD)") from exc
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta a un ZIP las facturas de las órdenes creadas entre dos fechas (inclusive). "
+        "Reutiliza los PDF ya guardados y renderiza los que faltan en paralelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("desde", type=_fecha, help="Fecha inicial AAAA-MM-DD.")
+        parser.add_argument("hasta", type=_fecha, help="Fecha final AAAA-MM-DD.")
+        parser.add_argument("--salida", type=Path, help="Archivo ZIP de destino.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--lote", type=int, default=500, help="Órdenes leídas y renderizadas por tanda.")
+
+    def handle(self, *args, **options):
+        desde, hasta = options["desde"], options["hasta"]
+        if desde > hasta:
+            raise CommandError("La fecha inicial es posterior a la final.")
+        salida = Path(options["salida"] or f"facturas_{desde:%Y%m%d}_{hasta:%Y%m%d}.zip")
+
+        zona = timezone.get_current_timezone()
+        inicio_rango = timezone.make_aware(datetime.combine(desde, dt_time.min), zona)
+        fin_rango = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), dt_time.min), zona)
+        ids = list(
+            Order.objects.filter(fecha__gte=inicio_rango, fecha__lt=fin_rango)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        inicio = time.perf_counter()
+        renderizadas = 0
+        with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED) as archivo_zip, \
+                ProcessPoolExecutor(max_workers=options["workers"]) as ejecutor:
+            for posicion in range(0, len(ids), options["lote"]):
+                tanda = ids[posicion:posicion + options["lote"]]
+                datos = [datos_factura(order) for order in ordenes_para_factura(Order.objects.filter(id__in=tanda))]
+                nombres = [nombre_factura(dato) for dato in datos]
+                faltantes = [i for i, nombre in enumerate(nombres) if not default_storage.exists(nombre)]
+
+                pdfs = dict(zip(faltantes, ejecutor.map(renderizar_pdf, [datos[i] for i in faltantes])))
+                for i, (dato, nombre) in enumerate(zip(datos, nombres)):
+                    if i in pdfs:
+                        contenido = pdfs[i]
+                        default_storage.save(nombre, ContentFile(contenido))
+                        renderizadas += 1
+                    else:
+                        with default_storage.open(nombre, "rb") as pdf:
+                            contenido = pdf.read()
+                    archivo_zip.writestr(f"factura_{dato['id']}.pdf", contenido)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(ids)} facturas exportadas a {salida} ({renderizadas} renderizadas con "
+            f"{options['workers']} procesos) en {time.perf_counter() - inicio:.1f}s."
+        ))
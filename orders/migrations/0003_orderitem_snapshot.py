@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:11
+
+from django.db import migrations, models
+
+LOTE = 2000
+
+
+def copiar_productos(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    ultimo = 0
+    while True:
+        filas = list(
+            OrderItem.objects.filter(pk__gt=ultimo)
+            .order_by('pk')
+            .values_list('pk', 'producto__nombre', 'producto__categoria', 'producto__imagen')[:LOTE]
+        )
+        if not filas:
+            break
+        OrderItem.objects.bulk_update(
+            [
+                OrderItem(pk=pk, producto_nombre=nombre, producto_categoria=categoria or '', producto_imagen=imagen or '')
+                for pk, nombre, categoria, imagen in filas
+            ],
+            ['producto_nombre', 'producto_categoria', 'producto_imagen'],
+        )
+        ultimo = filas[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_initial'),
+        ('products', '0003_producto_fecha_creacion_producto_imagen_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='producto_categoria',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='producto_imagen',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='producto_nombre',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.RunPython(copiar_productos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_orderitem_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['usuario', '-fecha', '-id'], name='order_usuario_fecha_idx'),
+        ),
+    ]
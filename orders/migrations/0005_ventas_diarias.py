@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_usuario_fecha_idx'),
+        ('products', '0009_producto_sku'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaAgregacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('ultimo_id', models.PositiveBigIntegerField(default=0)),
+                ('actualizada', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('ordenes', models.PositiveIntegerField(default=0)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('categoria', models.CharField(blank=True, max_length=100)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('producto', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='products.producto')),
+                ('vendedor', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['categoria', 'fecha'], name='venta_categoria_fecha_idx'), models.Index(fields=['vendedor', 'fecha'], name='venta_vendedor_fecha_idx'), models.Index(fields=['producto', 'fecha'], name='venta_producto_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'producto'), name='venta_producto_dia_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:17
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+MARCA_VENTAS = 'ventas_diarias'
+
+
+def preparar_resumenes(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    Payment = apps.get_model('orders', 'Payment')
+    MarcaAgregacion = apps.get_model('orders', 'MarcaAgregacion')
+    ResumenEstadoOrden = apps.get_model('orders', 'ResumenEstadoOrden')
+    VentaDiariaCategoria = apps.get_model('orders', 'VentaDiariaCategoria')
+    VentaDiariaMetodo = apps.get_model('orders', 'VentaDiariaMetodo')
+
+    conteos = dict(Order.objects.values_list('estado').annotate(total=Count('id')).order_by())
+    estados = [estado for estado, _ in Order._meta.get_field('estado').choices]
+    ResumenEstadoOrden.objects.bulk_create([
+        ResumenEstadoOrden(estado=estado, ordenes=conteos.get(estado, 0))
+        for estado in dict.fromkeys([*estados, *conteos])
+    ])
+
+    # Las tablas nuevas se siembran hasta la marca de ``agregar_ventas`` sin
+    # tocar los resúmenes ya agregados; la próxima ejecución sigue desde ahí.
+    marca = MarcaAgregacion.objects.filter(nombre=MARCA_VENTAS).values_list('ultimo_id', flat=True).first()
+    if not marca:
+        return
+    ingreso = Sum(F('cantidad') * F('precio_unitario'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    categorias = (
+        OrderItem.objects.filter(order_id__lte=marca)
+        .exclude(order__estado='cancelado')
+        .annotate(dia=TruncDate('order__fecha'))
+        .values('dia', 'producto_categoria')
+        .annotate(unidades=Sum('cantidad'), ingresos=ingreso)
+        .order_by()
+    )
+    VentaDiariaCategoria.objects.bulk_create([
+        VentaDiariaCategoria(
+            fecha=fila['dia'], categoria=fila['producto_categoria'],
+            unidades=fila['unidades'] or 0, ingresos=fila['ingresos'] or 0,
+        )
+        for fila in categorias
+    ], batch_size=500)
+    metodos = (
+        Payment.objects.filter(order_id__lte=marca)
+        .exclude(order__estado='cancelado')
+        .annotate(dia=TruncDate('order__fecha'))
+        .values('dia', 'metodo')
+        .annotate(ordenes=Count('id'), ingresos=Sum('monto'))
+        .order_by()
+    )
+    VentaDiariaMetodo.objects.bulk_create([
+        VentaDiariaMetodo(fecha=fila['dia'], metodo=fila['metodo'], ordenes=fila['ordenes'], ingresos=fila['ingresos'] or 0)
+        for fila in metodos
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_ventas_diarias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenEstadoOrden',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('pagado', 'Pagado'), ('enviado', 'Enviado'), ('cancelado', 'Cancelado')], max_length=20, unique=True)),
+                ('ordenes', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('categoria', models.CharField(blank=True, max_length=100)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'categoria'), name='venta_categoria_dia_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaMetodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('metodo', models.CharField(choices=[('tarjeta', 'Tarjeta de crédito/débito'), ('paypal', 'PayPal'), ('efectivo', 'Efectivo')], max_length=20)),
+                ('ordenes', models.PositiveIntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'metodo'), name='venta_metodo_dia_unica')],
+            },
+        ),
+        migrations.RunPython(preparar_resumenes, migrations.RunPython.noop),
+    ]
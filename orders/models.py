@@ -1,7 +1,14 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
 from users.models import Usuario
 from products.models import Producto
 
+IMPORTE = DecimalField(max_digits=12, decimal_places=2)
+CENTAVO = Decimal("0.01")
+
 
 class Order(models.Model):
     ESTADOS = [
@@ -16,14 +23,31 @@ class Order(models.Model):
     fecha = models.DateTimeField(auto_now_add=True)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
+    class Meta:
+        indexes = [
+            # Historial del cliente paginado por cursor sobre (fecha, id)
+            models.Index(fields=["usuario", "-fecha", "-id"], name="order_usuario_fecha_idx"),
+        ]
+
     def __str__(self):
         return f"Orden #{self.id} - {self.usuario.username}"
 
     def calcular_total(self):
-        total = sum(item.subtotal() for item in self.items.all())
-        self.total = total
-        self.save()
-        return total
+        self.total = self.items.total()
+        self.save(update_fields=["total"])
+        return self.total
+
+
+class OrderItemQuerySet(models.QuerySet):
+    """Importes de las líneas con el precio pagado, calculados en SQL"""
+
+    def con_importe(self):
+        return self.annotate(importe=ExpressionWrapper(F("cantidad") * F("precio_unitario"), output_field=IMPORTE))
+
+    def total(self):
+        return self.aggregate(
+            total=Coalesce(Sum(F("cantidad") * F("precio_unitario"), output_field=IMPORTE), Value(Decimal("0.00")))
+        )["total"].quantize(CENTAVO)
 
 
 class OrderItem(models.Model):
@@ -31,9 +55,26 @@ class OrderItem(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
     cantidad = models.PositiveIntegerField(default=1)
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    # Copia del producto al momento de la compra: el historial no cambia si se edita
+    producto_nombre = models.CharField(max_length=200, blank=True)
+    producto_categoria = models.CharField(max_length=100, blank=True)
+    producto_imagen = models.CharField(max_length=100, blank=True)
+
+    objects = OrderItemQuerySet.as_manager()
 
     def __str__(self):
-        return f"{self.cantidad} × {self.producto.nombre}"
+        return f"{self.cantidad} × {self.producto_nombre}"
+
+    def save(self, *args, **kwargs):
+        if not self.producto_nombre and self.producto_id:
+            self.copiar_producto(self.producto)
+        super().save(*args, **kwargs)
+
+    def copiar_producto(self, producto):
+        """Guarda nombre, categoría e imagen actuales del producto en la línea"""
+        self.producto_nombre = producto.nombre
+        self.producto_categoria = producto.categoria
+        self.producto_imagen = producto.imagen.name if producto.imagen else ""
 
     def subtotal(self):
         return self.cantidad * self.precio_unitario
@@ -59,3 +100,93 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"Pago de orden #{self.order.id} - {self.estado}"
+
+
+class VentaDiaria(models.Model):
+    """Totales de ventas por día, mantenidos por ``agregar_ventas``"""
+    fecha = models.DateField(unique=True)
+    ordenes = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Ventas {self.fecha}"
+
+
+class VentaDiariaProducto(models.Model):
+    """Unidades e ingresos por producto y día (con vendedor y categoría copiados)"""
+    fecha = models.DateField()
+    # Sin restricción de FK: el resumen sobrevive al borrado del producto
+    producto = models.ForeignKey(
+        Producto, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    vendedor = models.ForeignKey(
+        Usuario, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name="+"
+    )
+    categoria = models.CharField(max_length=100, blank=True)
+    unidades = models.PositiveIntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["fecha", "producto"], name="venta_producto_dia_unica"),
+        ]
+        indexes = [
+            models.Index(fields=["categoria", "fecha"], name="venta_categoria_fecha_idx"),
+            models.Index(fields=["vendedor", "fecha"], name="venta_vendedor_fecha_idx"),
+            models.Index(fields=["producto", "fecha"], name="venta_producto_fecha_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} {self.fecha}"
+
+
+class VentaDiariaCategoria(models.Model):
+    """Unidades e ingresos por categoría y día"""
+    fecha = models.DateField()
+    categoria = models.CharField(max_length=100, blank=True)
+    unidades = models.PositiveIntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["fecha", "categoria"], name="venta_categoria_dia_unica"),
+        ]
+
+    def __str__(self):
+        return f"{self.categoria} {self.fecha}"
+
+
+class VentaDiariaMetodo(models.Model):
+    """Órdenes e importe pagado por método de pago y día"""
+    fecha = models.DateField()
+    metodo = models.CharField(max_length=20, choices=Payment.METODOS)
+    ordenes = models.PositiveIntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["fecha", "metodo"], name="venta_metodo_dia_unica"),
+        ]
+
+    def __str__(self):
+        return f"{self.metodo} {self.fecha}"
+
+
+class ResumenEstadoOrden(models.Model):
+    """Cantidad de órdenes en cada estado, mantenida por ``orders.signals``"""
+    estado = models.CharField(max_length=20, choices=Order.ESTADOS, unique=True)
+    ordenes = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.estado}: {self.ordenes}"
+
+
+class MarcaAgregacion(models.Model):
+    """Último id de orden procesado por un trabajo de agregación incremental"""
+    nombre = models.CharField(max_length=50, unique=True)
+    ultimo_id = models.PositiveBigIntegerField(default=0)
+    actualizada = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo_id}"
@@ -0,0 +1,42 @@
+"""Service layer utilities for the orders app."""
+
+from .checkout import StockInsuficiente, cancelar_ordenes, crear_orden
+from .facturas import obtener_factura, programar_factura, renderizar_pdf
+from .historial import historial_ordenes, paginador_historial
+from .ventas import (
+    agregar_ventas,
+    datos_tablero,
+    descontar_ventas,
+    embudo_estados,
+    mover_estados,
+    reconstruir_ventas,
+    tablero_cacheado,
+    ventas_por_categoria,
+    ventas_por_dia,
+    ventas_por_metodo,
+    ventas_por_producto,
+    ventas_por_vendedor,
+)
+
+__all__ = [
+    "StockInsuficiente",
+    "cancelar_ordenes",
+    "crear_orden",
+    "obtener_factura",
+    "programar_factura",
+    "renderizar_pdf",
+    "historial_ordenes",
+    "paginador_historial",
+    "agregar_ventas",
+    "datos_tablero",
+    "descontar_ventas",
+    "embudo_estados",
+    "mover_estados",
+    "reconstruir_ventas",
+    "tablero_cacheado",
+    "ventas_por_categoria",
+    "ventas_por_dia",
+    "ventas_por_metodo",
+    "ventas_por_producto",
+    "ventas_por_vendedor",
+]
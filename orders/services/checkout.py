@@ -0,0 +1,140 @@
+"""Order creation for the checkout view.
+
+The whole order is written in one transaction: one conditional
+``UPDATE ... SET stock = stock - n WHERE stock >= n + <held by others>``
+per line (which also bumps the sold counter), one ``bulk_create`` for the
+order lines and one delete each for the cart rows and the buyer's stock
+holds. Units other shoppers hold in their carts are not sold (see
+``cart.services.reservas``). Products with sharded stock skip their hot
+row and take the units from one shard instead
+(``products.services.stock``). If any line lacks stock the transaction
+rolls back and nothing is written, so concurrent buyers can never
+oversell. The invoice PDF is queued for rendering once the order commits.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from decimal import Decimal
+from typing import Sequence
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from cart.services.insignia import invalidar_insignia
+from cart.services.reservas import expresion_reservada, liberar, titular_usuario
+from products.models import Producto
+from products.services.stock import descontar_fragmento, expresion_stock, reponer_stock
+from products.services import invalidar_catalogo, invalidar_facetas
+from products.services.catalogo import olvidar_lote
+
+from ..models import Order, OrderItem, Payment
+from .facturas import programar_factura
+from .ventas import descontar_ventas, mover_estados
+
+
+class StockInsuficiente(Exception):
+    """Raised when a cart line cannot be covered by the product stock."""
+
+    def __init__(self, producto):
+        super().__init__(producto.nombre)
+        self.producto = producto
+
+
+def _invalidar_caches(producto_ids) -> None:
+    invalidar_catalogo()
+    invalidar_facetas()
+    for producto_id in producto_ids:
+        olvidar_lote(producto_id)
+
+
+def _vender_fragmentado(item, titular: str) -> bool:
+    libre = expresion_stock() - expresion_reservada(titular)
+    if not Producto.objects.filter(pk=item.producto_id).alias(libre=libre).filter(libre__gte=item.cantidad).exists():
+        return False
+    return descontar_fragmento(item.producto_id, item.cantidad)
+
+
+def crear_orden(usuario, items: Sequence, metodo_pago: str | None = None) -> Order:
+    """Create an order for ``items`` (cart lines with ``producto`` loaded).
+
+    Raises :class:`StockInsuficiente` and leaves the database untouched if
+    any product cannot cover its quantity. A pending ``Payment`` for the
+    order total is recorded when ``metodo_pago`` is given.
+    """
+
+    # Orden estable por producto: evita interbloqueos entre compras concurrentes
+    items = sorted(items, key=lambda item: item.producto_id)
+    total = sum((item.producto.precio * item.cantidad for item in items), Decimal("0.00"))
+    titular = titular_usuario(usuario)
+
+    with transaction.atomic():
+        orden = Order.objects.create(usuario=usuario, estado="pendiente", total=total)
+        # Fecha de Python y no Now(): SQLite guardaría milisegundos y el
+        # cursor de la API v2 compara con el formato de microsegundos
+        ahora = timezone.now()
+
+        for item in items:
+            if item.producto.stock_fragmentado:
+                actualizados = _vender_fragmentado(item, titular)
+            else:
+                actualizados = Producto.objects.filter(
+                    pk=item.producto_id, stock__gte=expresion_reservada(titular) + item.cantidad
+                ).update(
+                    stock=F("stock") - item.cantidad,
+                    unidades_vendidas=F("unidades_vendidas") + item.cantidad,
+                    fecha_actualizacion=ahora,
+                )
+            if not actualizados:
+                raise StockInsuficiente(item.producto)
+
+        lineas = []
+        for item in items:
+            linea = OrderItem(
+                order=orden,
+                producto_id=item.producto_id,
+                cantidad=item.cantidad,
+                precio_unitario=item.producto.precio,
+            )
+            linea.copiar_producto(item.producto)
+            lineas.append(linea)
+        OrderItem.objects.bulk_create(lineas)
+        if metodo_pago:
+            Payment.objects.create(order=orden, metodo=metodo_pago, monto=total)
+
+        if items:
+            items[0].cart.items.filter(pk__in=[item.pk for item in items]).delete()
+            invalidar_insignia(usuario.pk)
+
+        producto_ids = [item.producto_id for item in items]
+        liberar(titular, producto_ids)
+        transaction.on_commit(lambda: _invalidar_caches(producto_ids))
+        transaction.on_commit(lambda: programar_factura(orden.pk))
+
+    return orden
+
+
+def cancelar_ordenes(order_ids) -> int:
+    """Cancel the pending orders among ``order_ids``; returns how many.
+
+    Their units go back to stock and they leave the sales rollups. Lines,
+    payment and invoice are kept as history.
+    """
+
+    with transaction.atomic():
+        ids = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=order_ids, estado="pendiente")
+            .values_list("pk", flat=True)
+        )
+        if not ids:
+            return 0
+        descontar_ventas(ids)
+        cantidades = Counter()
+        for producto_id, cantidad in OrderItem.objects.filter(order_id__in=ids).values_list("producto_id", "cantidad"):
+            cantidades[producto_id] += cantidad
+        reponer_stock(dict(cantidades))
+        Order.objects.filter(pk__in=ids).update(estado="cancelado")
+        mover_estados(sale="pendiente", entra="cancelado", ordenes=len(ids))
+    return len(ids)
@@ -0,0 +1,141 @@
+"""Rendered-once PDF invoices.
+
+An invoice is a pure function of its order data, so the PDF is stored in
+``default_storage`` under ``facturas/factura_<id>_<huella>.pdf`` where
+``huella`` hashes the invoice contents. It is rendered by a small thread
+pool right after checkout commits; the download view only falls back to
+rendering inline if the worker has not finished yet. Editing an order
+changes the hash and therefore the file name, so a stale PDF is never
+served.
+
+``renderizar_pdf`` only needs the plain ``datos_factura`` dict, which makes
+it safe to fan out across worker processes for bulk exports.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.db.models import Prefetch
+from reportlab.pdfgen import canvas
+
+from ..models import Order, OrderItem
+
+LOGGER = logging.getLogger(__name__)
+
+DIRECTORIO = "facturas"
+
+_EJECUTOR: ThreadPoolExecutor | None = None
+_LOCK = threading.Lock()
+
+
+def ordenes_para_factura(queryset=None):
+    """Orders with everything an invoice needs loaded in two queries."""
+
+    queryset = Order.objects.all() if queryset is None else queryset
+    return queryset.select_related("usuario").prefetch_related(
+        Prefetch(
+            "items",
+            queryset=OrderItem.objects.only(
+                "order_id", "producto_nombre", "cantidad", "precio_unitario"
+            ).order_by("id"),
+        )
+    )
+
+
+def datos_factura(order) -> dict:
+    """Plain, picklable invoice contents for a prefetched ``order``."""
+
+    return {
+        "id": order.id,
+        "cliente": order.usuario.username,
+        "lineas": [
+            [item.producto_nombre, item.cantidad, str(item.precio_unitario)]
+            for item in order.items.all()
+        ],
+        "total": str(order.total),
+    }
+
+
+def huella_factura(datos: dict) -> str:
+    carga = json.dumps(datos, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(carga.encode("utf-8")).hexdigest()[:20]
+
+
+def nombre_factura(datos: dict, huella: str | None = None) -> str:
+    return f"{DIRECTORIO}/factura_{datos['id']}_{huella or huella_factura(datos)}.pdf"
+
+
+def renderizar_pdf(datos: dict) -> bytes:
+    """Draw the invoice; identical ``datos`` always produce identical bytes."""
+
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, invariant=1)
+    p.drawString(100, 800, f"Factura Pedido #{datos['id']}")
+    p.drawString(100, 780, f"Cliente: {datos['cliente']}")
+
+    y = 750
+    for nombre, cantidad, precio in datos["lineas"]:
+        p.drawString(100, y, f"{nombre} - Cant: {cantidad} - Precio: {precio}")
+        y -= 20
+
+    p.drawString(100, y - 20, f"Total: {datos['total']}")
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def guardar_factura(datos: dict, storage=None, huella: str | None = None) -> str:
+    """Render ``datos`` into storage unless that exact invoice already exists."""
+
+    storage = storage or default_storage
+    nombre = nombre_factura(datos, huella)
+    if not storage.exists(nombre):
+        storage.save(nombre, ContentFile(renderizar_pdf(datos)))
+    return nombre
+
+
+def obtener_factura(order_id: int, storage=None) -> tuple[str, str]:
+    """Return ``(nombre, huella)`` of the stored invoice, rendering if missing."""
+
+    order = ordenes_para_factura().get(pk=order_id)
+    datos = datos_factura(order)
+    huella = huella_factura(datos)
+    return guardar_factura(datos, storage, huella), huella
+
+
+def _procesar(order_id: int) -> None:
+    close_old_connections()
+    try:
+        obtener_factura(order_id)
+    except Exception:
+        LOGGER.exception("No se pudo generar la factura de la orden %s", order_id)
+    finally:
+        close_old_connections()
+
+
+def _ejecutor() -> ThreadPoolExecutor:
+    global _EJECUTOR
+
+    with _LOCK:
+        if _EJECUTOR is None:
+            _EJECUTOR = ThreadPoolExecutor(
+                max_workers=getattr(settings, "FACTURAS_WORKERS", 2),
+                thread_name_prefix="facturas",
+            )
+    return _EJECUTOR
+
+
+def programar_factura(order_id: int):
+    """Queue invoice rendering off the request path; returns the future."""
+
+    return _ejecutor().submit(_procesar, order_id)
@@ -0,0 +1,42 @@
+"""Customer order history.
+
+Orders are listed newest first and paginated with the shared keyset
+paginator on ``(fecha, id)``, served by the ``(usuario, -fecha, -id)``
+index. Each row is annotated in the same query with its line count and
+the first line's product snapshot for the preview, so rendering a page
+never issues per-order queries.
+"""
+
+from __future__ import annotations
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from home.utils.paginacion import CursorPaginator
+
+from ..models import Order, OrderItem
+
+ORDEN_HISTORIAL = ("-fecha", "-id")
+ORDENES_POR_PAGINA = 20
+
+
+def historial_ordenes(usuario):
+    """Orders of ``usuario`` annotated with ``num_items`` and the preview."""
+
+    lineas = OrderItem.objects.filter(order=OuterRef("pk"))
+    primera = lineas.order_by("id")
+    return Order.objects.filter(usuario=usuario).annotate(
+        num_items=Coalesce(
+            Subquery(
+                lineas.order_by().values("order").annotate(total=Count("pk")).values("total")[:1],
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        ),
+        primer_producto=Subquery(primera.values("producto_nombre")[:1]),
+        primera_imagen=Subquery(primera.values("producto_imagen")[:1]),
+    )
+
+
+def paginador_historial(usuario, por_pagina: int = ORDENES_POR_PAGINA) -> CursorPaginator:
+    return CursorPaginator(historial_ordenes(usuario), ORDEN_HISTORIAL, por_pagina=por_pagina)
@@ -0,0 +1,342 @@
+"""Daily sales rollups for reporting.
+
+The aggregation job keeps four additive tables, one row per day and key:
+
+* ``VentaDiaria``: orders, units and revenue per day.
+* ``VentaDiariaProducto``: units and revenue per product, with the seller
+  and category copied so seller reports never join the catalog.
+* ``VentaDiariaCategoria``: units and revenue per category.
+* ``VentaDiariaMetodo``: paid orders and amount per payment method.
+
+``agregar_ventas`` reads orders with an id above the ``MarcaAgregacion``
+watermark in fixed-size chunks, adds them to every rollup and advances the
+watermark in the same transaction, so a crashed or repeated run never
+double counts. Cancelled orders are skipped when they are aggregated;
+``reconstruir_ventas`` rebuilds everything if order states change later.
+
+Orders cancelled after being aggregated (``cancelar_ordenes``) are taken
+back out with ``descontar_ventas``.
+
+``ResumenEstadoOrden`` (the status funnel) is not derived from the
+watermark: ``orders.signals`` keeps it current on every save, and bulk
+state changes call ``mover_estados``.
+
+Reports and the admin dashboard read these tables only.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from ..models import (
+    MarcaAgregacion,
+    Order,
+    OrderItem,
+    Payment,
+    ResumenEstadoOrden,
+    VentaDiaria,
+    VentaDiariaCategoria,
+    VentaDiariaMetodo,
+    VentaDiariaProducto,
+)
+
+MARCA_VENTAS = "ventas_diarias"
+LOTE_ORDENES = 5000
+
+TABLERO_KEY = "ventas:tablero:{dias}:{marca}"
+TABLERO_TIMEOUT = 60
+
+_INGRESO_LINEA = Sum(F("cantidad") * F("precio_unitario"), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+@dataclass
+class ResultadoAgregacion:
+    ordenes: int = 0
+    lotes: int = 0
+    ultimo_id: int = 0
+    segundos: float = 0.0
+
+
+def _vacio():
+    return {"unidades": 0, "ingresos": Decimal("0")}
+
+
+def _sumar(modelo, campos_clave, acumulado: dict, sumables, reemplazables=()) -> None:
+    """Add ``acumulado`` (key tuple -> values) into ``modelo``.
+
+    One read for the existing keys, one bulk insert and one bulk update.
+    ``reemplazables`` are copied as-is instead of being added.
+    """
+
+    if not acumulado:
+        return
+    filtro = {
+        f"{campo}__in": {clave[posicion] for clave in acumulado}
+        for posicion, campo in enumerate(campos_clave)
+    }
+    existentes = {
+        tuple(getattr(fila, campo) for campo in campos_clave): fila
+        for fila in modelo.objects.filter(**filtro)
+    }
+    nuevas, cambiadas = [], []
+    for clave, datos in acumulado.items():
+        fila = existentes.get(clave)
+        if fila is None:
+            nuevas.append(modelo(**dict(zip(campos_clave, clave)), **datos))
+            continue
+        for campo in sumables:
+            setattr(fila, campo, getattr(fila, campo) + datos[campo])
+        for campo in reemplazables:
+            setattr(fila, campo, datos[campo])
+        cambiadas.append(fila)
+    modelo.objects.bulk_create(nuevas, batch_size=1000)
+    modelo.objects.bulk_update(cambiadas, [*sumables, *reemplazables], batch_size=500)
+
+
+def _agregar_rango(desde_id: int, hasta_id: int, ids=None, signo: int = 1) -> None:
+    """Add orders ``desde_id < id <= hasta_id`` (or exactly ``ids``) to the rollups.
+
+    ``signo=-1`` subtracts them instead.
+    """
+
+    filtro = {"id__in": ids} if ids is not None else {"id__gt": desde_id, "id__lte": hasta_id}
+    por_orden = {f"order__{campo}": valor for campo, valor in filtro.items()}
+    lineas = (
+        OrderItem.objects.filter(**por_orden)
+        .exclude(order__estado="cancelado")
+        .annotate(dia=TruncDate("order__fecha"))
+        .values("dia", "producto_id", "producto__vendedor_id", "producto_categoria")
+        .annotate(unidades=Sum("cantidad"), ingresos=_INGRESO_LINEA)
+        .order_by()
+    )
+    productos, categorias = {}, defaultdict(_vacio)
+    dias = defaultdict(lambda: {"ordenes": 0, **_vacio()})
+    for fila in lineas:
+        unidades = (fila["unidades"] or 0) * signo
+        ingresos = (fila["ingresos"] or Decimal("0")) * signo
+        producto = productos.setdefault((fila["dia"], fila["producto_id"]), _vacio())
+        producto["vendedor_id"] = fila["producto__vendedor_id"]
+        producto["categoria"] = fila["producto_categoria"]
+        for destino in (producto, categorias[(fila["dia"], fila["producto_categoria"])], dias[(fila["dia"],)]):
+            destino["unidades"] += unidades
+            destino["ingresos"] += ingresos
+
+    ordenes = (
+        Order.objects.filter(**filtro)
+        .exclude(estado="cancelado")
+        .annotate(dia=TruncDate("fecha"))
+        .values("dia")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    for fila in ordenes:
+        dias[(fila["dia"],)]["ordenes"] += fila["total"] * signo
+
+    metodos = {
+        (fila["dia"], fila["metodo"]): {
+            "ordenes": fila["ordenes"] * signo,
+            "ingresos": (fila["ingresos"] or Decimal("0")) * signo,
+        }
+        for fila in Payment.objects.filter(**por_orden)
+        .exclude(order__estado="cancelado")
+        .annotate(dia=TruncDate("order__fecha"))
+        .values("dia", "metodo")
+        .annotate(ordenes=Count("id"), ingresos=Sum("monto"))
+        .order_by()
+    }
+
+    _sumar(VentaDiariaProducto, ("fecha", "producto_id"), productos, ("unidades", "ingresos"), ("vendedor_id", "categoria"))
+    _sumar(VentaDiariaCategoria, ("fecha", "categoria"), categorias, ("unidades", "ingresos"))
+    _sumar(VentaDiaria, ("fecha",), dias, ("ordenes", "unidades", "ingresos"))
+    _sumar(VentaDiariaMetodo, ("fecha", "metodo"), metodos, ("ordenes", "ingresos"))
+
+
+def _procesar_lote(lote: int) -> tuple[int, int] | None:
+    """Aggregate the next ``lote`` orders; returns ``(ordenes, ultimo_id)``."""
+
+    with transaction.atomic():
+        marca, _ = MarcaAgregacion.objects.select_for_update().get_or_create(nombre=MARCA_VENTAS)
+        ids = list(
+            Order.objects.filter(id__gt=marca.ultimo_id).order_by("id").values_list("id", flat=True)[:lote]
+        )
+        if not ids:
+            return None
+
+        _agregar_rango(marca.ultimo_id, ids[-1])
+        marca.ultimo_id = ids[-1]
+        marca.save(update_fields=["ultimo_id", "actualizada"])
+    return len(ids), ids[-1]
+
+
+def agregar_ventas(lote: int = LOTE_ORDENES, maximo_lotes: int | None = None, al_confirmar=None) -> ResultadoAgregacion:
+    """Fold every order above the watermark into the rollups, ``lote`` at a time."""
+
+    resultado = ResultadoAgregacion()
+    inicio = time.perf_counter()
+    while maximo_lotes is None or resultado.lotes < maximo_lotes:
+        procesado = _procesar_lote(lote)
+        if procesado is None:
+            break
+        resultado.ordenes += procesado[0]
+        resultado.ultimo_id = procesado[1]
+        resultado.lotes += 1
+        resultado.segundos = time.perf_counter() - inicio
+        if al_confirmar:
+            al_confirmar(resultado)
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def descontar_ventas(order_ids) -> int:
+    """Subtract already aggregated orders from the rollups; returns how many.
+
+    Call it in the same transaction that deletes or cancels the orders,
+    before they change. Orders above the watermark were never added.
+    """
+
+    with transaction.atomic():
+        marca, _ = MarcaAgregacion.objects.select_for_update().get_or_create(nombre=MARCA_VENTAS)
+        agregadas = [order_id for order_id in order_ids if order_id <= marca.ultimo_id]
+        if agregadas:
+            _agregar_rango(0, 0, ids=agregadas, signo=-1)
+    return len(agregadas)
+
+
+def mover_estados(sale: str | None = None, entra: str | None = None, ordenes: int = 1) -> None:
+    """Move ``ordenes`` orders between funnel states without recounting."""
+
+    if sale:
+        ResumenEstadoOrden.objects.filter(estado=sale).update(ordenes=Greatest(F("ordenes") - ordenes, Value(0)))
+    if entra and not ResumenEstadoOrden.objects.filter(estado=entra).update(ordenes=F("ordenes") + ordenes):
+        resumen, creado = ResumenEstadoOrden.objects.get_or_create(estado=entra, defaults={"ordenes": ordenes})
+        if not creado:
+            ResumenEstadoOrden.objects.filter(pk=resumen.pk).update(ordenes=F("ordenes") + ordenes)
+
+
+def recalcular_estados() -> None:
+    """Rebuild the status funnel counters from ``Order``."""
+
+    with transaction.atomic():
+        ResumenEstadoOrden.objects.all().delete()
+        conteos = dict(Order.objects.values_list("estado").annotate(total=Count("id")).order_by())
+        ResumenEstadoOrden.objects.bulk_create([
+            ResumenEstadoOrden(estado=estado, ordenes=conteos.get(estado, 0))
+            for estado in dict.fromkeys([*(estado for estado, _ in Order.ESTADOS), *conteos])
+        ])
+
+
+def reconstruir_ventas(lote: int = LOTE_ORDENES, al_confirmar=None) -> ResultadoAgregacion:
+    """Drop the rollups and rebuild them from the whole order history."""
+
+    with transaction.atomic():
+        for modelo in (VentaDiariaProducto, VentaDiariaCategoria, VentaDiariaMetodo, VentaDiaria):
+            modelo.objects.all().delete()
+        MarcaAgregacion.objects.filter(nombre=MARCA_VENTAS).delete()
+    recalcular_estados()
+    return agregar_ventas(lote=lote, al_confirmar=al_confirmar)
+
+
+# -- reportes ----------------------------------------------------------------
+
+def _rango(queryset, desde=None, hasta=None):
+    if desde:
+        queryset = queryset.filter(fecha__gte=desde)
+    if hasta:
+        queryset = queryset.filter(fecha__lte=hasta)
+    return queryset
+
+
+def ventas_por_dia(desde=None, hasta=None):
+    return _rango(VentaDiaria.objects.all(), desde, hasta).order_by("fecha").values(
+        "fecha", "ordenes", "unidades", "ingresos"
+    )
+
+
+def _ventas_agrupadas(modelo, campos, desde=None, hasta=None, limite=None):
+    filas = (
+        _rango(modelo.objects.all(), desde, hasta)
+        .values(*campos)
+        .annotate(unidades=Sum("unidades"), ingresos=Sum("ingresos"))
+        .order_by("-ingresos", *campos)
+    )
+    return filas[:limite] if limite is not None else filas
+
+
+def ventas_por_categoria(desde=None, hasta=None, limite=None):
+    return _ventas_agrupadas(VentaDiariaCategoria, ["categoria"], desde, hasta, limite)
+
+
+def ventas_por_vendedor(desde=None, hasta=None, limite=None):
+    return _ventas_agrupadas(VentaDiariaProducto, ["vendedor_id", "vendedor__username"], desde, hasta, limite)
+
+
+def ventas_por_producto(desde=None, hasta=None, limite=None):
+    return _ventas_agrupadas(VentaDiariaProducto, ["producto_id", "producto__nombre"], desde, hasta, limite)
+
+
+def ventas_por_metodo(desde=None, hasta=None):
+    return (
+        _rango(VentaDiariaMetodo.objects.all(), desde, hasta)
+        .values("metodo")
+        .annotate(ordenes=Sum("ordenes"), ingresos=Sum("ingresos"))
+        .order_by("-ingresos", "metodo")
+    )
+
+
+def embudo_estados() -> list[dict]:
+    """Orders per status in the natural order of ``Order.ESTADOS``."""
+
+    conteos = dict(ResumenEstadoOrden.objects.values_list("estado", "ordenes"))
+    return [
+        {"estado": estado, "nombre": str(nombre), "ordenes": conteos.get(estado, 0)}
+        for estado, nombre in Order.ESTADOS
+    ]
+
+
+def datos_tablero(dias: int = 30) -> dict:
+    """Chart series for the staff dashboard over the last ``dias`` days."""
+
+    hasta = timezone.localdate()
+    desde = hasta - timedelta(days=dias - 1)
+    por_dia = {fila["fecha"]: fila for fila in ventas_por_dia(desde, hasta)}
+    serie = []
+    for desplazamiento in range(dias):
+        dia = desde + timedelta(days=desplazamiento)
+        fila = por_dia.get(dia, {})
+        serie.append({
+            "fecha": dia.isoformat(),
+            "ordenes": fila.get("ordenes", 0),
+            "ingresos": float(fila.get("ingresos", 0)),
+        })
+    return {
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "ingresos_por_dia": serie,
+        "top_categorias": [
+            {"categoria": fila["categoria"] or "Sin categoría", "unidades": fila["unidades"], "ingresos": float(fila["ingresos"])}
+            for fila in ventas_por_categoria(desde, hasta, limite=8)
+        ],
+        "metodos_pago": [
+            {"metodo": fila["metodo"], "ordenes": fila["ordenes"], "ingresos": float(fila["ingresos"])}
+            for fila in ventas_por_metodo(desde, hasta)
+        ],
+        "embudo_estados": embudo_estados(),
+    }
+
+
+def tablero_cacheado(dias: int = 30) -> dict:
+    """``datos_tablero`` cached per watermark for ``TABLERO_TIMEOUT`` seconds."""
+
+    marca = MarcaAgregacion.objects.filter(nombre=MARCA_VENTAS).values_list("ultimo_id", flat=True).first() or 0
+    clave = TABLERO_KEY.format(dias=dias, marca=marca)
+    return cache.get_or_set(clave, lambda: datos_tablero(dias), TABLERO_TIMEOUT)
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Order
+from .services import mover_estados
+
+
+@receiver(pre_save, sender=Order)
+def recordar_estado_anterior(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._estado_anterior = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and "estado" not in update_fields:
+        instance._estado_anterior = instance.estado
+        return
+    instance._estado_anterior = Order.objects.filter(pk=instance.pk).values_list("estado", flat=True).first()
+
+
+@receiver(post_save, sender=Order)
+def actualizar_embudo(sender, instance, created, **kwargs):
+    if created:
+        mover_estados(entra=instance.estado)
+    elif instance._estado_anterior and instance._estado_anterior != instance.estado:
+        mover_estados(sale=instance._estado_anterior, entra=instance.estado)
+
+
+@receiver(post_delete, sender=Order)
+def descontar_orden_borrada(sender, instance, **kwargs):
+    mover_estados(sale=instance.estado)
@@ -1,12 +1,41 @@
+import tempfile
+import threading
+import zipfile
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 from cart.models import Cart, CartItem
-from orders.models import Order
+from orders.models import (
+    Order,
+    OrderItem,
+    Payment,
+    VentaDiaria,
+    VentaDiariaMetodo,
+    VentaDiariaProducto,
+)
+from orders.services import (
+    StockInsuficiente,
+    agregar_ventas,
+    crear_orden,
+    embudo_estados,
+    obtener_factura,
+    paginador_historial,
+    reconstruir_ventas,
+)
 from products.models import Producto
+from products.services import fragmentar_stock
 
 
 class CheckoutViewTests(TestCase):
@@ -66,6 +95,46 @@ class CheckoutViewTests(TestCase):
         self.assertFalse(self.cart.items.exists())
         self.assertTrue(response.url.endswith(reverse("orders:confirm", args=[order.id])))
 
+    def test_double_submit_with_same_key_creates_one_order(self):
+        self.client.login(username="cliente", password="pass1234")
+        payload = {
+            "email": "cliente@example.com",
+            "nombre": "Cliente Demo",
+            "telefono": "3001234567",
+            "ciudad": "Medellín",
+            "direccion": "Calle 123 #45-67",
+            "metodo_pago": "tarjeta",
+            "numero_tarjeta": "4111111111111111",
+            "expiracion": "12/30",
+            "cvv": "123",
+            "idempotency_key": "checkout-clave-1",
+        }
+
+        first = self.client.post(reverse("orders:checkout"), payload)
+        # El carrito ya está vacío: sin la clave esto redirigiría al carrito
+        second = self.client.post(reverse("orders:checkout"), payload)
+
+        self.assertEqual(Order.objects.filter(usuario=self.customer).count(), 1)
+        self.assertEqual(second["Location"], first["Location"])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 8)
+
+    def test_verificacion_de_stock_en_una_consulta(self):
+        for nombre in ("Cama", "Plato", "Correa"):
+            producto = Producto.objects.create(
+                vendedor=self.seller, nombre=nombre, descripcion="", precio=Decimal("5.00"), stock=4
+            )
+            fragmentar_stock(producto.pk, fragmentos=2)
+            CartItem.objects.create(cart=self.cart, producto=producto, cantidad=1)
+        self.client.login(username="cliente", password="pass1234")
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse("orders:checkout"))
+
+        self.assertEqual(response.status_code, 200)
+        fragmentos = [q for q in consultas.captured_queries if "products_fragmentostock" in q["sql"]]
+        self.assertEqual(len(fragmentos), 1)
+
     def test_checkout_with_missing_card_data_shows_errors(self):
         self.client.login(username="cliente", password="pass1234")
         payload = {
@@ -83,3 +152,433 @@ class CheckoutViewTests(TestCase):
         self.assertContains(response, "Este campo es obligatorio para pagos con tarjeta.")
         self.assertEqual(Order.objects.count(), 0)
         self.assertTrue(self.cart.items.exists())
+
+
+class CheckoutAtomicoTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.cliente = User.objects.create_user(username="comprador")
+        vendedor = User.objects.create_user(username="tienda")
+        self.collar = Producto.objects.create(
+            vendedor=vendedor, nombre="Collar", descripcion="", precio=Decimal("10.00"), stock=5
+        )
+        self.cama = Producto.objects.create(
+            vendedor=vendedor, nombre="Cama", descripcion="", precio=Decimal("40.00"), stock=1
+        )
+        self.cart = Cart.objects.create(usuario=self.cliente)
+        CartItem.objects.create(cart=self.cart, producto=self.collar, cantidad=2)
+        CartItem.objects.create(cart=self.cart, producto=self.cama, cantidad=1)
+
+    def _items(self):
+        return list(self.cart.items.select_related("producto"))
+
+    def test_crea_orden_descuenta_stock_y_vacia_carrito(self):
+        orden = crear_orden(self.cliente, self._items())
+
+        self.assertEqual(orden.total, Decimal("60.00"))
+        self.assertEqual(orden.items.count(), 2)
+        self.collar.refresh_from_db()
+        self.cama.refresh_from_db()
+        self.assertEqual((self.collar.stock, self.collar.unidades_vendidas), (3, 2))
+        self.assertEqual((self.cama.stock, self.cama.unidades_vendidas), (0, 1))
+        self.assertFalse(self.cart.items.exists())
+
+    def test_stock_insuficiente_revierte_todo(self):
+        items = self._items()
+        # Otro comprador se lleva la cama después de cargar el carrito
+        Producto.objects.filter(pk=self.cama.pk).update(stock=0)
+
+        with self.assertRaises(StockInsuficiente) as ctx:
+            crear_orden(self.cliente, items)
+
+        self.assertEqual(ctx.exception.producto.pk, self.cama.pk)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.collar.refresh_from_db()
+        self.assertEqual((self.collar.stock, self.collar.unidades_vendidas), (5, 0))
+        self.assertEqual(self.cart.items.count(), 2)
+
+    def test_consultas_constantes_por_linea(self):
+        items = self._items()
+        # savepoint + orden + embudo + un UPDATE por línea + bulk_create
+        # + lectura y borrado de líneas + usuario del carrito (insignia) + reservas + release
+        with self.assertNumQueries(11):
+            crear_orden(self.cliente, items)
+
+    def test_api_v2_pagina_productos_vendidos(self):
+        # El checkout actualiza con .update(): las fechas que deja deben
+        # coincidir con las del cursor o la API salta productos empatados
+        crear_orden(self.cliente, self._items())
+        self.assertEqual(len(set(Producto.objects.values_list("fecha_actualizacion", flat=True))), 1)
+
+        ids, cursor = [], None
+        for _ in range(5):
+            parametros = {"fields": "id", "limit": 1}
+            if cursor:
+                parametros["cursor"] = cursor
+            payload = self.client.get(reverse("products:api_v2_products"), parametros).json()
+            ids += [item["id"] for item in payload["results"]]
+            cursor = payload["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(sorted(ids), [self.collar.pk, self.cama.pk])
+
+
+class CheckoutConcurrenteTests(TransactionTestCase):
+    COMPRADORES = 8
+
+    def test_compras_simultaneas_no_sobrevenden(self):
+        User = get_user_model()
+        vendedor = User.objects.create_user(username="tienda")
+        producto = Producto.objects.create(
+            vendedor=vendedor, nombre="Última unidad", descripcion="", precio=Decimal("9.00"), stock=1
+        )
+        carritos = []
+        for i in range(self.COMPRADORES):
+            cart = Cart.objects.create(usuario=User.objects.create_user(username=f"comprador{i}"))
+            CartItem.objects.create(cart=cart, producto=producto, cantidad=1)
+            carritos.append(cart)
+
+        barrera = threading.Barrier(self.COMPRADORES)
+        resultados = []
+
+        def comprar(cart):
+            try:
+                items = list(cart.items.select_related("producto"))
+                barrera.wait()
+                crear_orden(cart.usuario, items)
+                resultados.append("ok")
+            except StockInsuficiente:
+                resultados.append("sin_stock")
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=comprar, args=(cart,)) for cart in carritos]
+        with mock.patch("orders.services.checkout.programar_factura"):
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+        producto.refresh_from_db()
+        self.assertEqual(resultados.count("ok"), 1)
+        self.assertEqual(resultados.count("sin_stock"), self.COMPRADORES - 1)
+        self.assertEqual(producto.stock, 0)
+        self.assertEqual(producto.unidades_vendidas, 1)
+        self.assertEqual(OrderItem.objects.filter(producto=producto).count(), 1)
+
+
+class FacturasTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=self.media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        User = get_user_model()
+        self.cliente = User.objects.create_user(username="cliente", password="pass1234")
+        vendedor = User.objects.create_user(username="tienda")
+        self.cart = Cart.objects.create(usuario=self.cliente)
+        for i in range(3):
+            producto = Producto.objects.create(
+                vendedor=vendedor, nombre=f"Juguete {i}", descripcion="", precio=Decimal("4.00"), stock=5
+            )
+            CartItem.objects.create(cart=self.cart, producto=producto, cantidad=1)
+
+    def _orden(self):
+        with mock.patch("orders.services.checkout.programar_factura") as programar:
+            with self.captureOnCommitCallbacks(execute=True):
+                orden = crear_orden(self.cliente, list(self.cart.items.select_related("producto")))
+        programar.assert_called_once_with(orden.pk)
+        return orden
+
+    def test_factura_se_guarda_una_vez_sin_n_mas_1(self):
+        orden = self._orden()
+        with self.assertNumQueries(2):
+            nombre, huella = obtener_factura(orden.pk)
+        self.assertTrue(default_storage.exists(nombre))
+        self.assertIn(huella, nombre)
+
+        with mock.patch("orders.services.facturas.renderizar_pdf") as renderizar:
+            self.assertEqual(obtener_factura(orden.pk), (nombre, huella))
+        renderizar.assert_not_called()
+
+        orden.total = Decimal("1.00")
+        orden.save()
+        self.assertNotEqual(obtener_factura(orden.pk)[0], nombre)
+
+    def test_descarga_con_etag_y_solo_para_el_dueno(self):
+        orden = self._orden()
+        url = reverse("orders:factura", args=[orden.pk])
+        self.client.login(username="cliente", password="pass1234")
+
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta["Content-Type"], "application/pdf")
+        self.assertTrue(b"".join(respuesta.streaming_content).startswith(b"%PDF"))
+
+        repetida = self.client.get(url, headers={"If-None-Match": respuesta["ETag"]})
+        self.assertEqual(repetida.status_code, 304)
+
+        otro = get_user_model().objects.create_user(username="otro")
+        self.client.force_login(otro)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_exportar_zip_por_rango(self):
+        orden = self._orden()
+        salida = Path(self.media.name) / "facturas.zip"
+        hoy = timezone.localdate().isoformat()
+
+        call_command("exportar_facturas", hoy, hoy, salida=salida, workers=1, stdout=StringIO())
+
+        with zipfile.ZipFile(salida) as archivo_zip:
+            self.assertEqual(archivo_zip.namelist(), [f"factura_{orden.pk}.pdf"])
+            self.assertTrue(archivo_zip.read(f"factura_{orden.pk}.pdf").startswith(b"%PDF"))
+        self.assertTrue(default_storage.exists(obtener_factura(orden.pk)[0]))
+
+
+class SnapshotLineasTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.cliente = User.objects.create_user(username="cliente", password="pass1234")
+        vendedor = User.objects.create_user(username="tienda")
+        self.producto = Producto.objects.create(
+            vendedor=vendedor, nombre="Arnés", descripcion="", categoria="Perros", precio=Decimal("12.00"), stock=3
+        )
+        cart = Cart.objects.create(usuario=self.cliente)
+        CartItem.objects.create(cart=cart, producto=self.producto, cantidad=2)
+        self.orden = crear_orden(self.cliente, list(cart.items.select_related("producto")))
+
+    def test_linea_conserva_el_producto_de_la_compra(self):
+        Producto.objects.filter(pk=self.producto.pk).update(nombre="Arnés reforzado", categoria="Gatos")
+
+        linea = OrderItem.objects.get(order=self.orden)
+        self.assertEqual((linea.producto_nombre, linea.producto_categoria), ("Arnés", "Perros"))
+        self.assertEqual(str(linea), "2 × Arnés")
+
+    def test_confirmacion_sin_join_a_productos(self):
+        self.client.login(username="cliente", password="pass1234")
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse("orders:confirm", args=[self.orden.pk]))
+
+        self.assertContains(respuesta, "2 × Arnés")
+        self.assertFalse(any("products_producto" in c["sql"] for c in consultas.captured_queries))
+
+    def test_save_completa_la_copia(self):
+        linea = OrderItem.objects.create(
+            order=self.orden, producto=self.producto, cantidad=1, precio_unitario=Decimal("12.00")
+        )
+        self.assertEqual(linea.producto_nombre, "Arnés")
+
+
+class HistorialOrdenesTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.cliente = User.objects.create_user(username="cliente", password="pass1234")
+        vendedor = User.objects.create_user(username="tienda")
+        producto = Producto.objects.create(vendedor=vendedor, nombre="Pelota", descripcion="", precio=3, stock=100)
+        for i in range(25):
+            orden = Order.objects.create(usuario=self.cliente, total=Decimal("6.00"))
+            for _ in range(i % 3 + 1):
+                OrderItem.objects.create(order=orden, producto=producto, cantidad=1, precio_unitario=3)
+        Order.objects.create(usuario=User.objects.create_user(username="otro"))
+
+    def test_pagina_anotada_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            pagina = paginador_historial(self.cliente).pagina()
+            filas = [(orden.num_items, orden.primer_producto) for orden in pagina]
+
+        self.assertEqual(len(filas), 20)
+        self.assertTrue(pagina.has_next)
+        self.assertTrue(all(producto == "Pelota" for _, producto in filas))
+        self.assertEqual(pagina.object_list[0].num_items, 24 % 3 + 1)
+
+    def test_api_recorre_todo_el_historial(self):
+        self.client.login(username="cliente", password="pass1234")
+        url = reverse("orders:list_api")
+
+        primera = self.client.get(url).json()
+        segunda = self.client.get(url, {"cursor": primera["next_cursor"]}).json()
+
+        ids = [fila["id"] for fila in primera["results"] + segunda["results"]]
+        self.assertEqual(ids, list(Order.objects.filter(usuario=self.cliente).order_by("-fecha", "-id").values_list("id", flat=True)))
+        self.assertIsNone(segunda["next_cursor"])
+        self.assertIn("Pelota", segunda["html"])
+        self.assertEqual(self.client.get(url, {"cursor": "roto"}).status_code, 400)
+
+    def test_lista_muestra_vista_previa_y_enlace_a_mas(self):
+        self.client.login(username="cliente", password="pass1234")
+        response = self.client.get(reverse("orders:list"))
+        self.assertEqual(len(response.context["orders"]), 20)
+        self.assertContains(response, "data-mas-pedidos")
+        self.assertContains(response, "Pelota y 2 productos más")
+
+
+class VentasDiariasTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.cliente = User.objects.create_user(username="cliente")
+        self.vendedor_a = User.objects.create_user(username="tienda_a")
+        self.vendedor_b = User.objects.create_user(username="tienda_b")
+        self.collar = Producto.objects.create(
+            vendedor=self.vendedor_a, nombre="Collar", descripcion="", categoria="Perros", precio=10, stock=100
+        )
+        self.arena = Producto.objects.create(
+            vendedor=self.vendedor_b, nombre="Arena", descripcion="", categoria="Gatos", precio=5, stock=100
+        )
+        self.ayer = timezone.now() - timedelta(days=1)
+        self._orden([(self.collar, 2), (self.arena, 1)], fecha=self.ayer)
+        self._orden([(self.collar, 1)], fecha=self.ayer)
+        self._orden([(self.arena, 4)])
+        self._orden([(self.collar, 9)], estado="cancelado")
+
+    def _orden(self, lineas, fecha=None, estado="pendiente"):
+        orden = Order.objects.create(usuario=self.cliente, estado=estado)
+        for producto, cantidad in lineas:
+            OrderItem.objects.create(order=orden, producto=producto, cantidad=cantidad, precio_unitario=producto.precio)
+        if fecha:
+            Order.objects.filter(pk=orden.pk).update(fecha=fecha)
+        return orden
+
+    def _resumen(self):
+        return (
+            list(VentaDiaria.objects.order_by("fecha").values_list("ordenes", "unidades", "ingresos")),
+            sorted(VentaDiariaProducto.objects.values_list("producto__nombre", "categoria", "unidades", "ingresos")),
+        )
+
+    def test_agrega_por_lotes_y_es_repetible(self):
+        resultado = agregar_ventas(lote=3)
+        self.assertEqual((resultado.ordenes, resultado.lotes), (4, 2))
+
+        dias, productos = self._resumen()
+        self.assertEqual(dias, [(2, 4, Decimal("35.00")), (1, 4, Decimal("20.00"))])
+        self.assertEqual(productos, [
+            ("Arena", "Gatos", 1, Decimal("5.00")),
+            ("Arena", "Gatos", 4, Decimal("20.00")),
+            ("Collar", "Perros", 3, Decimal("30.00")),
+        ])
+
+        self.assertEqual(agregar_ventas().ordenes, 0)
+        self.assertEqual(self._resumen(), (dias, productos))
+
+    def test_incremental_coincide_con_reconstruccion(self):
+        agregar_ventas()
+        self._orden([(self.arena, 2), (self.collar, 1)])
+        self.assertEqual(agregar_ventas().ordenes, 1)
+        incremental = self._resumen()
+
+        reconstruir_ventas(lote=2)
+        self.assertEqual(self._resumen(), incremental)
+        self.assertEqual(incremental[0][-1], (2, 7, Decimal("40.00")))
+
+    def test_reporte_solo_para_staff_y_sin_leer_ordenes(self):
+        agregar_ventas()
+        url = reverse("orders:reporte_ventas")
+        self.client.force_login(self.cliente)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        staff = get_user_model().objects.create_user(username="staff", is_staff=True)
+        self.client.force_login(staff)
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self.client.get(url, {"agrupar": "categoria"}).json()
+        self.assertEqual(
+            [(fila["categoria"], fila["unidades"], fila["ingresos"]) for fila in datos["results"]],
+            [("Perros", 3, 30.0), ("Gatos", 5, 25.0)],
+        )
+        self.assertFalse(any("orders_order" in c["sql"] for c in consultas.captured_queries))
+
+        vendedores = self.client.get(url, {"agrupar": "vendedor", "desde": timezone.localdate().isoformat()}).json()
+        self.assertEqual([fila["vendedor__username"] for fila in vendedores["results"]], ["tienda_b"])
+        self.assertEqual(self.client.get(url, {"agrupar": "pais"}).status_code, 400)
+        for limite in ("0", "-3", "x"):
+            self.assertEqual(self.client.get(url, {"agrupar": "producto", "limite": limite}).status_code, 400)
+        self.assertEqual(len(self.client.get(url, {"agrupar": "producto", "limite": 1}).json()["results"]), 1)
+        self.assertEqual(self.client.get(url, {"desde": "2024-02-31"}).status_code, 400)
+
+
+class TableroVentasTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user(username="admin", is_staff=True, is_superuser=True)
+        self.cliente = User.objects.create_user(username="cliente")
+        vendedor = User.objects.create_user(username="tienda")
+        self.producto = Producto.objects.create(
+            vendedor=vendedor, nombre="Cepillo", descripcion="", categoria="Higiene", precio=Decimal("8.00"), stock=50
+        )
+        self.cart = Cart.objects.create(usuario=self.cliente)
+
+    def _comprar(self, metodo, cantidad=1):
+        CartItem.objects.create(cart=self.cart, producto=self.producto, cantidad=cantidad)
+        return crear_orden(self.cliente, list(self.cart.items.select_related("producto")), metodo)
+
+    def _embudo(self):
+        return {fila["estado"]: fila["ordenes"] for fila in embudo_estados()}
+
+    def test_embudo_sigue_los_cambios_de_estado(self):
+        orden = self._comprar("tarjeta")
+        self._comprar("paypal")
+        self.assertEqual(self._embudo()["pendiente"], 2)
+
+        orden.estado = "pagado"
+        orden.save()
+        orden.refresh_from_db()
+        orden.save(update_fields=["total"])
+        self.assertEqual((self._embudo()["pendiente"], self._embudo()["pagado"]), (1, 1))
+
+        orden.delete()
+        self.assertEqual((self._embudo()["pendiente"], self._embudo()["pagado"]), (1, 0))
+
+    def test_checkout_registra_pago_y_agregado_por_metodo(self):
+        self._comprar("tarjeta", cantidad=2)
+        self._comprar("paypal")
+        self._comprar("tarjeta")
+        self.assertEqual(Payment.objects.filter(metodo="tarjeta", estado="pendiente").count(), 2)
+
+        agregar_ventas()
+        self.assertEqual(
+            sorted(VentaDiariaMetodo.objects.values_list("metodo", "ordenes", "ingresos")),
+            [("paypal", 1, Decimal("8.00")), ("tarjeta", 2, Decimal("24.00"))],
+        )
+
+    def test_tablero_y_datos_leen_solo_resumenes(self):
+        self._comprar("tarjeta", cantidad=3)
+        agregar_ventas()
+        self.client.force_login(self.staff)
+
+        self.assertContains(self.client.get(reverse("admin:orders_order_tablero")), "grafico-ingresos")
+
+        url = reverse("admin:orders_order_tablero_datos")
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self.client.get(url, {"dias": 7}).json()
+        self.assertFalse(any('"orders_order"' in c["sql"] or "orders_orderitem" in c["sql"] for c in consultas.captured_queries))
+        self.assertEqual(len(datos["ingresos_por_dia"]), 7)
+        self.assertEqual(datos["ingresos_por_dia"][-1]["ingresos"], 24.0)
+        self.assertEqual(datos["top_categorias"][0]["categoria"], "Higiene")
+        self.assertEqual(datos["metodos_pago"][0]["metodo"], "tarjeta")
+        self.assertEqual(datos["embudo_estados"][0], {"estado": "pendiente", "nombre": "Pendiente", "ordenes": 1})
+
+        self.assertEqual(self.client.get(url, {"dias": 3}).status_code, 400)
+        self.client.force_login(self.cliente)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+class TotalOrdenTests(TestCase):
+    def test_calcular_total_agrega_en_sql_y_solo_actualiza_total(self):
+        User = get_user_model()
+        producto = Producto.objects.create(
+            vendedor=User.objects.create_user(username="tienda"), nombre="Plato", descripcion="", precio=1, stock=5
+        )
+        orden = Order.objects.create(usuario=User.objects.create_user(username="cliente"))
+        for precio, cantidad in [("2.50", 2), ("9.99", 1)]:
+            OrderItem.objects.create(order=orden, producto=producto, cantidad=cantidad, precio_unitario=Decimal(precio))
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(orden.calcular_total(), Decimal("14.99"))
+
+        self.assertEqual(len(consultas.captured_queries), 2)
+        actualizacion = consultas.captured_queries[-1]["sql"]
+        self.assertIn('SET "total"', actualizacion)
+        self.assertNotIn('"estado"', actualizacion.split("WHERE")[0])
+        orden.refresh_from_db()
+        self.assertEqual(orden.total, Decimal("14.99"))
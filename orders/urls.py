@@ -1,11 +1,13 @@
 from django.urls import path
-from .views import order_list, checkout, confirm, generar_factura
+from .views import order_list, order_list_api, checkout, confirm, generar_factura, reporte_ventas_api
 
 app_name = "orders"
 
 urlpatterns = [
     path("", order_list, name="list"),
+    path("api/", order_list_api, name="list_api"),
     path("checkout/", checkout, name="checkout"),
     path("confirm/<int:order_id>/", confirm, name="confirm"),
     path("<int:pk>/factura/", generar_factura, name="factura"),
+    path("reportes/ventas/", reporte_ventas_api, name="reporte_ventas"),
 ]
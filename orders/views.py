@@ -1,70 +1,111 @@
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date
 from django.views.decorators.csrf import ensure_csrf_cookie
 from decimal import Decimal
 from cart.models import Cart
+from products.models import Producto
+from home.utils.idempotencia import idempotente, no_reproducir
+from home.utils.paginacion import CursorInvalido
 from .forms import CheckoutForm
-from .models import Order, OrderItem
+from .models import Order
+from .services import (
+    StockInsuficiente,
+    crear_orden,
+    obtener_factura,
+    paginador_historial,
+    ventas_por_categoria,
+    ventas_por_dia,
+    ventas_por_producto,
+    ventas_por_vendedor,
+)
 
 @login_required
 def order_list(request):
-    orders = Order.objects.filter(usuario=request.user).order_by("-fecha")
-    return render(request, "orders/order_list.html", {"orders": orders})
+    try:
+        pagina = paginador_historial(request.user).pagina(request.GET.get("cursor"))
+    except CursorInvalido:
+        raise Http404(_("Cursor de paginación inválido."))
+    return render(request, "orders/order_list.html", {"orders": pagina.object_list, "pagina": pagina})
+
+
+@login_required
+def order_list_api(request):
+    """Siguiente página del historial de pedidos (scroll infinito)."""
+
+    try:
+        pagina = paginador_historial(request.user).pagina(request.GET.get("cursor"))
+    except CursorInvalido:
+        return JsonResponse({"error": "Cursor inválido"}, status=400)
+
+    return JsonResponse({
+        "results": [
+            {
+                "id": order.pk,
+                "date": order.fecha,
+                "status": order.estado,
+                "total": float(order.total),
+                "items": order.num_items,
+                "preview": order.primer_producto,
+                "detail_url": reverse("orders:confirm", args=[order.pk]),
+                "invoice_url": reverse("orders:factura", args=[order.pk]),
+            }
+            for order in pagina.object_list
+        ],
+        "html": render_to_string("orders/_order_items.html", {"orders": pagina.object_list}, request=request),
+        "next_cursor": pagina.next_cursor,
+    })
 
 
 @login_required
 @ensure_csrf_cookie
+@idempotente("checkout")
 def checkout(request):
     cart, created = Cart.objects.get_or_create(usuario=request.user)
-    items_queryset = cart.items.select_related("producto")
+    items_queryset = cart.items.all()
 
     if not items_queryset.exists():
         messages.warning(request, _("Tu carrito está vacío"))
-        return redirect("cart:detail")
+        return no_reproducir(redirect("cart:detail"))
 
     items = list(items_queryset)
+    # Stock vivo de todos los productos en una consulta (fragmentados incluidos)
+    productos = Producto.objects.con_stock_actual().in_bulk({item.producto_id for item in items})
+    for item in items:
+        item.producto = productos[item.producto_id]
 
     # Verificar stock antes de procesar la orden
     for item in items:
-        if item.cantidad > item.producto.stock:
+        if item.cantidad > item.producto.stock_disponible:
             messages.error(
                 request,
                 _("No hay suficiente stock de %(product)s") % {"product": item.producto.nombre},
             )
-            return redirect("cart:detail")
+            return no_reproducir(redirect("cart:detail"))
 
-    subtotal = sum(
-        (item.producto.precio * item.cantidad for item in items),
-        Decimal("0.00"),
-    )
+    subtotal = items_queryset.total()
     shipping_cost = Decimal("5.00")
     total_with_shipping = subtotal + shipping_cost
 
     if request.method == "POST":
         form = CheckoutForm(request.POST)
         if form.is_valid():
-            orden = Order.objects.create(usuario=request.user, estado="pendiente")
-            total = Decimal("0.00")
-
-            for item in items:
-                OrderItem.objects.create(
-                    order=orden,
-                    producto=item.producto,
-                    cantidad=item.cantidad,
-                    precio_unitario=item.producto.precio,
+            try:
+                orden = crear_orden(request.user, items, form.cleaned_data["metodo_pago"])
+            except StockInsuficiente as exc:
+                messages.error(
+                    request,
+                    _("No hay suficiente stock de %(product)s") % {"product": exc.producto.nombre},
                 )
-                item.producto.stock -= item.cantidad
-                item.producto.save()
-                total += item.producto.precio * item.cantidad
-
-            orden.total = total
-            orden.save()
-
-            cart.items.filter(pk__in=[item.pk for item in items]).delete()
+                return no_reproducir(redirect("cart:detail"))
 
             messages.success(
                 request,
@@ -103,26 +144,75 @@ def checkout(request):
 @login_required
 def confirm(request, order_id):
     order = get_object_or_404(Order, pk=order_id, usuario=request.user)
-    return render(request, "orders/confirm.html", {"order": order})
+    # Las líneas se leen de la copia guardada: sin join a productos
+    items = order.items.only("producto_nombre", "cantidad", "precio_unitario").con_importe().order_by("id")
+    return render(request, "orders/confirm.html", {"order": order, "items": items})
 
 
+@login_required
 def generar_factura(request, pk):
-    order = Order.objects.get(pk=pk)
-
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename="factura_{order.id}.pdf"'
-
-    p = canvas.Canvas(response)
-    p.drawString(100, 800, f"Factura Pedido #{order.id}")
-    p.drawString(100, 780, f"Cliente: {order.usuario.username}")
-
-    y = 750
-    for item in order.items.all():
-        p.drawString(100, y, f"{item.producto.nombre} - Cant: {item.cantidad} - Precio: {item.precio_unitario}")
-        y -= 20
-
-    p.drawString(100, y-20, f"Total: {order.total}")
-    p.showPage()
-    p.save()
-
-    return response
+    ordenes = Order.objects.all() if request.user.is_staff else Order.objects.filter(usuario=request.user)
+    order = get_object_or_404(ordenes.only("id"), pk=pk)
+
+    nombre, huella = obtener_factura(order.id)
+    etag = f'"{huella}"'
+    respuesta = get_conditional_response(request, etag=etag)
+    if respuesta is None:
+        respuesta = FileResponse(
+            default_storage.open(nombre, "rb"),
+            as_attachment=True,
+            filename=f"factura_{order.id}.pdf",
+            content_type="application/pdf",
+        )
+    respuesta["ETag"] = etag
+    respuesta["Cache-Control"] = "private, max-age=86400"
+    return respuesta
+
+
+REPORTES_VENTAS = {
+    "dia": ventas_por_dia,
+    "categoria": ventas_por_categoria,
+    "vendedor": ventas_por_vendedor,
+    "producto": ventas_por_producto,
+}
+
+
+@staff_member_required
+def reporte_ventas_api(request):
+    """Ventas por día, categoría, vendedor o producto leídas de las tablas de resumen.
+
+    Parámetros: ``agrupar`` (dia, categoria, vendedor, producto), ``desde`` y
+    ``hasta`` (AAAA-MM-DD, inclusive) y ``limite`` para los rankings.
+    """
+
+    agrupar = request.GET.get("agrupar", "dia")
+    if agrupar not in REPORTES_VENTAS:
+        return JsonResponse({"error": "agrupar debe ser uno de: %s" % ", ".join(REPORTES_VENTAS)}, status=400)
+
+    rango = {}
+    for parametro in ("desde", "hasta"):
+        valor = request.GET.get(parametro)
+        if valor:
+            try:
+                rango[parametro] = parse_date(valor)
+            except ValueError:
+                rango[parametro] = None
+            if rango[parametro] is None:
+                return JsonResponse({"error": "Fecha inválida en %s" % parametro}, status=400)
+
+    if agrupar == "dia":
+        filas = REPORTES_VENTAS[agrupar](**rango)
+    else:
+        try:
+            limite = int(request.GET.get("limite", 20))
+        except ValueError:
+            return JsonResponse({"error": "limite debe ser un entero"}, status=400)
+        if limite < 1:
+            return JsonResponse({"error": "limite debe ser al menos 1"}, status=400)
+        limite = min(limite, 500)
+        filas = REPORTES_VENTAS[agrupar](limite=limite, **rango)
+
+    return JsonResponse({
+        "group_by": agrupar,
+        "results": [{**fila, "ingresos": float(fila["ingresos"] or 0)} for fila in filas],
+    })
@@ -1,14 +1,81 @@
-from django.contrib import admin
+import io
+
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .forms import ImportarCatalogoForm
 from .models import Producto, Review
+from .services.importacion import importar_catalogo, leer_filas
+from .services.stock import fragmentar_stock, unificar_stock
 
 
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
     list_display = ['nombre', 'vendedor', 'precio', 'stock', 'categoria', 'total_vendidos', 'promedio_rating',
                     'cantidad_resenas']
-    list_filter = ['categoria', 'fecha_creacion']
+    list_filter = ['categoria', 'fecha_creacion', 'stock_fragmentado']
     search_fields = ['nombre', 'descripcion', 'vendedor__username']
     readonly_fields = ['total_vendidos', 'promedio_rating', 'cantidad_resenas']
+    change_list_template = 'admin/products/producto/change_list.html'
+    actions = ['activar_stock_fragmentado', 'desactivar_stock_fragmentado']
+
+    def get_readonly_fields(self, request, obj=None):
+        # El stock de un producto fragmentado vive en sus fragmentos
+        if obj is not None and obj.stock_fragmentado:
+            return [*self.readonly_fields, 'stock']
+        return self.readonly_fields
+
+    def get_urls(self):
+        urls = [
+            path(
+                'importar/',
+                self.admin_site.admin_view(self.importar_catalogo_view),
+                name='products_producto_importar',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def importar_catalogo_view(self, request):
+        """Importación masiva (upsert por SKU) con el usuario actual como vendedor"""
+        if not self.has_add_permission(request):
+            return redirect('admin:products_producto_changelist')
+
+        form = ImportarCatalogoForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            entrada = io.TextIOWrapper(archivo.file, encoding='utf-8-sig', newline='')
+            resultado = importar_catalogo(leer_filas(entrada, form.cleaned_data['formato']), request.user)
+            self.message_user(
+                request,
+                f"{resultado.importadas} productos importados de {resultado.procesadas} filas "
+                f"en {resultado.segundos:.1f}s ({resultado.filas_por_segundo:,.0f} filas/s).",
+                messages.SUCCESS,
+            )
+            for linea, mensaje in resultado.errores[:20]:
+                self.message_user(request, f"Línea {linea}: {mensaje}", messages.WARNING)
+            return redirect('admin:products_producto_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': 'Importar catálogo',
+        }
+        return TemplateResponse(request, 'admin/products/producto/importar.html', context)
+
+    @admin.action(description='Fragmentar stock (productos muy demandados)')
+    def activar_stock_fragmentado(self, request, queryset):
+        for producto_id in queryset.values_list('pk', flat=True):
+            fragmentar_stock(producto_id)
+        self.message_user(request, f"Stock fragmentado en {queryset.count()} productos.", messages.SUCCESS)
+
+    @admin.action(description='Unificar stock fragmentado')
+    def desactivar_stock_fragmentado(self, request, queryset):
+        for producto_id in queryset.filter(stock_fragmentado=True).values_list('pk', flat=True):
+            unificar_stock(producto_id)
+        self.message_user(request, "Stock unificado.", messages.SUCCESS)
 
     def total_vendidos(self, obj):
         return obj.total_vendidos
@@ -0,0 +1,11 @@
+from django import forms
+from django.utils.translation import gettext_lazy as _
+
+
+class ImportarCatalogoForm(forms.Form):
+    archivo = forms.FileField(label=_("Archivo"), help_text=_("CSV o JSON Lines con columnas sku, nombre, descripcion, precio, stock y categoria."))
+    formato = forms.ChoiceField(
+        label=_("Formato"),
+        choices=(("csv", "CSV"), ("jsonl", "JSON Lines")),
+        initial="csv",
+    )
@@ -0,0 +1,91 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products.models import Producto
+from products.services.busqueda import buscar_productos, filtrar_icontains, fts_disponible
+
+PALABRAS = [
+    "collar", "correa", "arnés", "cama", "rascador", "juguete", "pelota", "hueso",
+    "comedero", "bebedero", "transportadora", "shampoo", "cepillo", "snack", "galleta",
+    "alimento", "croquetas", "arena", "acuario", "jaula", "perro", "gato", "pájaro",
+    "pez", "cachorro", "adulto", "ortopédica", "luminoso", "resistente", "natural",
+]
+CATEGORIAS = ["Accesorios", "Alimentos", "Descanso", "Higiene", "Juguetes", "Salud"]
+CONSULTAS = ["collar", "cama ortopedica", "juguete perro", "croq", "gato natural", "zorvik"]
+SILABAS = ["ba", "ce", "di", "fo", "gu", "la", "me", "ni", "po", "ru", "sa", "te", "vi", "zo", "rk", "ln"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la búsqueda FTS5 con el filtro icontains sobre un catálogo "
+        "sintético. Los datos se crean dentro de una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=100_000)
+        parser.add_argument("--repeticiones", type=int, default=5)
+        parser.add_argument("--lote", type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        if not fts_disponible():
+            raise CommandError("El índice FTS5 no está disponible en esta base de datos.")
+
+        rng = random.Random(42)
+        with transaction.atomic():
+            vendedor = get_user_model().objects.create_user(username="__benchmark_busqueda__")
+            inicio = time.perf_counter()
+            self._poblar(vendedor, options["productos"], options["lote"], rng)
+            self.stdout.write(
+                f"{options['productos']} productos creados e indexados "
+                f"en {time.perf_counter() - inicio:.1f}s"
+            )
+
+            base = Producto.objects.all()
+            for consulta in CONSULTAS:
+                t_like, n_like = self._medir(
+                    lambda: filtrar_icontains(base, consulta), options["repeticiones"]
+                )
+                t_fts, n_fts = self._medir(
+                    lambda: buscar_productos(base, consulta), options["repeticiones"]
+                )
+                self.stdout.write(
+                    f"{consulta!r:20} icontains {t_like * 1000:8.1f} ms ({n_like:6} filas) | "
+                    f"fts5 {t_fts * 1000:8.1f} ms ({n_fts:6} filas)"
+                )
+            transaction.set_rollback(True)
+
+    def _poblar(self, vendedor, total, lote, rng):
+        # Vocabulario de relleno amplio para que los términos reales sean selectivos
+        relleno = ["".join(rng.choices(SILABAS, k=rng.randint(2, 4))) for _ in range(20_000)]
+        relleno.append("zorvik")
+        for desde in range(0, total, lote):
+            Producto.objects.bulk_create(
+                [
+                    Producto(
+                        vendedor=vendedor,
+                        nombre=" ".join(rng.sample(PALABRAS, 2) + rng.sample(relleno, 1)).capitalize(),
+                        descripcion=" ".join(rng.choices(PALABRAS, k=2) + rng.choices(relleno, k=23)),
+                        precio=Decimal(rng.randint(1000, 200000)) / 100,
+                        stock=rng.randint(0, 50),
+                        categoria=rng.choice(CATEGORIAS),
+                    )
+                    for _ in range(min(lote, total - desde))
+                ]
+            )
+
+    def _medir(self, construir, repeticiones):
+        """Mide el tiempo medio de contar resultados y leer la primera página"""
+        transcurrido = 0.0
+        filas = 0
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            queryset = construir()
+            filas = queryset.count()
+            list(queryset[:12])
+            transcurrido += time.perf_counter() - inicio
+        return transcurrido / repeticiones, filas
@@ -0,0 +1,55 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from products.models import Producto
+from products.services.imagenes import generar_variantes
+
+
+def _generar(nombre):
+    try:
+        generar_variantes(nombre)
+        return nombre, None
+    except Exception as exc:  # se reporta en el proceso principal
+        return nombre, str(exc)
+
+
+class Command(BaseCommand):
+    help = "Genera en paralelo las variantes redimensionadas de las imágenes de productos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            "--todas",
+            action="store_true",
+            help="Regenera también las imágenes que ya tienen variantes.",
+        )
+
+    def handle(self, *args, **options):
+        productos = Producto.objects.exclude(imagen="").exclude(imagen__isnull=True)
+        if not options["todas"]:
+            productos = productos.filter(imagen_variantes=False)
+        pendientes = set(productos.values_list("imagen", flat=True))
+        if not pendientes:
+            self.stdout.write("No hay imágenes pendientes.")
+            return
+
+        inicio = time.perf_counter()
+        listas, errores = [], 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as ejecutor:
+            futuros = [ejecutor.submit(_generar, nombre) for nombre in pendientes]
+            for futuro in as_completed(futuros):
+                nombre, error = futuro.result()
+                if error:
+                    errores += 1
+                    self.stderr.write(f"{nombre}: {error}")
+                else:
+                    listas.append(nombre)
+
+        Producto.objects.filter(imagen__in=listas).update(imagen_variantes=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(listas)} imágenes procesadas con {options['workers']} procesos "
+            f"en {time.perf_counter() - inicio:.1f}s ({errores} errores)."
+        ))
@@ -0,0 +1,71 @@
+import json
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from products.services.importacion import importar_catalogo, leer_filas
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa (crea o actualiza por SKU) el catálogo de un vendedor desde un "
+        "archivo CSV o JSON Lines, en lotes y con punto de control para reanudar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", type=Path)
+        parser.add_argument("--vendedor", required=True, help="Nombre de usuario del vendedor.")
+        parser.add_argument("--formato", choices=["csv", "jsonl"], help="Por defecto se deduce de la extensión.")
+        parser.add_argument("--lote", type=int, default=1000)
+        parser.add_argument(
+            "--checkpoint",
+            type=Path,
+            help="Archivo donde se guarda la última línea confirmada (por defecto <archivo>.checkpoint).",
+        )
+        parser.add_argument("--reiniciar", action="store_true", help="Ignora el checkpoint existente.")
+
+    def handle(self, *args, **options):
+        archivo = Path(options["archivo"])
+        if not archivo.exists():
+            raise CommandError(f"No existe el archivo {archivo}")
+        formato = options["formato"] or ("jsonl" if archivo.suffix in (".jsonl", ".ndjson") else "csv")
+
+        try:
+            vendedor = get_user_model().objects.get(username=options["vendedor"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No existe el vendedor {options['vendedor']}")
+
+        checkpoint = Path(options["checkpoint"] or archivo.with_name(archivo.name + ".checkpoint"))
+        desde = 0
+        if checkpoint.exists() and not options["reiniciar"]:
+            desde = json.loads(checkpoint.read_text())["linea"]
+            self.stdout.write(f"Reanudando después de la línea {desde}")
+
+        def guardar_checkpoint(resultado):
+            checkpoint.write_text(json.dumps({"archivo": str(archivo), "linea": resultado.ultima_linea}))
+            self.stdout.write(
+                f"  línea {resultado.ultima_linea}: {resultado.importadas} importadas, "
+                f"{resultado.total_errores} errores, {resultado.filas_por_segundo:,.0f} filas/s"
+            )
+
+        with archivo.open("r", encoding="utf-8-sig", newline="") as entrada:
+            resultado = importar_catalogo(
+                leer_filas(entrada, formato),
+                vendedor,
+                tamano_lote=options["lote"],
+                desde_linea=desde,
+                al_confirmar=guardar_checkpoint,
+            )
+
+        for linea, mensaje in resultado.errores:
+            self.stderr.write(f"Línea {linea}: {mensaje}")
+        if resultado.total_errores > len(resultado.errores):
+            self.stderr.write(f"... y {resultado.total_errores - len(resultado.errores)} errores más")
+
+        checkpoint.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.procesadas} filas procesadas, {resultado.importadas} importadas, "
+            f"{resultado.total_errores} con errores en {resultado.segundos:.1f}s "
+            f"({resultado.filas_por_segundo:,.0f} filas/s)."
+        ))
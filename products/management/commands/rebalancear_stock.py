@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from products.services import reconciliar_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Concilia el stock y las ventas de los productos con stock fragmentado en "
+        "Producto y reparte de nuevo las unidades entre sus fragmentos. Puede programarse periódicamente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--producto", type=int, action="append", dest="productos", help="Solo estos productos.")
+        parser.add_argument("--sin-rebalancear", action="store_true", help="Solo concilia, sin mover unidades.")
+
+    def handle(self, *args, **options):
+        resultado = reconciliar_stock(options["productos"], rebalancear=not options["sin_rebalancear"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.productos} productos conciliados, {resultado.vendidas} unidades vendidas trasladadas."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.services import recalcular_contadores
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye los contadores de reseñas, ratings y ventas de cada producto "
+        "que alimentan los rankings. Puede programarse periódicamente."
+    )
+
+    def handle(self, *args, **options):
+        total = recalcular_contadores()
+        self.stdout.write(self.style.SUCCESS(f"Contadores recalculados para {total} productos."))
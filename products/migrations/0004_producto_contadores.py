@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:47
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def _subconsulta(model, agregado):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(producto=OuterRef('pk'))
+            .order_by()
+            .values('producto')
+            .annotate(valor=agregado)
+            .values('valor')[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def rellenar_contadores(apps, schema_editor):
+    Producto = apps.get_model('products', 'Producto')
+    Review = apps.get_model('products', 'Review')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    Producto.objects.update(
+        contador_resenas=_subconsulta(Review, Count('pk')),
+        suma_ratings=_subconsulta(Review, Sum('rating')),
+        unidades_vendidas=_subconsulta(OrderItem, Sum('cantidad')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_producto_fecha_creacion_producto_imagen_and_more'),
+        ('orders', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='contador_resenas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='suma_ratings',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='unidades_vendidas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(rellenar_contadores, migrations.RunPython.noop),
+    ]
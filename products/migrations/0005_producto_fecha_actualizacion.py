@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_producto_contadores'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['fecha_actualizacion', 'id'], name='producto_actualizacion_idx'),
+        ),
+    ]
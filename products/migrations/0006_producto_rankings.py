@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:54
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast, NullIf
+
+
+def rellenar_rating_promedio(apps, schema_editor):
+    Producto = apps.get_model('products', 'Producto')
+    Producto.objects.update(
+        rating_promedio=Cast(F('suma_ratings'), FloatField()) / NullIf(F('contador_resenas'), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_producto_fecha_actualizacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='rating_promedio',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.RunPython(rellenar_rating_promedio, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['-unidades_vendidas'], name='producto_top_vendidos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['-contador_resenas'], name='producto_top_comentados_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['-rating_promedio'], name='producto_top_calificados_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_producto_rankings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='imagen_variantes',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_producto_imagen_variantes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['producto', '-fecha', '-id'], name='review_recientes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['producto', '-rating', '-fecha', '-id'], name='review_rating_idx'),
+        ),
+    ]
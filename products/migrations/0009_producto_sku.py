@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_review_indices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='producto',
+            constraint=models.UniqueConstraint(fields=('vendedor', 'sku'), name='producto_vendedor_sku_unico'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_producto_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='stock_fragmentado',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='FragmentoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.PositiveSmallIntegerField()),
+                ('stock', models.PositiveIntegerField(default=0)),
+                ('vendidas', models.PositiveIntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fragmentos', to='products.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('producto', 'indice'), name='fragmento_producto_indice_unico')],
+            },
+        ),
+    ]
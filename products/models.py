@@ -1,46 +1,128 @@
 from django.db import models
 from django.urls import reverse
 from users.models import Usuario
-from django.db.models import Sum, Count, Avg
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
+class ProductoQuerySet(models.QuerySet):
+    """Stock vivo: en productos fragmentados la columna ``stock`` se concilia tarde"""
+
+    def con_stock_actual(self):
+        from products.services.stock import expresion_stock
+
+        return self.annotate(stock_actual=expresion_stock())
+
+    def en_stock(self):
+        from products.services.stock import expresion_stock
+
+        return self.alias(stock_vivo=expresion_stock()).filter(stock_vivo__gt=0)
+
+
 class Producto(models.Model):
     """Productos en venta"""
     vendedor = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name="productos")
+    # Referencia del vendedor; identifica el producto en importaciones masivas
+    sku = models.CharField(max_length=64, null=True, blank=True)
     nombre = models.CharField(max_length=200)
     descripcion = models.TextField(blank=True)
     precio = models.DecimalField(max_digits=8, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
     categoria = models.CharField(max_length=100, blank=True)
     imagen = models.ImageField(upload_to='productos/', null=True, blank=True)
+    # True cuando existen las variantes redimensionadas (products.services.imagenes)
+    imagen_variantes = models.BooleanField(default=False, editable=False)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    # Contadores desnormalizados, mantenidos por products.signals y
+    # reconstruibles con ``manage.py recalcular_contadores``.
+    contador_resenas = models.PositiveIntegerField(default=0, editable=False)
+    suma_ratings = models.PositiveIntegerField(default=0, editable=False)
+    unidades_vendidas = models.PositiveIntegerField(default=0, editable=False)
+    rating_promedio = models.FloatField(null=True, editable=False)
+    # Stock repartido en FragmentoStock para productos con mucha demanda
+    # (products.services.stock); ``stock`` se concilia periódicamente.
+    stock_fragmentado = models.BooleanField(default=False, editable=False)
+
+    objects = ProductoQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendedor', 'sku'], name='producto_vendedor_sku_unico'),
+        ]
+        indexes = [
+            # Sincronización incremental de la API v2 (updated_since + cursor)
+            models.Index(fields=['fecha_actualizacion', 'id'], name='producto_actualizacion_idx'),
+            # Rankings (más vendidos, más comentados, mejor calificados)
+            models.Index(fields=['-unidades_vendidas'], name='producto_top_vendidos_idx'),
+            models.Index(fields=['-contador_resenas'], name='producto_top_comentados_idx'),
+            models.Index(fields=['-rating_promedio'], name='producto_top_calificados_idx'),
+        ]
+
+    # Los escriben los servicios con UPDATE atómicos (contadores, variantes de
+    # imagen, stock fragmentado); un save() completo no los pisa
+    CAMPOS_DE_SERVICIOS = (
+        "contador_resenas",
+        "suma_ratings",
+        "unidades_vendidas",
+        "rating_promedio",
+        "imagen_variantes",
+        "stock_fragmentado",
+    )
 
     def __str__(self):
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        """Un guardado de una fila existente no reescribe los campos de servicios
+
+        Tampoco el stock de un producto fragmentado: lo llevan sus fragmentos
+        y un valor cargado antes de las últimas ventas las desharía. Se
+        cambia con ``repartir_stock``.
+        """
+        if not self._state.adding and not kwargs.get("force_insert"):
+            campos = kwargs.get("update_fields")
+            if campos is None:
+                campos = [
+                    campo.name
+                    for campo in self._meta.concrete_fields
+                    if not campo.primary_key and campo.name not in self.CAMPOS_DE_SERVICIOS
+                ]
+            if "stock" in campos and Producto.objects.filter(pk=self.pk, stock_fragmentado=True).exists():
+                campos = [campo for campo in campos if campo != "stock"]
+            kwargs["update_fields"] = campos
+        super().save(*args, **kwargs)
+
     @property
     def total_vendidos(self):
-        """Calcula la cantidad total vendida de este producto"""
-        return self.orderitem_set.aggregate(
-            total=Sum('cantidad')
-        )['total'] or 0
+        """Cantidad total vendida de este producto"""
+        return self.unidades_vendidas
 
     @property
     def promedio_rating(self):
-        """Calcula el rating promedio del producto"""
-        avg = self.reviews.aggregate(promedio=Avg('rating'))['promedio']
-        return round(avg, 1) if avg else 0
+        """Rating promedio del producto"""
+        if not self.contador_resenas:
+            return 0
+        return round(self.suma_ratings / self.contador_resenas, 1)
 
     @property
     def promedio_rating_entero(self):
         promedio = self.promedio_rating
         return int(round(promedio)) if promedio else 0
 
+    @property
+    def stock_disponible(self):
+        """Stock vivo; usa ``con_stock_actual()`` si viene anotado"""
+        if "stock_actual" in self.__dict__:
+            return self.stock_actual
+        if not self.stock_fragmentado:
+            return self.stock
+        return self.fragmentos.aggregate(total=models.Sum("stock"))["total"] or 0
+
     @property
     def cantidad_resenas(self):
-        """Cuenta la cantidad de reseñas del producto"""
-        return self.reviews.count()
+        """Cantidad de reseñas del producto"""
+        return self.contador_resenas
 
     def get_absolute_url(self):
         return reverse("products:detail", args=[self.pk])
@@ -48,23 +130,34 @@ class Producto(models.Model):
     @classmethod
     def mas_vendidos(cls, limite=5):
         """Obtiene los productos más vendidos"""
-        return cls.objects.annotate(
-            total_vendidos=Sum('orderitem__cantidad')
-        ).order_by('-total_vendidos')[:limite]
+        return cls.objects.order_by('-unidades_vendidas')[:limite]
 
     @classmethod
     def mas_comentados(cls, limite=5):
         """Obtiene los productos más comentados"""
-        return cls.objects.annotate(
-            num_resenas=Count('reviews')
-        ).order_by('-num_resenas')[:limite]
+        return cls.objects.order_by('-contador_resenas')[:limite]
 
     @classmethod
     def mejor_calificados(cls, limite=5):
         """Obtiene los productos mejor calificados"""
-        return cls.objects.annotate(
-            promedio=Avg('reviews__rating')
-        ).filter(promedio__isnull=False).order_by('-promedio')[:limite]
+        return cls.objects.filter(rating_promedio__isnull=False).order_by('-rating_promedio')[:limite]
+
+
+class FragmentoStock(models.Model):
+    """Parte del stock de un producto fragmentado; las ventas se reparten entre fragmentos"""
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="fragmentos")
+    indice = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField(default=0)
+    # Unidades vendidas desde la última conciliación con Producto.unidades_vendidas
+    vendidas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'indice'], name='fragmento_producto_indice_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id}#{self.indice}: {self.stock}"
 
 
 class Review(models.Model):
@@ -80,6 +173,11 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ['producto', 'usuario']  # Un usuario solo puede reseñar una vez cada producto
+        indexes = [
+            # Paginación por cursor de las reseñas de un producto
+            models.Index(fields=['producto', '-fecha', '-id'], name='review_recientes_idx'),
+            models.Index(fields=['producto', '-rating', '-fecha', '-id'], name='review_rating_idx'),
+        ]
 
     def __str__(self):
         return f"Review de {self.usuario.username} sobre {self.producto.nombre}"
@@ -0,0 +1,40 @@
+"""Service layer utilities for the products app."""
+
+from .busqueda import buscar_productos, instalar_indice, reconstruir_indice
+from .catalogo import invalidar_catalogo, obtener_snapshot, serializar_disponibles
+from .contadores import recalcular_contadores, registrar_resena, registrar_venta
+from .facetas import facetas_categorias, invalidar_facetas
+from .resenas import invalidar_resenas, paginador_resenas, version_resenas
+from .stock import (
+    descontar_fragmento,
+    expresion_stock,
+    fragmentar_stock,
+    reconciliar_stock,
+    repartir_stock,
+    reponer_stock,
+    unificar_stock,
+)
+
+__all__ = [
+    "buscar_productos",
+    "instalar_indice",
+    "reconstruir_indice",
+    "invalidar_catalogo",
+    "obtener_snapshot",
+    "serializar_disponibles",
+    "recalcular_contadores",
+    "registrar_resena",
+    "registrar_venta",
+    "facetas_categorias",
+    "invalidar_facetas",
+    "invalidar_resenas",
+    "paginador_resenas",
+    "version_resenas",
+    "descontar_fragmento",
+    "expresion_stock",
+    "fragmentar_stock",
+    "reconciliar_stock",
+    "repartir_stock",
+    "reponer_stock",
+    "unificar_stock",
+]
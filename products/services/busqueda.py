@@ -0,0 +1,163 @@
+"""Full-text search over the product catalog.
+
+On SQLite the catalog is indexed in an FTS5 virtual table
+(``products_producto_fts``) that stores ``nombre``, ``descripcion`` and
+``categoria`` keyed by the product id. The index is an external-content
+table over ``products_producto`` and SQL triggers keep it in sync on every
+insert, update and delete, including ``bulk_create`` and ``update()`` calls
+that bypass model signals. Matching is accent-insensitive (``unicode61``
+with ``remove_diacritics``), every term is a prefix query and results are
+ranked with BM25 weighted towards the product name.
+
+Other database backends fall back to the previous ``icontains`` filter.
+"""
+
+from __future__ import annotations
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+FTS_TABLE = "products_producto_fts"
+MAX_TERMINOS = 10
+
+# Pesos BM25 para (nombre, descripcion, categoria)
+PESOS_BM25 = (10.0, 1.0, 3.0)
+
+_TERMINO = re.compile(r"\w+", re.UNICODE)
+
+_CREAR_TABLA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    nombre, descripcion, categoria,
+    content='products_producto', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3 4'
+)
+"""
+
+_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON products_producto BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, nombre, descripcion, categoria)
+        VALUES (new.id, new.nombre, new.descripcion, new.categoria);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON products_producto BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, nombre, descripcion, categoria)
+        VALUES ('delete', old.id, old.nombre, old.descripcion, old.categoria);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON products_producto
+    WHEN old.nombre IS NOT new.nombre
+        OR old.descripcion IS NOT new.descripcion
+        OR old.categoria IS NOT new.categoria
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, nombre, descripcion, categoria)
+        VALUES ('delete', old.id, old.nombre, old.descripcion, old.categoria);
+        INSERT INTO {FTS_TABLE}(rowid, nombre, descripcion, categoria)
+        VALUES (new.id, new.nombre, new.descripcion, new.categoria);
+    END
+    """,
+)
+
+
+def fts_disponible(using=None) -> bool:
+    """Return ``True`` when the current connection can serve FTS5 queries.
+
+    The answer is remembered on the connection wrapper (``instalar_indice``
+    sets it too), so searches do not scan ``sqlite_master`` every time.
+    """
+
+    conn = using or connection
+    if conn.vendor != "sqlite":
+        return False
+    disponible = getattr(conn, "_fts_disponible", None)
+    if disponible is None:
+        disponible = FTS_TABLE in conn.introspection.table_names()
+        conn._fts_disponible = disponible
+    return disponible
+
+
+def instalar_indice(using=None) -> bool:
+    """Create the FTS5 table and sync triggers if they are missing.
+
+    SQLite drops triggers whenever a migration rebuilds ``products_producto``,
+    so this runs after every ``migrate``. Returns ``True`` when the index was
+    (re)built from scratch.
+    """
+
+    conn = using or connection
+    if conn.vendor != "sqlite":
+        return False
+
+    nueva = FTS_TABLE not in conn.introspection.table_names()
+    with conn.cursor() as cursor:
+        cursor.execute(_CREAR_TABLA)
+        for trigger in _TRIGGERS:
+            cursor.execute(trigger)
+        if nueva:
+            pesos = ", ".join(str(peso) for peso in PESOS_BM25)
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', %s)",
+                [f"bm25({pesos})"],
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    conn._fts_disponible = True
+    return nueva
+
+
+def reconstruir_indice(using=None) -> None:
+    """Re-read every product into the FTS5 index."""
+
+    conn = using or connection
+    instalar_indice(conn)
+    if conn.vendor == "sqlite":
+        with conn.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def expresion_fts(texto: str) -> str:
+    """Translate free user input into a safe FTS5 prefix query."""
+
+    terminos = _TERMINO.findall(texto or "")[:MAX_TERMINOS]
+    return " ".join(f'"{termino}"*' for termino in terminos)
+
+
+def filtrar_icontains(queryset, texto: str):
+    """Previous ``LIKE`` based search, kept as the portable fallback."""
+
+    return queryset.filter(
+        Q(nombre__icontains=texto)
+        | Q(descripcion__icontains=texto)
+        | Q(categoria__icontains=texto)
+    )
+
+
+def buscar_productos(queryset, texto: str):
+    """Filter ``queryset`` by ``texto`` ordered by relevance.
+
+    Matching products are annotated with ``relevancia`` (lower is better)
+    when the FTS5 index is available.
+    """
+
+    if not fts_disponible():
+        return filtrar_icontains(queryset, texto)
+
+    expresion = expresion_fts(texto)
+    if not expresion:
+        return queryset.none()
+
+    # ``extra`` produces a plain join that lets SQLite drive the query from
+    # the MATCH and read BM25 from the ``rank`` column configured above.
+    return queryset.extra(
+        select={"relevancia": f"{FTS_TABLE}.rank"},
+        tables=[FTS_TABLE],
+        where=[
+            f"{FTS_TABLE}.rowid = products_producto.id",
+            f"{FTS_TABLE} MATCH %s",
+        ],
+        params=[expresion],
+    ).order_by("relevancia", "pk")
@@ -0,0 +1,162 @@
+"""Precomputed snapshot of the ``api/available/`` catalog payload.
+
+The JSON document (and a gzip copy) is serialized once per catalog version
+and kept in the shared cache together with a strong ETag and its
+``Last-Modified`` timestamp. The version is bumped by ``products.signals``
+only when a field exposed by the API changes, so partners polling the
+endpoint get either a cached body or a ``304 Not Modified``.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+VERSION_KEY = "productos:api:version"
+SNAPSHOT_KEY = "productos:api:snapshot:{version}:{origen}"
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+# Campos de Producto que forman parte del payload
+CAMPOS_API = ("nombre", "categoria", "precio", "stock", "imagen")
+
+
+def invalidar_catalogo() -> int:
+    """Start a new catalog version; stale snapshots simply expire."""
+
+    version = time.time_ns()
+    cache.set(VERSION_KEY, version, None)
+    return version
+
+
+def version_catalogo() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = invalidar_catalogo()
+    return version
+
+
+def serializar_disponibles(productos, origen: str) -> dict:
+    """Return the public representation used by the catalog APIs."""
+
+    return {
+        "count": len(productos),
+        "results": [
+            {
+                "id": producto.pk,
+                "name": producto.nombre,
+                "category": producto.categoria,
+                "price": float(producto.precio),
+                "stock": producto.stock_disponible,
+                "detail_url": urljoin(origen, producto.get_absolute_url()),
+                "image": urljoin(origen, producto.imagen.url) if producto.imagen else None,
+            }
+            for producto in productos
+        ],
+    }
+
+
+LOTE_KEY = "productos:lote:{pk}"
+LOTE_TIMEOUT = 15
+
+
+def consultar_lote(ids) -> tuple[list[dict], list[int]]:
+    """Return ``(encontrados, faltantes)`` price/stock rows for ``ids``.
+
+    Hot ids are answered from a short-lived per-product cache entry; the
+    rest are read with a single ``id__in`` query and cached for the next
+    caller. Results keep the order of ``ids``.
+    """
+
+    from products.models import Producto
+
+    ids = list(dict.fromkeys(ids))
+    claves = {pk: LOTE_KEY.format(pk=pk) for pk in ids}
+    cacheados = cache.get_many(claves.values())
+    filas = {pk: cacheados[clave] for pk, clave in claves.items() if clave in cacheados}
+
+    pendientes = [pk for pk in ids if pk not in filas]
+    if pendientes:
+        nuevos = {
+            pk: {"id": pk, "price": float(precio), "stock": stock}
+            for pk, precio, stock in Producto.objects.filter(pk__in=pendientes)
+            .con_stock_actual()
+            .values_list("id", "precio", "stock_actual")
+            .iterator()
+        }
+        cache.set_many({claves[pk]: fila for pk, fila in nuevos.items()}, LOTE_TIMEOUT)
+        filas.update(nuevos)
+
+    encontrados = [filas[pk] for pk in ids if pk in filas]
+    faltantes = [pk for pk in ids if pk not in filas]
+    return encontrados, faltantes
+
+
+def olvidar_lote(pk) -> None:
+    cache.delete(LOTE_KEY.format(pk=pk))
+
+
+# Campos públicos de la API v2 -> columna de Producto
+CAMPOS_V2 = {
+    "id": "id",
+    "name": "nombre",
+    "description": "descripcion",
+    "category": "categoria",
+    "price": "precio",
+    "stock": "stock_actual",  # anotado con ``con_stock_actual()``
+    "image": "imagen",
+    "created_at": "fecha_creacion",
+    "updated_at": "fecha_actualizacion",
+}
+CAMPOS_V2_DEFECTO = ("id", "name", "category", "price", "stock", "updated_at")
+
+
+def serializar_fila_v2(fila: dict, campos, origen: str) -> dict:
+    """Render a ``values()`` row with only the requested public ``campos``."""
+
+    salida = {}
+    for campo in campos:
+        valor = fila[CAMPOS_V2[campo]]
+        if campo == "price":
+            valor = float(valor)
+        elif campo == "image":
+            valor = urljoin(origen, default_storage.url(valor)) if valor else None
+        salida[campo] = valor
+    return salida
+
+
+def _construir(origen: str, version: int) -> dict:
+    from products.models import Producto
+
+    productos = list(
+        Producto.objects.en_stock()
+        .con_stock_actual()
+        .only("id", *CAMPOS_API)
+        .order_by("nombre")
+    )
+    cuerpo = json.dumps(serializar_disponibles(productos, origen), cls=DjangoJSONEncoder).encode("utf-8")
+    return {
+        "body": cuerpo,
+        "gzip": gzip.compress(cuerpo, mtime=0),
+        "etag": '"%s"' % hashlib.sha256(cuerpo).hexdigest()[:32],
+        "last_modified": datetime.fromtimestamp(version / 1e9, tz=timezone.utc),
+    }
+
+
+def obtener_snapshot(origen: str) -> dict:
+    """Return the cached snapshot for ``origen`` (scheme + host), building it once."""
+
+    version = version_catalogo()
+    clave = SNAPSHOT_KEY.format(version=version, origen=hashlib.sha1(origen.encode()).hexdigest())
+    snapshot = cache.get(clave)
+    if snapshot is None:
+        snapshot = _construir(origen, version)
+        cache.set(clave, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
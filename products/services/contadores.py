@@ -0,0 +1,88 @@
+"""Maintenance of the denormalized counters stored on ``Producto``.
+
+Templates, the admin and the product rankings read ``contador_resenas``,
+``suma_ratings``, ``rating_promedio`` and ``unidades_vendidas`` directly
+(the rankings through dedicated indexes), so these helpers keep them in sync with
+``Review`` and ``OrderItem`` using single-row ``F()`` updates, and offer a
+full rebuild for fixtures, bulk imports or manual repairs.
+"""
+
+from __future__ import annotations
+
+from django.db.models import Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf
+
+
+def _promedio(suma, contador):
+    """SQL expression for ``suma / contador`` (NULL when there are no reviews)."""
+
+    return Cast(suma, FloatField()) / NullIf(contador, Value(0))
+
+
+def registrar_resena(producto_id: int, rating: int, *, signo: int = 1) -> None:
+    """Add (``signo=1``) or remove (``signo=-1``) one review from the counters.
+
+    Counters are clamped at zero so a stale row never violates the
+    ``PositiveIntegerField`` check constraint."""
+
+    from products.models import Producto
+
+    contador = Greatest(F("contador_resenas") + signo, Value(0))
+    suma = Greatest(F("suma_ratings") + signo * rating, Value(0))
+    Producto.objects.filter(pk=producto_id).update(
+        contador_resenas=contador,
+        suma_ratings=suma,
+        rating_promedio=_promedio(suma, contador),
+    )
+
+
+def registrar_venta(producto_id: int, cantidad: int) -> None:
+    """Add ``cantidad`` units (negative to subtract) to the sold counter."""
+
+    from products.models import Producto
+
+    Producto.objects.filter(pk=producto_id).update(
+        unidades_vendidas=Greatest(F("unidades_vendidas") + cantidad, Value(0)),
+    )
+
+
+def _subconsulta(model, campo_fk: str, agregado):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{campo_fk: OuterRef("pk")})
+            .order_by()
+            .values(campo_fk)
+            .annotate(valor=agregado)
+            .values("valor")[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def recalcular_contadores(queryset=None) -> int:
+    """Rebuild every counter from ``Review`` and ``OrderItem`` in one UPDATE.
+
+    Sales still pending in stock shards are left out of ``unidades_vendidas``;
+    ``reconciliar_stock`` adds them when it folds the shards.
+    Returns the number of products updated.
+    """
+
+    from orders.models import OrderItem
+    from products.models import FragmentoStock, Producto, Review
+
+    if queryset is None:
+        queryset = Producto.objects.all()
+
+    contador = _subconsulta(Review, "producto", Count("pk"))
+    suma = _subconsulta(Review, "producto", Sum("rating"))
+    return queryset.update(
+        contador_resenas=contador,
+        suma_ratings=suma,
+        rating_promedio=_promedio(suma, contador),
+        unidades_vendidas=Greatest(
+            _subconsulta(OrderItem, "producto", Sum("cantidad"))
+            - _subconsulta(FragmentoStock, "producto", Sum("vendidas")),
+            Value(0),
+        ),
+    )
@@ -0,0 +1,66 @@
+"""Category facets (product counts per category) for the catalog listing.
+
+The global facets are a single ``GROUP BY categoria`` cached under a version
+key that ``products.signals`` bumps only when a product's category changes
+or it goes in or out of stock, so listing pages never pay for a DISTINCT
+scan. Facets scoped to a search query are cached per query and version.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+VERSION_KEY = "productos:facetas:version"
+FACETAS_KEY = "productos:facetas:{version}:{alcance}"
+FACETAS_TIMEOUT = 60 * 60
+FACETAS_BUSQUEDA_TIMEOUT = 5 * 60
+
+
+def invalidar_facetas() -> None:
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def _version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.set(VERSION_KEY, version, None)
+    return version
+
+
+def calcular_facetas(queryset) -> list[dict]:
+    """Count products and in-stock products per non-empty category."""
+
+    from .stock import expresion_stock
+
+    return list(
+        queryset.exclude(categoria="")
+        .alias(stock_vivo=expresion_stock())
+        .order_by()
+        .values("categoria")
+        .annotate(total=Count("id"), en_stock=Count("id", filter=Q(stock_vivo__gt=0)))
+        .order_by("categoria")
+    )
+
+
+def facetas_categorias(queryset=None, *, alcance: str = "") -> list[dict]:
+    """Return cached facets for the whole catalog or for ``queryset``.
+
+    ``alcance`` identifies a scoped ``queryset`` (e.g. the search text) and
+    is part of the cache key; leave it empty for the global facets.
+    """
+
+    from products.models import Producto
+
+    if queryset is None:
+        queryset = Producto.objects.all()
+    clave = FACETAS_KEY.format(
+        version=_version(),
+        alcance=hashlib.sha1(alcance.encode("utf-8")).hexdigest() if alcance else "todas",
+    )
+    timeout = FACETAS_BUSQUEDA_TIMEOUT if alcance else FACETAS_TIMEOUT
+    return cache.get_or_set(clave, lambda: calcular_facetas(queryset), timeout)
@@ -0,0 +1,108 @@
+"""Responsive derivatives for product images.
+
+Every uploaded ``Producto.imagen`` gets resized copies at ``ANCHOS`` pixels
+in WebP and JPEG, stored next to the original as ``<nombre>_<ancho>w.<ext>``.
+Generation runs in a small thread pool after the transaction commits so the
+upload request never waits for Pillow; ``Producto.imagen_variantes`` flips
+to ``True`` once the files exist and the ``imagen_producto`` template tag
+starts emitting ``srcset``.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+
+LOGGER = logging.getLogger(__name__)
+
+ANCHOS = (200, 400, 800)
+FORMATOS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+_EJECUTOR: ThreadPoolExecutor | None = None
+_LOCK = threading.Lock()
+
+
+def nombre_variante(nombre: str, ancho: int, extension: str) -> str:
+    base, _ = os.path.splitext(nombre)
+    return f"{base}_{ancho}w.{extension}"
+
+
+def _a_rgb(imagen: Image.Image) -> Image.Image:
+    if imagen.mode in ("RGBA", "LA", "P"):
+        imagen = imagen.convert("RGBA")
+        fondo = Image.new("RGB", imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.getchannel("A"))
+        return fondo
+    return imagen.convert("RGB")
+
+
+def generar_variantes(nombre: str, storage=None) -> list[str]:
+    """Write every width/format derivative of ``nombre`` and return their names.
+
+    Images narrower than a target width are re-encoded without upscaling.
+    Only touches storage, never the database, so it is safe to run in
+    worker processes.
+    """
+
+    storage = storage or default_storage
+    with storage.open(nombre, "rb") as archivo:
+        original = Image.open(archivo)
+        original.load()
+    original = _a_rgb(ImageOps.exif_transpose(original))
+
+    generadas = []
+    for ancho in ANCHOS:
+        copia = original.copy()
+        copia.thumbnail((ancho, ancho * 4), Image.Resampling.LANCZOS)
+        for extension, (formato, opciones) in FORMATOS.items():
+            buffer = io.BytesIO()
+            copia.save(buffer, formato, **opciones)
+            destino = nombre_variante(nombre, ancho, extension)
+            if storage.exists(destino):
+                storage.delete(destino)
+            generadas.append(storage.save(destino, ContentFile(buffer.getvalue())))
+    return generadas
+
+
+def _procesar(producto_id: int, nombre: str) -> None:
+    from products.models import Producto
+
+    close_old_connections()
+    try:
+        generar_variantes(nombre)
+        # Solo marca el producto si la imagen no cambió mientras tanto
+        Producto.objects.filter(pk=producto_id, imagen=nombre).update(imagen_variantes=True)
+    except Exception:
+        LOGGER.exception("No se pudieron generar las variantes de %s", nombre)
+    finally:
+        close_old_connections()
+
+
+def _ejecutor() -> ThreadPoolExecutor:
+    global _EJECUTOR
+
+    with _LOCK:
+        if _EJECUTOR is None:
+            _EJECUTOR = ThreadPoolExecutor(
+                max_workers=getattr(settings, "PRODUCTOS_VARIANTES_WORKERS", 2),
+                thread_name_prefix="variantes",
+            )
+    return _EJECUTOR
+
+
+def programar_variantes(producto_id: int, nombre: str):
+    """Queue derivative generation off the request path; returns the future."""
+
+    return _ejecutor().submit(_procesar, producto_id, nombre)
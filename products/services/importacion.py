@@ -0,0 +1,171 @@
+"""Streaming bulk import of seller catalogs.
+
+Rows are read one at a time from CSV or JSON Lines, validated against the
+``Producto`` fields and upserted in fixed-size batches with
+``bulk_create(update_conflicts=True)`` keyed on ``(vendedor, sku)``, so
+memory stays bounded by the batch size whatever the file size. Each batch
+commits on its own and reports the last consumed line, which the
+management command stores as a checkpoint to resume after a failure.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, TextIO
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .catalogo import invalidar_catalogo
+from .facetas import invalidar_facetas
+
+CAMPOS_IMPORTACION = ("sku", "nombre", "descripcion", "precio", "stock", "categoria")
+CAMPOS_ACTUALIZABLES = ["nombre", "descripcion", "precio", "stock", "categoria", "fecha_actualizacion"]
+MAX_ERRORES_GUARDADOS = 100
+
+
+@dataclass
+class ResultadoImportacion:
+    procesadas: int = 0
+    importadas: int = 0
+    ultima_linea: int = 0
+    segundos: float = 0.0
+    errores: list = field(default_factory=list)
+    total_errores: int = 0
+
+    @property
+    def filas_por_segundo(self) -> float:
+        return self.procesadas / self.segundos if self.segundos else 0.0
+
+    def registrar_error(self, linea: int, mensaje: str) -> None:
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES_GUARDADOS:
+            self.errores.append((linea, mensaje))
+
+
+def leer_filas(archivo: TextIO, formato: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """Yield ``(linea, fila, error)`` lazily from a CSV or JSON Lines stream."""
+
+    if formato == "csv":
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila, None
+    elif formato == "jsonl":
+        for linea, texto in enumerate(archivo, start=1):
+            if not texto.strip():
+                continue
+            try:
+                fila = json.loads(texto)
+            except ValueError as exc:
+                yield linea, None, f"JSON inválido: {exc}"
+                continue
+            if not isinstance(fila, dict):
+                yield linea, None, "Se esperaba un objeto JSON"
+                continue
+            yield linea, fila, None
+    else:
+        raise ValueError(f"Formato no soportado: {formato}")
+
+
+def validar_fila(fila: dict) -> dict:
+    """Clean ``fila`` with the model fields; raises ``ValidationError``."""
+
+    from products.models import Producto
+
+    limpia = {}
+    errores = {}
+    for nombre in CAMPOS_IMPORTACION:
+        campo = Producto._meta.get_field(nombre)
+        valor = fila.get(nombre)
+        if isinstance(valor, str):
+            valor = valor.strip()
+        if valor in (None, "") and campo.has_default():
+            valor = campo.get_default()
+        elif valor is None and not campo.null:
+            valor = ""
+        try:
+            limpia[nombre] = campo.clean(valor, None)
+        except ValidationError as exc:
+            errores[nombre] = exc.messages
+    if not limpia.get("sku") and "sku" not in errores:
+        errores["sku"] = ["El SKU es obligatorio para importar."]
+    if errores:
+        raise ValidationError(errores)
+    return limpia
+
+
+def _guardar_lote(lote: list, vendedor) -> int:
+    from products.models import Producto
+
+    ahora = timezone.now()
+    with transaction.atomic():
+        Producto.objects.bulk_create(
+            [Producto(vendedor=vendedor, fecha_actualizacion=ahora, **datos) for datos in lote],
+            update_conflicts=True,
+            unique_fields=["vendedor", "sku"],
+            update_fields=CAMPOS_ACTUALIZABLES,
+        )
+    return len(lote)
+
+
+def importar_catalogo(
+    filas: Iterable[tuple[int, dict | None, str | None]],
+    vendedor,
+    *,
+    tamano_lote: int = 1000,
+    desde_linea: int = 0,
+    al_confirmar: Callable[[ResultadoImportacion], None] | None = None,
+) -> ResultadoImportacion:
+    """Validate and upsert ``filas`` for ``vendedor`` in batches.
+
+    Lines up to ``desde_linea`` are skipped (resume from checkpoint).
+    ``al_confirmar`` is called after every committed batch.
+    """
+
+    resultado = ResultadoImportacion(ultima_linea=desde_linea)
+    inicio = time.perf_counter()
+    lote: list = []
+    pendientes: dict = {}
+
+    def confirmar(linea: int) -> None:
+        if lote:
+            resultado.importadas += _guardar_lote(lote, vendedor)
+            lote.clear()
+            pendientes.clear()
+        resultado.ultima_linea = linea
+        resultado.segundos = time.perf_counter() - inicio
+        if al_confirmar:
+            al_confirmar(resultado)
+
+    linea = desde_linea
+    for linea, fila, error in filas:
+        if linea <= desde_linea:
+            continue
+        resultado.procesadas += 1
+        if error is None:
+            try:
+                datos = validar_fila(fila)
+            except ValidationError as exc:
+                error = "; ".join(f"{campo}: {' '.join(msgs)}" for campo, msgs in exc.message_dict.items())
+        if error is not None:
+            resultado.registrar_error(linea, error)
+            continue
+
+        # Un SKU repetido dentro del mismo lote: gana la última fila
+        if datos["sku"] in pendientes:
+            lote[pendientes[datos["sku"]]] = datos
+        else:
+            pendientes[datos["sku"]] = len(lote)
+            lote.append(datos)
+        if len(lote) >= tamano_lote:
+            confirmar(linea)
+
+    confirmar(linea)
+    if resultado.importadas:
+        invalidar_catalogo()
+        invalidar_facetas()
+    return resultado
@@ -0,0 +1,46 @@
+"""Review pages for the product detail view and its JSON endpoint.
+
+Reviews are read newest-first or by rating with keyset pagination and
+``select_related('usuario')``. The first page of each ordering is rendered
+inside a fragment cache whose key includes a per-product version that
+``products.signals`` bumps whenever a review is created, edited or deleted.
+"""
+
+from __future__ import annotations
+
+import time
+
+from django.core.cache import cache
+
+from home.utils.paginacion import CursorPaginator
+
+ORDENES_RESENAS = {
+    "recientes": ("-fecha", "-id"),
+    "rating": ("-rating", "-fecha", "-id"),
+}
+RESENAS_POR_PAGINA = 10
+VERSION_KEY = "resenas:version:{producto_id}"
+
+
+def paginador_resenas(producto_id: int, orden: str = "recientes", por_pagina: int = RESENAS_POR_PAGINA):
+    from products.models import Review
+
+    queryset = Review.objects.filter(producto_id=producto_id).select_related("usuario")
+    return CursorPaginator(
+        queryset,
+        ORDENES_RESENAS.get(orden, ORDENES_RESENAS["recientes"]),
+        por_pagina=por_pagina,
+    )
+
+
+def version_resenas(producto_id: int) -> int:
+    clave = VERSION_KEY.format(producto_id=producto_id)
+    version = cache.get(clave)
+    if version is None:
+        version = time.time_ns()
+        cache.set(clave, version, None)
+    return version
+
+
+def invalidar_resenas(producto_id: int) -> None:
+    cache.set(VERSION_KEY.format(producto_id=producto_id), time.time_ns(), None)
@@ -0,0 +1,226 @@
+"""Sharded stock for products with heavy concurrent demand.
+
+Every checkout line runs ``UPDATE producto SET stock = stock - n``, so on a
+hot product all buyers queue on one row lock. ``fragmentar_stock`` splits
+that product's stock across N ``FragmentoStock`` rows and sets
+``Producto.stock_fragmentado``. From then on ``descontar_fragmento`` takes
+the units from one random shard that can cover them, so concurrent
+checkouts lock different rows. A sale too big for any single shard falls
+back to locking all the product's shards and taking units from several.
+
+While a product is sharded the ``stock``, ``unidades_vendidas`` and
+``fecha_actualizacion`` columns of its row are only refreshed by
+``reconciliar_stock``, which also rebalances the shards evenly; run it
+periodically (``manage.py rebalancear_stock``). Sales leave the row alone,
+so ``updated_since`` syncs of the v2 API see a sharded product's stock
+change at its next reconciliation, not at the sale. Pages, APIs and checks
+read the live figure through ``expresion_stock``:
+``Producto.objects.con_stock_actual()``, ``.en_stock()`` and
+``Producto.stock_disponible``. ``Producto.save()`` never writes ``stock``
+while the product is sharded (a value loaded before the latest sales
+would bring those units back); set a new total with ``repartir_stock``.
+
+This pays off on databases with row-level locks. SQLite locks the whole
+database for every write, so there it only adds a query per line.
+"""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .catalogo import invalidar_catalogo, olvidar_lote
+from .facetas import invalidar_facetas
+
+FRAGMENTOS_DEFECTO = 8
+
+
+@dataclass
+class ResultadoConciliacion:
+    productos: int = 0
+    vendidas: int = 0
+
+
+def _invalidar(producto_ids) -> None:
+    invalidar_catalogo()
+    invalidar_facetas()
+    for producto_id in producto_ids:
+        olvidar_lote(producto_id)
+
+
+def _repartir(total: int, fragmentos: int) -> list[int]:
+    base, resto = divmod(total, fragmentos)
+    return [base + (1 if indice < resto else 0) for indice in range(fragmentos)]
+
+
+def expresion_stock(producto_ref: str = "pk"):
+    """Live stock of a ``Producto``: its column, or its shards when sharded."""
+
+    from products.models import FragmentoStock
+
+    suma = (
+        FragmentoStock.objects.filter(producto_id=OuterRef(producto_ref))
+        .values("producto_id")
+        .annotate(total=Sum("stock"))
+        .values("total")
+    )
+    return Case(
+        When(stock_fragmentado=True, then=Coalesce(Subquery(suma), Value(0))),
+        default=F("stock"),
+    )
+
+
+def repartir_stock(producto_id: int, total: int, fragmentos: int | None = None) -> None:
+    """Set the product's shards to hold ``total`` units split evenly.
+
+    Units sold since the last reconciliation are folded into
+    ``unidades_vendidas`` first, so no sale is lost.
+    """
+
+    from products.models import FragmentoStock, Producto
+
+    with transaction.atomic():
+        actuales = list(FragmentoStock.objects.select_for_update().filter(producto_id=producto_id))
+        vendidas = sum(fragmento.vendidas for fragmento in actuales)
+        fragmentos = fragmentos or len(actuales) or FRAGMENTOS_DEFECTO
+        FragmentoStock.objects.filter(producto_id=producto_id).delete()
+        FragmentoStock.objects.bulk_create([
+            FragmentoStock(producto_id=producto_id, indice=indice, stock=stock)
+            for indice, stock in enumerate(_repartir(total, fragmentos))
+        ])
+        Producto.objects.filter(pk=producto_id).update(
+            stock=total,
+            stock_fragmentado=True,
+            unidades_vendidas=F("unidades_vendidas") + vendidas,
+            fecha_actualizacion=timezone.now(),
+        )
+
+
+def fragmentar_stock(producto_id: int, fragmentos: int = FRAGMENTOS_DEFECTO) -> None:
+    """Turn on sharded stock for a product (or change its shard count)."""
+
+    from products.models import Producto
+
+    with transaction.atomic():
+        total = (
+            Producto.objects.select_for_update()
+            .annotate(actual=expresion_stock())
+            .values_list("actual", flat=True)
+            .get(pk=producto_id)
+        )
+        repartir_stock(producto_id, total, fragmentos)
+
+
+def unificar_stock(producto_id: int) -> None:
+    """Turn sharded stock off: reconcile, then drop the shards."""
+
+    from products.models import FragmentoStock, Producto
+
+    with transaction.atomic():
+        reconciliar_stock([producto_id], rebalancear=False)
+        FragmentoStock.objects.filter(producto_id=producto_id).delete()
+        Producto.objects.filter(pk=producto_id).update(stock_fragmentado=False)
+
+
+def reponer_stock(cantidades: dict) -> None:
+    """Give units back (``{producto_id: cantidad}``), e.g. from cancelled orders.
+
+    Sharded products get them on their first shard; the next
+    ``reconciliar_stock`` spreads them out.
+    """
+
+    from products.models import FragmentoStock, Producto
+
+    fragmentados = set(
+        Producto.objects.filter(pk__in=cantidades, stock_fragmentado=True).values_list("pk", flat=True)
+    )
+    for producto_id, cantidad in cantidades.items():
+        if producto_id in fragmentados:
+            FragmentoStock.objects.filter(producto_id=producto_id, indice=0).update(stock=F("stock") + cantidad)
+        else:
+            Producto.objects.filter(pk=producto_id).update(
+                stock=F("stock") + cantidad, fecha_actualizacion=timezone.now()
+            )
+    if cantidades:
+        transaction.on_commit(lambda: _invalidar(list(cantidades)))
+
+
+def descontar_fragmento(producto_id: int, cantidad: int) -> bool:
+    """Take ``cantidad`` units from the product's shards; ``False`` if short.
+
+    Must run inside the caller's transaction.
+    """
+
+    from products.models import FragmentoStock
+
+    candidato = (
+        FragmentoStock.objects.filter(producto_id=producto_id, stock__gte=cantidad)
+        .order_by("?")
+        .values("pk")[:1]
+    )
+    actualizados = FragmentoStock.objects.filter(pk=Subquery(candidato), stock__gte=cantidad).update(
+        stock=F("stock") - cantidad, vendidas=F("vendidas") + cantidad
+    )
+    return bool(actualizados) or _descontar_repartido(producto_id, cantidad)
+
+
+def _descontar_repartido(producto_id: int, cantidad: int) -> bool:
+    """Slow path: lock every shard and spread the sale across several."""
+
+    from products.models import FragmentoStock
+
+    fragmentos = list(FragmentoStock.objects.select_for_update().filter(producto_id=producto_id, stock__gt=0))
+    if sum(fragmento.stock for fragmento in fragmentos) < cantidad:
+        return False
+    random.shuffle(fragmentos)
+    pendiente = cantidad
+    for fragmento in fragmentos:
+        tomadas = min(fragmento.stock, pendiente)
+        fragmento.stock -= tomadas
+        fragmento.vendidas += tomadas
+        pendiente -= tomadas
+        if not pendiente:
+            break
+    FragmentoStock.objects.bulk_update(fragmentos, ["stock", "vendidas"])
+    return True
+
+
+def reconciliar_stock(producto_ids=None, rebalancear: bool = True) -> ResultadoConciliacion:
+    """Copy shard totals into ``Producto`` and, optionally, even the shards out.
+
+    Each product is handled in its own short transaction.
+    """
+
+    from products.models import FragmentoStock, Producto
+
+    if producto_ids is None:
+        producto_ids = list(Producto.objects.filter(stock_fragmentado=True).values_list("pk", flat=True))
+    resultado = ResultadoConciliacion()
+    for producto_id in producto_ids:
+        with transaction.atomic():
+            fragmentos = list(
+                FragmentoStock.objects.select_for_update().filter(producto_id=producto_id).order_by("indice")
+            )
+            if not fragmentos:
+                continue
+            total = sum(fragmento.stock for fragmento in fragmentos)
+            vendidas = sum(fragmento.vendidas for fragmento in fragmentos)
+            nuevos = _repartir(total, len(fragmentos)) if rebalancear else [f.stock for f in fragmentos]
+            for fragmento, stock in zip(fragmentos, nuevos):
+                fragmento.stock, fragmento.vendidas = stock, 0
+            FragmentoStock.objects.bulk_update(fragmentos, ["stock", "vendidas"])
+            Producto.objects.filter(pk=producto_id).update(
+                stock=total,
+                unidades_vendidas=F("unidades_vendidas") + vendidas,
+                fecha_actualizacion=timezone.now(),
+            )
+        resultado.productos += 1
+        resultado.vendidas += vendidas
+    if resultado.productos:
+        transaction.on_commit(lambda: _invalidar(producto_ids))
+    return resultado
@@ -0,0 +1,102 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Producto, Review
+from .services import (
+    instalar_indice,
+    invalidar_catalogo,
+    invalidar_facetas,
+    invalidar_resenas,
+    recalcular_contadores,
+    registrar_resena,
+    registrar_venta,
+)
+from .services.catalogo import CAMPOS_API, olvidar_lote
+from .services.imagenes import programar_variantes
+
+
+@receiver(pre_save, sender=Producto)
+def detectar_cambios_catalogo(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Marca si cambian campos de la API de catálogo, de las facetas o la imagen"""
+    instance._cambio_catalogo = instance._cambio_facetas = True
+    instance._cambio_imagen = bool(instance.imagen) and not raw
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(CAMPOS_API):
+        instance._cambio_catalogo = instance._cambio_facetas = instance._cambio_imagen = False
+        return
+    anterior = Producto.objects.filter(pk=instance.pk).values(*CAMPOS_API).first()
+    if anterior is None:
+        return
+    instance._cambio_imagen = (anterior["imagen"] or "") != (instance.imagen.name or "")
+    if instance._cambio_imagen:
+        # Las variantes de la imagen anterior ya no sirven
+        instance.imagen_variantes = False
+    instance._cambio_catalogo = any(
+        str(anterior[campo] or "") != str(getattr(instance, campo) or "") for campo in CAMPOS_API
+    )
+    instance._cambio_facetas = (
+        anterior["categoria"] != instance.categoria
+        or (anterior["stock"] > 0) != (instance.stock > 0)
+    )
+
+
+@receiver(post_save, sender=Producto)
+def invalidar_catalogo_guardado(sender, instance, **kwargs):
+    if getattr(instance, "_cambio_catalogo", True):
+        invalidar_catalogo()
+        olvidar_lote(instance.pk)
+    if getattr(instance, "_cambio_facetas", True):
+        invalidar_facetas()
+    if getattr(instance, "_cambio_imagen", False) and not kwargs.get("created"):
+        # save() no escribe imagen_variantes: las de la imagen anterior se descartan aquí
+        Producto.objects.filter(pk=instance.pk).update(imagen_variantes=False)
+    if getattr(instance, "_cambio_imagen", False) and instance.imagen:
+        producto_id, nombre = instance.pk, instance.imagen.name
+        transaction.on_commit(lambda: programar_variantes(producto_id, nombre))
+
+
+@receiver(post_delete, sender=Producto)
+def invalidar_catalogo_borrado(sender, instance, **kwargs):
+    invalidar_catalogo()
+    olvidar_lote(instance.pk)
+    invalidar_facetas()
+
+
+@receiver(post_save, sender=Review)
+def actualizar_contadores_resena(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    invalidar_resenas(instance.producto_id)
+    if created:
+        registrar_resena(instance.producto_id, instance.rating)
+    else:
+        # Edición de rating (admin): poco frecuente, se recalcula ese producto
+        recalcular_contadores(Producto.objects.filter(pk=instance.producto_id))
+
+
+@receiver(post_delete, sender=Review)
+def descontar_resena(sender, instance, **kwargs):
+    registrar_resena(instance.producto_id, instance.rating, signo=-1)
+    invalidar_resenas(instance.producto_id)
+
+
+@receiver(post_save, sender="orders.OrderItem")
+def actualizar_unidades_vendidas(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        registrar_venta(instance.producto_id, instance.cantidad)
+    else:
+        recalcular_contadores(Producto.objects.filter(pk=instance.producto_id))
+
+
+@receiver(post_delete, sender="orders.OrderItem")
+def descontar_unidades_vendidas(sender, instance, **kwargs):
+    registrar_venta(instance.producto_id, -instance.cantidad)
+
+
+def instalar_indice_busqueda(sender, using="default", **kwargs):
+    """Recrea el índice FTS5 y sus triggers después de cada migrate"""
+    instalar_indice(connections[using])
@@ -0,0 +1,38 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from products.services.imagenes import ANCHOS, nombre_variante
+
+register = template.Library()
+
+SIZES_DEFECTO = "(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw"
+
+
+def _srcset(nombre, extension):
+    return ", ".join(
+        f"{default_storage.url(nombre_variante(nombre, ancho, extension))} {ancho}w" for ancho in ANCHOS
+    )
+
+
+@register.simple_tag
+def imagen_producto(producto, clase="", sizes=SIZES_DEFECTO, carga="lazy"):
+    """Renderiza la imagen del producto con srcset WebP/JPEG si hay variantes"""
+    if not producto.imagen:
+        return ""
+    if not producto.imagen_variantes:
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" loading="{}" decoding="async">',
+            producto.imagen.url, clase, producto.nombre, carga,
+        )
+
+    nombre = producto.imagen.name
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="{}" decoding="async">'
+        '</picture>',
+        _srcset(nombre, "webp"), sizes,
+        default_storage.url(nombre_variante(nombre, ANCHOS[1], "jpg")), _srcset(nombre, "jpg"), sizes,
+        clase, producto.nombre, carga,
+    )
@@ -1,10 +1,39 @@
+import gzip
+import json
+import tempfile
 from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.functions import Now
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 
-from .models import Producto
+from orders.models import Order, OrderItem
+
+from .models import FragmentoStock, Producto, Review
+from .services import (
+    buscar_productos,
+    descontar_fragmento,
+    facetas_categorias,
+    fragmentar_stock,
+    reconciliar_stock,
+    recalcular_contadores,
+    repartir_stock,
+    unificar_stock,
+)
+from .services.imagenes import ANCHOS, generar_variantes, nombre_variante
+from .services.importacion import importar_catalogo, leer_filas
 
 
 class ProductosAPITestCase(TestCase):
@@ -34,3 +63,645 @@ class ProductosAPITestCase(TestCase):
         first = payload['results'][0]
         self.assertIn('detail_url', first)
         self.assertIn('/products/', first['detail_url'])
+
+
+class ContadoresProductoTestCase(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.vendedor = User.objects.create_user(username="vendedor", password="12345pass")
+        self.cliente = User.objects.create_user(username="cliente", password="12345pass")
+        self.otro = User.objects.create_user(username="otro", password="12345pass")
+        self.producto = Producto.objects.create(
+            vendedor=self.vendedor,
+            nombre="Rascador",
+            precio=Decimal("30.00"),
+            stock=5,
+        )
+
+    def test_resenas_actualizan_contadores(self):
+        Review.objects.create(producto=self.producto, usuario=self.cliente, rating=5)
+        review = Review.objects.create(producto=self.producto, usuario=self.otro, rating=2)
+        self.producto.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.producto.cantidad_resenas, 2)
+            self.assertEqual(self.producto.promedio_rating, 3.5)
+            self.assertEqual(self.producto.promedio_rating_entero, 4)
+
+        review.delete()
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.cantidad_resenas, 1)
+        self.assertEqual(self.producto.promedio_rating, 5)
+
+    def test_order_items_actualizan_unidades_vendidas(self):
+        orden = Order.objects.create(usuario=self.cliente)
+        OrderItem.objects.create(order=orden, producto=self.producto, cantidad=3, precio_unitario=Decimal("30.00"))
+        self.producto.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.producto.total_vendidos, 3)
+
+    def test_guardado_completo_no_pisa_contadores(self):
+        cargado = Producto.objects.get(pk=self.producto.pk)
+        Review.objects.create(producto=self.producto, usuario=self.cliente, rating=4)
+        orden = Order.objects.create(usuario=self.cliente)
+        OrderItem.objects.create(order=orden, producto=self.producto, cantidad=2, precio_unitario=Decimal("30.00"))
+
+        fragmentar_stock(self.producto.pk, fragmentos=2)
+        Producto.objects.filter(pk=self.producto.pk).update(imagen_variantes=True)
+
+        cargado.nombre = "Rascador XL"
+        cargado.save()
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.nombre, "Rascador XL")
+        self.assertEqual((self.producto.contador_resenas, self.producto.unidades_vendidas), (1, 2))
+        self.assertTrue(self.producto.stock_fragmentado)
+        self.assertTrue(self.producto.imagen_variantes)
+
+    def test_comando_recalcula_desde_cero(self):
+        Review.objects.create(producto=self.producto, usuario=self.cliente, rating=4)
+        orden = Order.objects.create(usuario=self.cliente)
+        OrderItem.objects.create(order=orden, producto=self.producto, cantidad=2, precio_unitario=Decimal("30.00"))
+        Producto.objects.update(contador_resenas=0, suma_ratings=0, unidades_vendidas=0)
+
+        call_command("recalcular_contadores", stdout=StringIO())
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.cantidad_resenas, 1)
+        self.assertEqual(self.producto.promedio_rating, 4)
+        self.assertEqual(self.producto.total_vendidos, 2)
+
+
+class BusquedaProductosTestCase(TestCase):
+    def setUp(self):
+        vendedor = get_user_model().objects.create_user(username="vendedor", password="12345pass")
+        self.cama = Producto.objects.create(
+            vendedor=vendedor,
+            nombre="Cama ortopédica",
+            descripcion="Descanso para perros mayores",
+            precio=Decimal("120.00"),
+            stock=3,
+            categoria="Descanso",
+        )
+        self.collar = Producto.objects.create(
+            vendedor=vendedor,
+            nombre="Collar luminoso",
+            descripcion="Incluye una cama de viaje plegable",
+            precio=Decimal("20.00"),
+            stock=0,
+            categoria="Accesorios",
+        )
+
+    def test_busqueda_sin_acentos_y_por_prefijo(self):
+        resultados = list(buscar_productos(Producto.objects.all(), "ortoped"))
+        self.assertEqual(resultados, [self.cama])
+
+    def test_no_consulta_sqlite_master_en_cada_busqueda(self):
+        buscar_productos(Producto.objects.all(), "cama")
+        with CaptureQueriesContext(connection) as consultas:
+            list(buscar_productos(Producto.objects.all(), "cama"))
+        self.assertFalse(any("sqlite_master" in c["sql"] for c in consultas.captured_queries))
+
+    def test_ordena_por_relevancia(self):
+        resultados = list(buscar_productos(Producto.objects.all(), "cama"))
+        self.assertEqual(resultados, [self.cama, self.collar])
+
+    def test_indice_sigue_cambios_y_borrados(self):
+        self.collar.nombre = "Arnés reflectivo"
+        self.collar.save()
+        self.assertEqual(list(buscar_productos(Producto.objects.all(), "arnes")), [self.collar])
+        self.collar.delete()
+        self.assertFalse(buscar_productos(Producto.objects.all(), "arnes").exists())
+
+    def test_vista_y_api_usan_busqueda(self):
+        response = self.client.get(reverse("products:list"), {"q": "ortopedica"})
+        self.assertEqual(list(response.context["productos"]), [self.cama])
+
+        response = self.client.get(reverse("products:api_available"), {"q": "cama"})
+        self.assertEqual([item["id"] for item in response.json()["results"]], [self.cama.pk])
+
+
+class PaginacionCursorTestCase(TestCase):
+    def setUp(self):
+        vendedor = get_user_model().objects.create_user(username="vendedor", password="12345pass")
+        self.productos = [
+            Producto.objects.create(
+                vendedor=vendedor,
+                nombre=f"Juguete {indice:02d}",
+                precio=Decimal("10.00"),
+                stock=1,
+                categoria="Juguetes" if indice % 2 else "Accesorios",
+            )
+            for indice in range(30)
+        ]
+
+    def _recorrer(self, params):
+        vistos = []
+        cursor = None
+        while True:
+            response = self.client.get(
+                reverse("products:list"), {**params, "modo": "cursor", **({"cursor": cursor} if cursor else {})}
+            )
+            self.assertEqual(response.status_code, 200)
+            page = response.context["page_obj"]
+            vistos.extend(page.object_list)
+            if not page.has_next:
+                return vistos, page
+            cursor = page.next_cursor
+
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        vistos, _ = self._recorrer({"orden": "nombre"})
+        self.assertEqual(vistos, sorted(self.productos, key=lambda p: (p.nombre, p.pk)))
+
+    def test_respeta_filtros_y_vuelve_atras(self):
+        vistos, ultima = self._recorrer({"categoria": "Juguetes"})
+        self.assertEqual(len(vistos), 15)
+        self.assertTrue(all(p.categoria == "Juguetes" for p in vistos))
+
+        response = self.client.get(
+            reverse("products:list"),
+            {"categoria": "Juguetes", "modo": "cursor", "cursor": ultima.previous_cursor},
+        )
+        self.assertEqual(list(response.context["page_obj"].object_list), vistos[:12])
+        self.assertEqual(response.context["total_resultados"], 15)
+
+    def test_cursor_invalido_devuelve_404(self):
+        response = self.client.get(reverse("products:list"), {"modo": "cursor", "cursor": "xx"})
+        self.assertEqual(response.status_code, 404)
+
+
+class SnapshotCatalogoTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        vendedor = get_user_model().objects.create_user(username="vendedor", password="12345pass")
+        self.producto = Producto.objects.create(
+            vendedor=vendedor,
+            nombre="Comedero doble",
+            precio=Decimal("15.00"),
+            stock=4,
+            categoria="Accesorios",
+        )
+        self.url = reverse("products:api_available")
+
+    def test_responde_304_con_etag_vigente(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_sirve_copia_gzip(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        payload = json.loads(gzip.decompress(response.content))
+        self.assertEqual(payload["results"][0]["name"], "Comedero doble")
+
+    def test_solo_campos_de_la_api_invalidan_el_snapshot(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        self.producto.descripcion = "Acero inoxidable"
+        self.producto.save()
+        self.assertEqual(self.client.get(self.url)["ETag"], etag)
+
+        self.producto.stock = 3
+        self.producto.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["stock"], 3)
+
+
+class ProductosAPIv2TestCase(TestCase):
+    def setUp(self):
+        vendedor = get_user_model().objects.create_user(username="vendedor", password="12345pass")
+        self.productos = [
+            Producto.objects.create(
+                vendedor=vendedor,
+                nombre=f"Snack {indice}",
+                precio=Decimal("5.00"),
+                stock=indice,
+                categoria="Alimentos" if indice % 2 else "Higiene",
+            )
+            for indice in range(5)
+        ]
+        self.url = reverse("products:api_v2_products")
+
+    def test_campos_seleccionados_y_cursor(self):
+        response = self.client.get(self.url, {"fields": "id,price,stock", "limit": 3})
+        payload = response.json()
+        self.assertEqual(len(payload["results"]), 3)
+        self.assertEqual(set(payload["results"][0]), {"id", "price", "stock"})
+
+        siguiente = self.client.get(self.url, {"fields": "id,price,stock", "limit": 3, "cursor": payload["next_cursor"]})
+        ids = [item["id"] for item in payload["results"] + siguiente.json()["results"]]
+        self.assertEqual(ids, [producto.pk for producto in self.productos])
+        self.assertIsNone(siguiente.json()["next_cursor"])
+
+    def test_filtros_categoria_y_updated_since(self):
+        response = self.client.get(self.url, {"categoria": "Alimentos"})
+        self.assertEqual(len(response.json()["results"]), 2)
+
+        corte = timezone.now()
+        self.productos[0].precio = Decimal("6.00")
+        self.productos[0].save()
+        response = self.client.get(self.url, {"updated_since": corte.isoformat()})
+        self.assertEqual([item["id"] for item in response.json()["results"]], [self.productos[0].pk])
+
+    def test_cursor_no_salta_filas_con_otra_precision(self):
+        # Now() en SQLite guarda milisegundos; el cursor debe empatar igual
+        Producto.objects.update(fecha_actualizacion=Now())
+        ids, cursor = [], None
+        while True:
+            parametros = {"fields": "id", "limit": 1, **({"cursor": cursor} if cursor else {})}
+            payload = self.client.get(self.url, parametros).json()
+            ids += [item["id"] for item in payload["results"]]
+            cursor = payload["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(ids, [producto.pk for producto in self.productos])
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get(self.url, {"fields": "id,password"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"updated_since": "ayer"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"cursor": "???"}).status_code, 400)
+
+
+class ProductosLoteAPITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        vendedor = get_user_model().objects.create_user(username="vendedor", password="12345pass")
+        self.productos = [
+            Producto.objects.create(vendedor=vendedor, nombre=f"Arena {i}", precio=Decimal("8.50"), stock=i)
+            for i in range(3)
+        ]
+        self.url = reverse("products:api_v2_batch")
+
+    def test_consulta_por_ids_con_una_query_y_cache(self):
+        ids = [p.pk for p in self.productos] + [999999]
+        with self.assertNumQueries(1):
+            payload = self.client.get(self.url, {"ids": ",".join(map(str, ids))}).json()
+        self.assertEqual([fila["id"] for fila in payload["results"]], ids[:3])
+        self.assertEqual(payload["missing"], [999999])
+
+        with self.assertNumQueries(0):
+            response = self.client.post(
+                self.url, json.dumps({"ids": ids[:3]}), content_type="application/json"
+            )
+        self.assertEqual(len(response.json()["results"]), 3)
+
+    def test_guardar_producto_olvida_la_entrada_cacheada(self):
+        producto = self.productos[1]
+        self.client.get(self.url, {"ids": producto.pk})
+        producto.stock = 40
+        producto.save()
+        payload = self.client.get(self.url, {"ids": producto.pk}).json()
+        self.assertEqual(payload["results"][0]["stock"], 40)
+
+    def test_ndjson_y_validaciones(self):
+        response = self.client.get(self.url, {"ids": self.productos[0].pk, "format": "ndjson"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(json.loads(response.content.splitlines()[0])["id"], self.productos[0].pk)
+        self.assertEqual(self.client.get(self.url, {"ids": "a,b"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"ids": "1,%d" % 2**63}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"ids": "0,-5"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+class RankingsProductosTestCase(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        vendedor = User.objects.create_user(username="vendedor", password="12345pass")
+        self.clientes = [User.objects.create_user(username=f"c{i}", password="12345pass") for i in range(3)]
+        self.a, self.b, self.c = [
+            Producto.objects.create(vendedor=vendedor, nombre=nombre, precio=Decimal("10.00"), stock=50)
+            for nombre in ("A", "B", "C")
+        ]
+        orden = Order.objects.create(usuario=self.clientes[0])
+        OrderItem.objects.create(order=orden, producto=self.b, cantidad=7, precio_unitario=Decimal("10.00"))
+        OrderItem.objects.create(order=orden, producto=self.a, cantidad=2, precio_unitario=Decimal("10.00"))
+        for cliente, rating in zip(self.clientes, (3, 4, 5)):
+            Review.objects.create(producto=self.c, usuario=cliente, rating=rating)
+        Review.objects.create(producto=self.a, usuario=self.clientes[0], rating=5)
+
+    def test_rankings_leen_contadores(self):
+        self.assertEqual(list(Producto.mas_vendidos(limite=2)), [self.b, self.a])
+        self.assertEqual(list(Producto.mas_comentados(limite=2)), [self.c, self.a])
+        self.assertEqual(list(Producto.mejor_calificados()), [self.a, self.c])
+
+    def test_vistas_sin_joins(self):
+        for nombre, esperado in (
+            ("products:top_vendidos", self.b),
+            ("products:top_comentados", self.c),
+            ("products:top_calificados", self.a),
+        ):
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(reverse(nombre))
+            self.assertEqual(response.context["productos"][0], esperado)
+            self.assertTrue(all("JOIN" not in q["sql"] for q in consultas.captured_queries))
+
+
+class FacetasCategoriasTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        vendedor = get_user_model().objects.create_user(username="vendedor", password="12345pass")
+        self.hueso = Producto.objects.create(
+            vendedor=vendedor, nombre="Hueso de cuero", precio=Decimal("4.00"), stock=0, categoria="Juguetes"
+        )
+        Producto.objects.create(vendedor=vendedor, nombre="Pelota", precio=Decimal("3.00"), stock=2, categoria="Juguetes")
+        Producto.objects.create(vendedor=vendedor, nombre="Shampoo", precio=Decimal("9.00"), stock=1, categoria="Higiene")
+
+    def test_conteos_por_categoria_cacheados(self):
+        esperado = [
+            {"categoria": "Higiene", "total": 1, "en_stock": 1},
+            {"categoria": "Juguetes", "total": 2, "en_stock": 1},
+        ]
+        self.assertEqual(facetas_categorias(), esperado)
+        with self.assertNumQueries(0):
+            self.assertEqual(facetas_categorias(), esperado)
+
+    def test_invalida_solo_con_cambios_de_categoria_o_stock(self):
+        facetas_categorias()
+        self.hueso.precio = Decimal("5.00")
+        self.hueso.save()
+        with self.assertNumQueries(0):
+            facetas_categorias()
+
+        self.hueso.stock = 3
+        self.hueso.save()
+        juguetes = [f for f in facetas_categorias() if f["categoria"] == "Juguetes"][0]
+        self.assertEqual(juguetes["en_stock"], 2)
+
+    def test_facetas_acotadas_a_la_busqueda(self):
+        response = self.client.get(reverse("products:list"), {"q": "hueso"})
+        self.assertEqual(response.context["categorias"], [{"categoria": "Juguetes", "total": 1, "en_stock": 0}])
+
+
+def _imagen_png(nombre="foto.png", tamano=(1200, 900)):
+    buffer = BytesIO()
+    Image.new("RGBA", tamano, (200, 40, 40, 255)).save(buffer, "PNG")
+    return SimpleUploadedFile(nombre, buffer.getvalue(), content_type="image/png")
+
+
+class VariantesImagenTestCase(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=self.media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.vendedor = get_user_model().objects.create_user(username="vendedor", password="12345pass")
+
+    def _crear(self):
+        return Producto.objects.create(
+            vendedor=self.vendedor, nombre="Transportadora", precio=Decimal("60.00"), imagen=_imagen_png()
+        )
+
+    def test_subir_imagen_programa_variantes_tras_commit(self):
+        with mock.patch("products.signals.programar_variantes") as programar:
+            with self.captureOnCommitCallbacks(execute=True):
+                producto = self._crear()
+        programar.assert_called_once_with(producto.pk, producto.imagen.name)
+
+    def test_genera_anchos_y_formatos(self):
+        with mock.patch("products.signals.programar_variantes"):
+            producto = self._crear()
+        generar_variantes(producto.imagen.name)
+        for ancho in ANCHOS:
+            for extension in ("webp", "jpg"):
+                ruta = Path(self.media.name) / nombre_variante(producto.imagen.name, ancho, extension)
+                with Image.open(ruta) as variante:
+                    self.assertEqual(variante.width, ancho)
+
+    def test_comando_y_etiqueta_srcset(self):
+        with mock.patch("products.signals.programar_variantes"):
+            producto = self._crear()
+        html = Template("{% load producto_imagenes %}{% imagen_producto p %}").render(Context({"p": producto}))
+        self.assertNotIn("srcset", html)
+
+        call_command("generar_variantes_imagenes", workers=1, stdout=StringIO())
+        producto.refresh_from_db()
+        self.assertTrue(producto.imagen_variantes)
+        html = Template("{% load producto_imagenes %}{% imagen_producto p %}").render(Context({"p": producto}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn("_800w.jpg 800w", html)
+
+        # Una imagen nueva descarta las variantes de la anterior
+        producto.imagen = _imagen_png("otra.png")
+        with mock.patch("products.signals.programar_variantes"):
+            producto.save()
+        producto.refresh_from_db()
+        self.assertFalse(producto.imagen_variantes)
+
+
+class ResenasDetalleTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        vendedor = User.objects.create_user(username="vendedor", password="12345pass")
+        self.producto = Producto.objects.create(vendedor=vendedor, nombre="Cepillo", precio=Decimal("7.00"), stock=5)
+        self.resenas = [
+            Review.objects.create(
+                producto=self.producto,
+                usuario=User.objects.create_user(username=f"cliente{i}"),
+                rating=(i % 5) + 1,
+                comentario=f"Comentario {i}",
+            )
+            for i in range(25)
+        ]
+        self.url = reverse("products:detail", args=[self.producto.pk])
+
+    def test_primera_pagina_limitada_y_cacheada(self):
+        response = self.client.get(self.url)
+        pagina = response.context["resenas"]
+        self.assertEqual(len(pagina.object_list), 10)
+        self.assertEqual(pagina.object_list[0], self.resenas[-1])
+        self.assertContains(response, "data-mas-resenas")
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(self.url)
+        self.assertFalse(any("products_review" in q["sql"] for q in consultas.captured_queries))
+
+    def test_nueva_resena_invalida_el_fragmento(self):
+        self.client.get(self.url)
+        nuevo = get_user_model().objects.create_user(username="nuevo")
+        Review.objects.create(producto=self.producto, usuario=nuevo, rating=5, comentario="Recién llegada")
+        self.assertContains(self.client.get(self.url), "Recién llegada")
+
+    def test_api_carga_paginas_siguientes(self):
+        api = reverse("products:reviews_api", args=[self.producto.pk])
+        vistos, cursor = [], None
+        while True:
+            with self.assertNumQueries(2):
+                payload = self.client.get(api, {"orden": "rating", **({"cursor": cursor} if cursor else {})}).json()
+            vistos.extend(item["rating"] for item in payload["results"])
+            cursor = payload["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(len(vistos), 25)
+        self.assertEqual(vistos, sorted(vistos, reverse=True))
+
+
+class ImportacionCatalogoTestCase(TestCase):
+    def setUp(self):
+        self.vendedor = get_user_model().objects.create_user(username="mayorista", password="12345pass")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _csv(self, filas):
+        ruta = Path(self.tmp.name) / "catalogo.csv"
+        lineas = ["sku,nombre,descripcion,precio,stock,categoria"] + filas
+        ruta.write_text("\n".join(lineas) + "\n", encoding="utf-8")
+        return ruta
+
+    def test_importa_en_lotes_y_actualiza_por_sku(self):
+        Producto.objects.create(vendedor=self.vendedor, sku="A-1", nombre="Viejo", precio=Decimal("1.00"))
+        ruta = self._csv([
+            "A-1,Collar nuevo,,12.50,4,Accesorios",
+            "A-2,Pelota,Goma,3.00,,Juguetes",
+            "A-3,,Sin nombre,3.00,1,Juguetes",
+            "A-4,Hueso,,abc,1,Juguetes",
+            "A-5,Cama,,45,2,Descanso",
+        ])
+        salida, errores = StringIO(), StringIO()
+        call_command("importar_catalogo", str(ruta), vendedor="mayorista", lote=2, stdout=salida, stderr=errores)
+
+        self.assertEqual(Producto.objects.filter(vendedor=self.vendedor).count(), 3)
+        collar = Producto.objects.get(vendedor=self.vendedor, sku="A-1")
+        self.assertEqual((collar.nombre, collar.stock), ("Collar nuevo", 4))
+        self.assertEqual(Producto.objects.get(sku="A-2").stock, 0)
+        self.assertIn("Línea 4", errores.getvalue())
+        self.assertIn("Línea 5", errores.getvalue())
+        self.assertIn("filas/s", salida.getvalue())
+        self.assertEqual(list(buscar_productos(Producto.objects.all(), "cama")), [Producto.objects.get(sku="A-5")])
+
+    def test_reanuda_desde_checkpoint(self):
+        ruta = self._csv(["B-1,Uno,,1,1,X", "B-2,Dos,,1,1,X", "B-3,Tres,,1,1,X"])
+        checkpoint = Path(self.tmp.name) / "progreso.json"
+        checkpoint.write_text(json.dumps({"linea": 3}))
+
+        call_command(
+            "importar_catalogo", str(ruta), vendedor="mayorista", checkpoint=str(checkpoint), stdout=StringIO()
+        )
+        self.assertEqual(list(Producto.objects.values_list("sku", flat=True)), ["B-3"])
+        self.assertFalse(checkpoint.exists())
+
+    def test_jsonl_streaming(self):
+        filas = [json.dumps({"sku": f"J-{i}", "nombre": f"Snack {i}", "precio": "2.5", "stock": i}) for i in range(5)]
+        resultado = importar_catalogo(
+            leer_filas(StringIO("\n".join(filas + ["{no json"])), "jsonl"), self.vendedor, tamano_lote=2
+        )
+        self.assertEqual((resultado.importadas, resultado.total_errores), (5, 1))
+
+
+class StockFragmentadoTestCase(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.vendedor = User.objects.create_user(username="tienda")
+        self.cliente = User.objects.create_user(username="cliente")
+        self.producto = Producto.objects.create(
+            vendedor=self.vendedor, nombre="Oferta", precio=Decimal("9.99"), stock=10
+        )
+
+    def _stock_fragmentos(self):
+        return list(self.producto.fragmentos.order_by("indice").values_list("stock", flat=True))
+
+    def test_fragmentar_reparte_el_stock(self):
+        fragmentar_stock(self.producto.pk, fragmentos=4)
+
+        self.producto.refresh_from_db()
+        self.assertTrue(self.producto.stock_fragmentado)
+        self.assertEqual(self._stock_fragmentos(), [3, 3, 2, 2])
+
+    def test_descuento_usa_varios_fragmentos_si_hace_falta(self):
+        fragmentar_stock(self.producto.pk, fragmentos=4)
+
+        self.assertTrue(descontar_fragmento(self.producto.pk, 1))
+        self.assertTrue(descontar_fragmento(self.producto.pk, 5))
+        self.assertFalse(descontar_fragmento(self.producto.pk, 5))
+        self.assertEqual(sum(self._stock_fragmentos()), 4)
+
+    def test_checkout_no_toca_la_fila_del_producto_hasta_conciliar(self):
+        from orders.services import StockInsuficiente, crear_orden
+        from cart.models import Cart, CartItem
+
+        fragmentar_stock(self.producto.pk, fragmentos=4)
+        self.producto.refresh_from_db()
+        cart = Cart.objects.create(usuario=self.cliente)
+        with mock.patch("orders.services.checkout.programar_factura"):
+            crear_orden(self.cliente, [CartItem(cart=cart, producto=self.producto, cantidad=7)])
+            with self.assertRaises(StockInsuficiente):
+                crear_orden(self.cliente, [CartItem(cart=cart, producto=self.producto, cantidad=4)])
+
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.stock, self.producto.unidades_vendidas), (10, 0))
+
+        resultado = reconciliar_stock()
+        self.producto.refresh_from_db()
+        self.assertEqual((resultado.productos, resultado.vendidas), (1, 7))
+        self.assertEqual((self.producto.stock, self.producto.unidades_vendidas), (3, 7))
+        self.assertEqual(self._stock_fragmentos(), [1, 1, 1, 0])
+
+        # Las ventas ya conciliadas no se cuentan dos veces al recalcular
+        recalcular_contadores(Producto.objects.filter(pk=self.producto.pk))
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.unidades_vendidas, 7)
+
+    def test_agotado_en_fragmentos_no_se_lista_aunque_la_columna_diga_lo_contrario(self):
+        cache.clear()
+        fragmentar_stock(self.producto.pk, fragmentos=2)
+        self.assertTrue(descontar_fragmento(self.producto.pk, 10))
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock, 10)
+
+        self.assertFalse(Producto.objects.en_stock().exists())
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock_disponible, 0)
+        disponibles = self.client.get(reverse("products:api_available")).json()
+        self.assertEqual(disponibles["count"], 0)
+        v2 = self.client.get(reverse("products:api_v2_products"), {"in_stock": "1"}).json()
+        self.assertEqual(v2["results"], [])
+        self.assertEqual(self.client.get(reverse("products:api_v2_products")).json()["results"][0]["stock"], 0)
+        response = self.client.get(reverse("products:detail", args=[self.producto.pk]))
+        self.assertEqual(response.context["producto"].stock_disponible, 0)
+
+    def test_conciliar_publica_el_stock_en_updated_since(self):
+        fragmentar_stock(self.producto.pk, fragmentos=2)
+        corte = timezone.now()
+        descontar_fragmento(self.producto.pk, 3)
+        url = reverse("products:api_v2_products")
+        parametros = {"fields": "id,stock", "updated_since": corte.isoformat()}
+        self.assertEqual(self.client.get(url, parametros).json()["results"], [])
+
+        reconciliar_stock()
+        self.assertEqual(self.client.get(url, parametros).json()["results"], [{"id": self.producto.pk, "stock": 7}])
+
+    def test_guardar_no_devuelve_unidades_vendidas(self):
+        cargado = Producto.objects.get(pk=self.producto.pk)
+        fragmentar_stock(self.producto.pk, fragmentos=2)
+        descontar_fragmento(self.producto.pk, 4)
+        reconciliar_stock()
+
+        # Edición con el formulario cargado antes de las ventas
+        cargado.precio = Decimal("8.99")
+        cargado.save()
+        producto = Producto.objects.get(pk=self.producto.pk)
+        producto.stock = 20
+        producto.save()
+
+        producto.refresh_from_db()
+        self.assertEqual(self._stock_fragmentos(), [3, 3])
+        self.assertEqual((producto.stock, producto.precio), (6, Decimal("8.99")))
+
+        repartir_stock(self.producto.pk, 20)
+        producto.refresh_from_db()
+        self.assertEqual(self._stock_fragmentos(), [10, 10])
+        self.assertEqual((producto.stock, producto.unidades_vendidas), (20, 4))
+
+    def test_unificar_vuelve_a_la_columna(self):
+        fragmentar_stock(self.producto.pk, fragmentos=3)
+        descontar_fragmento(self.producto.pk, 2)
+        unificar_stock(self.producto.pk)
+
+        self.producto.refresh_from_db()
+        self.assertFalse(self.producto.stock_fragmentado)
+        self.assertEqual((self.producto.stock, self.producto.unidades_vendidas), (8, 2))
+        self.assertFalse(FragmentoStock.objects.exists())
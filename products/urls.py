@@ -8,9 +8,12 @@ urlpatterns = [
     path('', views.ProductoListView.as_view(), name='list'),
     path('crear/', views.ProductoCreateView.as_view(), name='create'),
     path('<int:pk>/', views.ProductoDetailView.as_view(), name='detail'),
+    path('<int:pk>/reviews/', views.resenas_producto_api, name='reviews_api'),
     path('<int:producto_id>/crear-review/', views.CrearReviewView.as_view(), name='crear_review'),
     path('top/vendidos/', views.TopProductosListView.as_view(), name='top_vendidos'),
     path('top/comentados/', views.MasComentadosListView.as_view(), name='top_comentados'),
     path('top/calificados/', views.MejorCalificadosListView.as_view(), name='top_calificados'),
     path('api/available/', views.productos_disponibles_api, name='api_available'),
+    path('api/v2/products/', views.productos_api_v2, name='api_v2_products'),
+    path('api/v2/products/batch/', views.productos_lote_api, name='api_v2_batch'),
 ]
\ No newline at end of file
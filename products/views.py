@@ -1,13 +1,43 @@
+import hashlib
+import json
+from datetime import timezone as dt_timezone
+
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Avg, Count, Q, Sum
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
 from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
 from django.views.generic import CreateView, DetailView, ListView
 
+from home.utils.paginacion import CursorInvalido, CursorPaginator
+
 from .models import Producto, Review
+from .services import (
+    buscar_productos,
+    facetas_categorias,
+    obtener_snapshot,
+    paginador_resenas,
+    serializar_disponibles,
+    version_resenas,
+)
+from .services.catalogo import CAMPOS_V2, CAMPOS_V2_DEFECTO, consultar_lote, serializar_fila_v2
+from .services.resenas import ORDENES_RESENAS
+
+API_V2_LIMITE = 100
+API_V2_LIMITE_MAXIMO = 1000
+API_LOTE_MAXIMO = 5000
+# Mayor entero que acepta SQLite; fuera de rango la consulta lanza OverflowError
+ID_MAXIMO = 2**63 - 1
 
 
 class ProductoListView(ListView):
@@ -15,26 +45,59 @@ class ProductoListView(ListView):
     template_name = "products/product_list.html"
     context_object_name = "productos"
     paginate_by = 12
+    # Modo cursor (?modo=cursor): orden estable, sin OFFSET ni COUNT(*) por página
+    ordenes_cursor = {
+        "recientes": ("-fecha_creacion", "-id"),
+        "nombre": ("nombre", "id"),
+    }
+    conteo_cache_timeout = 300
+
+    @property
+    def modo_cursor(self):
+        return self.request.GET.get("modo") == "cursor"
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().con_stock_actual()
         q = self.request.GET.get("q")
         categoria = self.request.GET.get("categoria")
 
         if q:
-            queryset = queryset.filter(
-                Q(nombre__icontains=q) | Q(descripcion__icontains=q)
-            )
+            queryset = buscar_productos(queryset, q)
 
         if categoria:
             queryset = queryset.filter(categoria=categoria)
 
         return queryset
 
+    def paginate_queryset(self, queryset, page_size):
+        if not self.modo_cursor:
+            return super().paginate_queryset(queryset, page_size)
+
+        orden = self.ordenes_cursor.get(self.request.GET.get("orden"), self.ordenes_cursor["recientes"])
+        paginator = CursorPaginator(queryset, orden, por_pagina=page_size)
+        try:
+            pagina = paginator.pagina(self.request.GET.get("cursor"))
+        except CursorInvalido:
+            raise Http404(_("Cursor de paginación inválido."))
+        return None, pagina, pagina.object_list, pagina.has_other_pages
+
+    def _conteo_cacheado(self, queryset):
+        """Total de resultados para los filtros actuales, cacheado unos minutos"""
+        filtros = "{}\0{}".format(self.request.GET.get("q", ""), self.request.GET.get("categoria", ""))
+        clave = "productos:conteo:" + hashlib.sha1(filtros.encode("utf-8")).hexdigest()
+        return cache.get_or_set(clave, queryset.count, self.conteo_cache_timeout)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Obtener categorías únicas para el filtro
-        context['categorias'] = Producto.objects.values_list('categoria', flat=True).distinct()
+        if self.modo_cursor:
+            context["paginacion_cursor"] = True
+            context["total_resultados"] = self._conteo_cacheado(self.object_list)
+        # Facetas cacheadas: categorías con conteo (acotadas a la búsqueda si hay q)
+        q = self.request.GET.get("q")
+        if q:
+            context['categorias'] = facetas_categorias(buscar_productos(Producto.objects.all(), q), alcance=q)
+        else:
+            context['categorias'] = facetas_categorias()
         context['breadcrumbs'] = [
             {"label": _("Inicio"), "url": reverse_lazy("home:index")},
             {"label": _("Productos"), "url": ""},
@@ -46,10 +109,24 @@ class ProductoDetailView(DetailView):
     model = Producto
     template_name = "products/product_detail.html"
     context_object_name = "producto"
+    queryset = Producto.objects.select_related("vendedor").con_stock_actual()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         producto = context.get("producto")
+        orden = self.request.GET.get("resenas_orden", "recientes")
+        cursor = self.request.GET.get("resenas_cursor")
+        paginator = paginador_resenas(producto.pk, orden)
+        if cursor:
+            try:
+                paginator.decodificar(cursor)
+            except CursorInvalido:
+                raise Http404(_("Cursor de paginación inválido."))
+        # Perezoso: con la primera página en caché no se consulta la base de datos
+        context['resenas'] = SimpleLazyObject(lambda: paginator.pagina(cursor))
+        context['resenas_orden'] = orden if orden in ORDENES_RESENAS else "recientes"
+        context['resenas_cursor'] = cursor
+        context['resenas_version'] = version_resenas(producto.pk)
         context['breadcrumbs'] = [
             {"label": _("Inicio"), "url": reverse_lazy("home:index")},
             {"label": _("Productos"), "url": reverse_lazy("products:list")},
@@ -85,10 +162,8 @@ class TopProductosListView(ListView):
     context_object_name = "productos"
 
     def get_queryset(self):
-        # Cambia el nombre de la anotación para evitar conflicto con la propiedad
-        return Producto.objects.annotate(
-            vendidos_total=Sum('orderitem__cantidad', default=0)  # Nombre diferente
-        ).order_by("-vendidos_total")[:10]
+        # Lee el contador desnormalizado (índice producto_top_vendidos_idx)
+        return Producto.mas_vendidos(limite=10)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -107,9 +182,7 @@ class MasComentadosListView(ListView):
     context_object_name = "productos"
 
     def get_queryset(self):
-        return Producto.objects.annotate(
-            num_resenas=Count("reviews")
-        ).order_by("-num_resenas")[:10]
+        return Producto.mas_comentados(limite=10)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -128,9 +201,7 @@ class MejorCalificadosListView(ListView):
     context_object_name = "productos"
 
     def get_queryset(self):
-        return Producto.objects.annotate(
-            promedio_calificacion=Avg("reviews__rating")  # Nombre diferente
-        ).filter(promedio_calificacion__isnull=False).order_by("-promedio_calificacion")[:10]
+        return Producto.mejor_calificados(limite=10)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -187,22 +258,154 @@ class CrearReviewView(LoginRequiredMixin, CreateView):
 
 
 def productos_disponibles_api(request):
-    """Servicio web que expone la lista de productos disponibles."""
-
-    productos = Producto.objects.filter(stock__gt=0).order_by("nombre")
-    results = [
-        {
-            "id": producto.pk,
-            "name": producto.nombre,
-            "category": producto.categoria,
-            "price": float(producto.precio),
-            "stock": producto.stock,
-            "detail_url": request.build_absolute_uri(producto.get_absolute_url()),
-            "image": request.build_absolute_uri(producto.imagen.url) if producto.imagen else None,
-        }
-        for producto in productos
-    ]
+    """Servicio web que expone la lista de productos disponibles.
+
+    Sin ``q`` se sirve el snapshot precalculado del catálogo con ETag y
+    Last-Modified; los clientes que reenvían ``If-None-Match`` reciben 304.
+    """
+
+    origen = request.build_absolute_uri("/")
+    q = request.GET.get("q")
+    if q:
+        productos = buscar_productos(Producto.objects.en_stock().con_stock_actual().order_by("nombre"), q)
+        return JsonResponse(serializar_disponibles(list(productos), origen))
+
+    snapshot = obtener_snapshot(origen)
+    usa_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
+    etag = snapshot["etag"][:-1] + '-gz"' if usa_gzip else snapshot["etag"]
+    last_modified = int(snapshot["last_modified"].timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(
+            snapshot["gzip"] if usa_gzip else snapshot["body"],
+            content_type="application/json",
+        )
+        if usa_gzip:
+            response["Content-Encoding"] = "gzip"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def productos_api_v2(request):
+    """API v2 del catálogo: paginación por cursor y campos a demanda.
+
+    Parámetros: ``fields`` (lista separada por comas), ``categoria``,
+    ``updated_since`` (ISO 8601), ``in_stock``, ``limit`` y ``cursor``. Los
+    resultados se ordenan por (fecha de actualización, id), de modo que un
+    cliente puede sincronizar cambios guardando el último cursor. Las ventas
+    de productos con stock fragmentado no cambian su fecha: aparecen en
+    ``updated_since`` tras la siguiente conciliación (``rebalancear_stock``).
+    """
+
+    campos = CAMPOS_V2_DEFECTO
+    if request.GET.get("fields"):
+        campos = tuple(dict.fromkeys(c.strip() for c in request.GET["fields"].split(",") if c.strip()))
+        desconocidos = [campo for campo in campos if campo not in CAMPOS_V2]
+        if not campos or desconocidos:
+            return JsonResponse(
+                {"error": "Campos no válidos: %s" % ", ".join(desconocidos), "allowed": list(CAMPOS_V2)},
+                status=400,
+            )
+
+    try:
+        limite = min(max(int(request.GET.get("limit", API_V2_LIMITE)), 1), API_V2_LIMITE_MAXIMO)
+    except ValueError:
+        return JsonResponse({"error": "limit debe ser un entero"}, status=400)
+
+    productos = Producto.objects.con_stock_actual()
+    if request.GET.get("categoria"):
+        productos = productos.filter(categoria=request.GET["categoria"])
+    if request.GET.get("in_stock") in ("1", "true"):
+        productos = productos.filter(stock_actual__gt=0)
+    if request.GET.get("updated_since"):
+        desde = parse_datetime(request.GET["updated_since"])
+        if desde is None:
+            return JsonResponse({"error": "updated_since debe ser una fecha ISO 8601"}, status=400)
+        if timezone.is_naive(desde):
+            desde = timezone.make_aware(desde, dt_timezone.utc)
+        productos = productos.filter(fecha_actualizacion__gte=desde)
+
+    columnas = {CAMPOS_V2[campo] for campo in campos} | {"id", "fecha_actualizacion"}
+    paginator = CursorPaginator(productos.values(*columnas), ("fecha_actualizacion", "id"), por_pagina=limite)
+    try:
+        pagina = paginator.pagina(request.GET.get("cursor"))
+    except CursorInvalido:
+        return JsonResponse({"error": "Cursor inválido"}, status=400)
+
+    origen = request.build_absolute_uri("/")
+    siguiente = None
+    if pagina.has_next:
+        params = request.GET.copy()
+        params["cursor"] = pagina.next_cursor
+        siguiente = request.build_absolute_uri("?" + params.urlencode())
+
+    return JsonResponse({
+        "results": [serializar_fila_v2(fila, campos, origen) for fila in pagina.object_list],
+        "next_cursor": pagina.next_cursor,
+        "previous_cursor": pagina.previous_cursor,
+        "next": siguiente,
+    })
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def productos_lote_api(request):
+    """Precio y stock de muchos productos en una sola llamada.
+
+    Acepta ``?ids=1,2,3`` o un POST JSON ``{"ids": [...]}`` con hasta
+    ``API_LOTE_MAXIMO`` ids. Con ``?format=ndjson`` (o ``Accept:
+    application/x-ndjson``) responde una línea JSON por producto.
+    """
+
+    try:
+        if request.method == "POST":
+            crudos = json.loads(request.body or b"{}").get("ids", [])
+        else:
+            crudos = [valor for valor in request.GET.get("ids", "").split(",") if valor.strip()]
+        ids = [int(valor) for valor in crudos]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({"error": "ids debe ser una lista de enteros"}, status=400)
+
+    if not ids:
+        return JsonResponse({"error": "Debe indicar al menos un id"}, status=400)
+    if any(not 1 <= pk <= ID_MAXIMO for pk in ids):
+        return JsonResponse({"error": "Los ids deben estar entre 1 y %d" % ID_MAXIMO}, status=400)
+    if len(ids) > API_LOTE_MAXIMO:
+        return JsonResponse({"error": "Máximo %d ids por consulta" % API_LOTE_MAXIMO}, status=400)
+
+    encontrados, faltantes = consultar_lote(ids)
+
+    if request.GET.get("format") == "ndjson" or "application/x-ndjson" in request.headers.get("Accept", ""):
+        cuerpo = "".join(json.dumps(fila, separators=(",", ":")) + "\n" for fila in encontrados)
+        return HttpResponse(cuerpo, content_type="application/x-ndjson")
+
+    return JsonResponse({"results": encontrados, "missing": faltantes})
+
+
+def resenas_producto_api(request, pk):
+    """Siguiente página de reseñas de un producto (carga perezosa)."""
+
+    producto = get_object_or_404(Producto.objects.only("id"), pk=pk)
+    paginator = paginador_resenas(producto.pk, request.GET.get("orden", "recientes"))
+    try:
+        pagina = paginator.pagina(request.GET.get("cursor"))
+    except CursorInvalido:
+        return JsonResponse({"error": "Cursor inválido"}, status=400)
+
     return JsonResponse({
-        "count": len(results),
-        "results": results,
-    })
\ No newline at end of file
+        "results": [
+            {
+                "id": review.pk,
+                "user": review.usuario.username,
+                "rating": review.rating,
+                "comment": review.comentario,
+                "date": review.fecha,
+            }
+            for review in pagina.object_list
+        ],
+        "html": render_to_string("products/_review_items.html", {"resenas": pagina.object_list}, request=request),
+        "next_cursor": pagina.next_cursor,
+    })
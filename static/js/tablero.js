@@ -0,0 +1,147 @@
+// Gráficos SVG del tablero de ventas del admin (línea, barras y dona).
+// Sin dependencias: el admin no carga scripts de CDNs públicos.
+(function (global) {
+    'use strict';
+
+    const SVG = 'http://www.w3.org/2000/svg';
+    const COLORES = ['#417690', '#79aec8', '#f5dd5d', '#ba2121', '#70bf2b', '#a35ea0', '#e08a3c', '#666666'];
+    const ANCHO = 640;
+    const ALTO = 320;
+    const MARGEN = {arriba: 16, derecha: 16, abajo: 48, izquierda: 64};
+
+    function nodo(tipo, atributos, padre) {
+        const elemento = document.createElementNS(SVG, tipo);
+        Object.keys(atributos || {}).forEach(function (clave) {
+            elemento.setAttribute(clave, atributos[clave]);
+        });
+        if (padre) {
+            padre.appendChild(elemento);
+        }
+        return elemento;
+    }
+
+    function texto(padre, x, y, contenido, atributos) {
+        const elemento = nodo('text', Object.assign({x: x, y: y, 'font-size': 11, fill: '#333'}, atributos || {}), padre);
+        elemento.textContent = contenido;
+        return elemento;
+    }
+
+    function titulo(elemento, contenido) {
+        nodo('title', {}, elemento).textContent = contenido;
+    }
+
+    function formato(valor) {
+        return Number(valor).toLocaleString(undefined, {maximumFractionDigits: 2});
+    }
+
+    function lienzo(contenedor) {
+        contenedor.textContent = '';
+        return nodo('svg', {viewBox: '0 0 ' + ANCHO + ' ' + ALTO, width: '100%', role: 'img'}, contenedor);
+    }
+
+    function sinDatos(svg) {
+        texto(svg, ANCHO / 2, ALTO / 2, 'Sin datos', {'text-anchor': 'middle', fill: '#999'});
+    }
+
+    function ejeValores(svg, maximo, horizontal) {
+        const pasos = 4;
+        for (let i = 0; i <= pasos; i++) {
+            const valor = maximo * i / pasos;
+            if (horizontal) {
+                const x = MARGEN.izquierda + (ANCHO - MARGEN.izquierda - MARGEN.derecha) * i / pasos;
+                nodo('line', {x1: x, x2: x, y1: MARGEN.arriba, y2: ALTO - MARGEN.abajo, stroke: '#eee'}, svg);
+                texto(svg, x, ALTO - MARGEN.abajo + 14, formato(valor), {'text-anchor': 'middle'});
+            } else {
+                const y = ALTO - MARGEN.abajo - (ALTO - MARGEN.arriba - MARGEN.abajo) * i / pasos;
+                nodo('line', {x1: MARGEN.izquierda, x2: ANCHO - MARGEN.derecha, y1: y, y2: y, stroke: '#eee'}, svg);
+                texto(svg, MARGEN.izquierda - 6, y + 4, formato(valor), {'text-anchor': 'end'});
+            }
+        }
+    }
+
+    function etiquetasX(svg, etiquetas, posicion) {
+        // Con muchas etiquetas (p. ej. 90 días) solo se muestra una de cada salto
+        const salto = Math.max(1, Math.ceil(etiquetas.length / 10));
+        etiquetas.forEach(function (etiqueta, i) {
+            if (i % salto === 0) {
+                texto(svg, posicion(i), ALTO - MARGEN.abajo + 16, etiqueta, {'text-anchor': 'middle'});
+            }
+        });
+    }
+
+    function linea(contenedor, etiquetas, valores) {
+        const svg = lienzo(contenedor);
+        if (!valores.length) {
+            return sinDatos(svg);
+        }
+        const maximo = Math.max.apply(null, valores) || 1;
+        const ancho = ANCHO - MARGEN.izquierda - MARGEN.derecha;
+        const alto = ALTO - MARGEN.arriba - MARGEN.abajo;
+        const x = function (i) { return MARGEN.izquierda + (valores.length > 1 ? ancho * i / (valores.length - 1) : ancho / 2); };
+        const y = function (valor) { return MARGEN.arriba + alto - alto * valor / maximo; };
+        ejeValores(svg, maximo, false);
+        etiquetasX(svg, etiquetas, x);
+        const puntos = valores.map(function (valor, i) { return x(i) + ',' + y(valor); }).join(' ');
+        nodo('polyline', {points: puntos, fill: 'none', stroke: COLORES[0], 'stroke-width': 2}, svg);
+        valores.forEach(function (valor, i) {
+            titulo(nodo('circle', {cx: x(i), cy: y(valor), r: 3, fill: COLORES[0]}, svg), etiquetas[i] + ': ' + formato(valor));
+        });
+    }
+
+    function barras(contenedor, etiquetas, valores, horizontal) {
+        const svg = lienzo(contenedor);
+        if (!valores.length) {
+            return sinDatos(svg);
+        }
+        const maximo = Math.max.apply(null, valores) || 1;
+        const ancho = ANCHO - MARGEN.izquierda - MARGEN.derecha;
+        const alto = ALTO - MARGEN.arriba - MARGEN.abajo;
+        const banda = (horizontal ? alto : ancho) / valores.length;
+        ejeValores(svg, maximo, horizontal);
+        valores.forEach(function (valor, i) {
+            const largo = (horizontal ? ancho : alto) * valor / maximo;
+            const inicio = (horizontal ? MARGEN.arriba : MARGEN.izquierda) + banda * i + banda * 0.15;
+            const barra = horizontal
+                ? {x: MARGEN.izquierda, y: inicio, width: largo, height: banda * 0.7}
+                : {x: inicio, y: MARGEN.arriba + alto - largo, width: banda * 0.7, height: largo};
+            titulo(nodo('rect', Object.assign({fill: COLORES[i % COLORES.length]}, barra), svg), etiquetas[i] + ': ' + formato(valor));
+            if (horizontal) {
+                texto(svg, MARGEN.izquierda - 6, inicio + banda * 0.35 + 4, etiquetas[i], {'text-anchor': 'end'});
+            }
+        });
+        if (!horizontal) {
+            etiquetasX(svg, etiquetas, function (i) { return MARGEN.izquierda + banda * (i + 0.5); });
+        }
+    }
+
+    function dona(contenedor, etiquetas, valores) {
+        const svg = lienzo(contenedor);
+        const total = valores.reduce(function (suma, valor) { return suma + valor; }, 0);
+        if (!total) {
+            return sinDatos(svg);
+        }
+        const cx = ALTO / 2;
+        const cy = ALTO / 2;
+        const radio = ALTO / 2 - MARGEN.arriba;
+        let angulo = -Math.PI / 2;
+        valores.forEach(function (valor, i) {
+            const color = COLORES[i % COLORES.length];
+            const fin = angulo + 2 * Math.PI * valor / total;
+            const trazo = valor === total
+                ? {tipo: 'circle', atributos: {cx: cx, cy: cy, r: radio}}
+                : {tipo: 'path', atributos: {d: [
+                    'M', cx, cy,
+                    'L', cx + radio * Math.cos(angulo), cy + radio * Math.sin(angulo),
+                    'A', radio, radio, 0, fin - angulo > Math.PI ? 1 : 0, 1, cx + radio * Math.cos(fin), cy + radio * Math.sin(fin),
+                    'Z',
+                ].join(' ')}};
+            titulo(nodo(trazo.tipo, Object.assign({fill: color}, trazo.atributos), svg), etiquetas[i] + ': ' + formato(valor));
+            nodo('rect', {x: ALTO + 20, y: MARGEN.arriba + i * 20, width: 12, height: 12, fill: color}, svg);
+            texto(svg, ALTO + 38, MARGEN.arriba + i * 20 + 10, etiquetas[i] + ' (' + formato(valor) + ')');
+            angulo = fin;
+        });
+        nodo('circle', {cx: cx, cy: cy, r: radio * 0.55, fill: '#fff'}, svg);
+    }
+
+    global.GraficosTablero = {linea: linea, barras: barras, dona: dona};
+})(window);
@@ -0,0 +1,88 @@
+"""Órdenes por segundo sobre un mismo producto, con y sin stock fragmentado.
+
+No se descubre con ``manage.py test`` (el archivo no empieza por ``test``);
+se ejecuta aparte y corre sobre la base de pruebas desechable del runner:
+
+    python manage.py test tests.benchmarks.benchmark_checkout
+
+``BENCHMARK_COMPRADORES``, ``BENCHMARK_ORDENES`` y ``BENCHMARK_FRAGMENTOS``
+cambian el tamaño de la prueba.
+"""
+
+import os
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection
+from django.test import TransactionTestCase
+
+from cart.models import Cart, CartItem
+from orders.services import StockInsuficiente, crear_orden
+from products.models import Producto
+from products.services import fragmentar_stock, reconciliar_stock, unificar_stock
+
+
+class BenchmarkCheckout(TransactionTestCase):
+    COMPRADORES = int(os.environ.get("BENCHMARK_COMPRADORES", 16))
+    ORDENES = int(os.environ.get("BENCHMARK_ORDENES", 25))
+    FRAGMENTOS = int(os.environ.get("BENCHMARK_FRAGMENTOS", 8))
+
+    def test_ordenes_por_segundo(self):
+        User = get_user_model()
+        vendedor = User.objects.create_user(username="tienda")
+        compradores = [User.objects.create_user(username=f"comprador{i}") for i in range(self.COMPRADORES)]
+        carritos = {comprador.pk: Cart.objects.create(usuario=comprador) for comprador in compradores}
+        total = self.COMPRADORES * self.ORDENES
+        producto = Producto.objects.create(
+            vendedor=vendedor, nombre="Oferta relámpago", precio=Decimal("9.99"), stock=total
+        )
+
+        # Las facturas no forman parte de lo que se mide
+        with mock.patch("orders.services.checkout.programar_factura"):
+            for fragmentos in (None, self.FRAGMENTOS):
+                Producto.objects.filter(pk=producto.pk).update(stock=total)
+                if fragmentos:
+                    fragmentar_stock(producto.pk, fragmentos)
+                segundos, vendidas = self._medir(producto, compradores, carritos)
+                if fragmentos:
+                    reconciliar_stock([producto.pk])
+                    unificar_stock(producto.pk)
+                producto.refresh_from_db()
+                modo = f"{fragmentos} fragmentos" if fragmentos else "sin fragmentar"
+                print(
+                    f"\n{modo:16} {vendidas:5} órdenes en {segundos:6.2f}s "
+                    f"({vendidas / segundos:7.1f} órdenes/s), stock final {producto.stock}"
+                )
+                self.assertEqual(producto.stock, total - vendidas)
+
+    def _medir(self, producto, compradores, carritos):
+        barrera = threading.Barrier(len(compradores) + 1)
+        vendidas = []
+
+        def comprar(comprador):
+            close_old_connections()
+            producto_local = Producto.objects.get(pk=producto.pk)
+            # Línea sin guardar: el checkout no tiene filas de carrito que borrar
+            item = CartItem(cart=carritos[comprador.pk], producto=producto_local, cantidad=1)
+            barrera.wait()
+            try:
+                for _ in range(self.ORDENES):
+                    try:
+                        crear_orden(comprador, [item])
+                        vendidas.append(1)
+                    except StockInsuficiente:
+                        pass
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=comprar, args=(comprador,)) for comprador in compradores]
+        for hilo in hilos:
+            hilo.start()
+        barrera.wait()
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.join()
+        return time.perf_counter() - inicio, len(vendidas)